@@ -0,0 +1,3 @@
+"""
+Moduł benchmarks zawierający skrypty pomiarów wydajności.
+"""
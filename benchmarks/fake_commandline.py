@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Atrapa Cinema 4D Commandline do testów i benchmarków bez licencji C4D.
+
+Przyjmuje te same argumenty co Commandline (-render, -frame, -oimage, ...),
+wypisuje komunikaty podobne do C4D i opcjonalnie tworzy puste pliki klatek.
+Z -script uruchamia po "starcie" podany skrypt Pythona (jak C4D), np.
+benchmarks/fake_render_server.py w trybie serwera renderowania.
+
+Zmienne środowiskowe:
+    FAKE_C4D_FRAME_TIME - czas renderowania jednej klatki w sekundach (0.05)
+    FAKE_C4D_EXIT_CODE  - kod wyjścia procesu (0)
+    FAKE_C4D_STARTUP    - czas "uruchamiania" C4D w sekundach (0.0)
+    FAKE_C4D_LOG_LINES  - dodatkowe linie logu na klatkę, jak przy -verbose (0)
+
+Użycie w config.json:
+    "c4d_versions": {"fake": "/ścieżka/do/benchmarks/fake_commandline.py"}
+"""
+
+import os
+import runpy
+import sys
+import time
+
+
+def parse_args(argv):
+    options = {}
+    flags = set()
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in (
+            "-render",
+            "-frame",
+            "-oimage",
+            "-omultipass",
+            "-threads",
+            "-script",
+        ):
+            values = []
+            while i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                i += 1
+                values.append(argv[i])
+            options[arg] = values
+        else:
+            flags.add(arg)
+        i += 1
+    return options, flags
+
+
+def frame_range(values):
+    """Zwraca listę klatek z argumentów -frame (start [end [step]])"""
+    if not values:
+        return [0]
+    numbers = [int(value) for value in values]
+    start = numbers[0]
+    end = numbers[1] if len(numbers) > 1 else start
+    step = numbers[2] if len(numbers) > 2 else 1
+    return list(range(start, end + 1, step))
+
+
+# Komunikaty wypisywane przez C4D w trybie -verbose w trakcie renderowania klatki
+VERBOSE_LINES = (
+    "Cinema 4D: Rendering bucket {index} of {total}",
+    "Cinema 4D: Progress: {percent}%",
+    "Cinema 4D: Memory used: {memory} MB",
+    "Cinema 4D: Shading: {index} samples processed",
+)
+
+
+def main(argv=None) -> int:
+    options, _ = parse_args(sys.argv[1:] if argv is None else argv)
+    frame_time = float(os.environ.get("FAKE_C4D_FRAME_TIME", "0.05"))
+    exit_code = int(os.environ.get("FAKE_C4D_EXIT_CODE", "0"))
+    startup = float(os.environ.get("FAKE_C4D_STARTUP", "0.0"))
+    log_lines = int(os.environ.get("FAKE_C4D_LOG_LINES", "0"))
+
+    scene = (options.get("-render") or ["scene.c4d"])[0]
+    output = (options.get("-oimage") or [None])[0]
+
+    script = (options.get("-script") or [None])[0]
+    if script:
+        time.sleep(startup)
+        sys.argv = [script]
+        runpy.run_path(script, run_name="__main__")
+        return 0
+
+    print("Cinema 4D: Loading Project: " + scene, flush=True)
+    time.sleep(startup)
+    frames = frame_range(options.get("-frame"))
+    for frame in frames:
+        print(f"Cinema 4D: Rendering frame {frame} [{scene}]", flush=True)
+        for index in range(log_lines):
+            line = VERBOSE_LINES[index % len(VERBOSE_LINES)]
+            print(
+                line.format(
+                    index=index + 1,
+                    total=log_lines,
+                    percent=(index + 1) * 100 // log_lines,
+                    memory=2048 + index % 512,
+                ),
+                flush=True,
+            )
+        time.sleep(frame_time)
+        if output:
+            path = f"{output}{frame:04d}.png"
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+        print(f"Cinema 4D: Frame {frame} done", flush=True)
+
+    if exit_code:
+        print("Rendering failed", file=sys.stderr, flush=True)
+        return exit_code
+    print(f"Cinema 4D: Rendering successful: {len(frames)} frames", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
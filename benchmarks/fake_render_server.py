@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Atrapa serwera renderowania C4D (c4d_scripts/render_server.py) bez licencji.
+
+Mówi tym samym protokołem co prawdziwy skrypt, a klatki "renderuje" jak
+fake_commandline.py - uśpienie FAKE_C4D_FRAME_TIME i pusty plik PNG.
+FAKE_C4D_SERVER_LEAK (MB) - ile pamięci przybywa procesowi z każdym
+zleceniem, do sprawdzania recyklingu serwera.
+
+Użycie w config.json:
+    "render_server_enabled": true,
+    "render_server_script": "/ścieżka/do/benchmarks/fake_render_server.py"
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from c4d_scripts.render_server import frame_range, parse_args, serve  # noqa: E402
+
+_leaked = []
+
+
+def render_fake(argv, log):
+    options = parse_args(argv)
+    frame_time = float(os.environ.get("FAKE_C4D_FRAME_TIME", "0.05"))
+    leak_mb = int(os.environ.get("FAKE_C4D_SERVER_LEAK", "0"))
+    scene = (options.get("-render") or ["scene.c4d"])[0]
+    output = (options.get("-oimage") or [None])[0]
+    if not options.get("-frame") or not output:
+        raise RuntimeError("Zlecenie bez -frame lub -oimage nie jest obsługiwane")
+    if not os.path.exists(scene):
+        raise RuntimeError(f"Nie udało się wczytać projektu: {scene}")
+
+    log("Loading Project: " + scene)
+    frames = frame_range(options.get("-frame"))
+    for frame in frames:
+        log(f"Rendering frame {frame} [{scene}]")
+        time.sleep(frame_time)
+        if output:
+            path = f"{output}{frame:04d}.png"
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+        log(f"Frame {frame} done")
+    if leak_mb:
+        _leaked.append(bytearray(leak_mb * 1024**2))
+    log(f"Rendering successful: {len(frames)} frames")
+
+
+if __name__ == "__main__":
+    serve(render_fake)
+    sys.exit(0)
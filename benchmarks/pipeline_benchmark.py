@@ -0,0 +1,380 @@
+"""
+Benchmark narzutu silnika renderowania - bez Cinema 4D.
+
+Rolę Commandline pełni benchmarks/fake_commandline.py, więc mierzony jest
+wyłącznie koszt aplikacji. Każdy scenariusz działa w świeżym interpreterze:
+    - dispatch        - QueueManager + Cinema4DController: opóźnienie pobrania
+                        zadania, przerwa między zadaniami, narzut na zadanie,
+                        przepustowość i przyrost pamięci,
+    - thread_manager  - ThreadManager z kilkoma workerami: opóźnienie startu
+                        i przepustowość,
+    - log_throughput  - linie logu C4D na sekundę przez logger i odbiornik UI
+                        (on_log_message) w porównaniu z samym procesem,
+    - persistence     - zapis/odczyt 1k/10k/50k zadań i pamięć na 1000 zadań,
+    - startup         - pomiary z benchmarks.startup_benchmark.
+
+Wyniki są dopisywane do benchmarks/results/pipeline.jsonl i porównywane
+z poprzednim uruchomieniem o tych samych parametrach.
+
+Użycie:
+    python -m benchmarks.pipeline_benchmark [--tasks 50] [--sizes 1000,10000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.startup_benchmark import REGRESSION_THRESHOLD
+from benchmarks.startup_benchmark import load_previous
+from benchmarks.startup_benchmark import measure as measure_startup
+from benchmarks.startup_benchmark import save_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_COMMANDLINE = os.path.join(REPO_ROOT, "benchmarks", "fake_commandline.py")
+RESULTS_FILE = os.path.join(REPO_ROOT, "benchmarks", "results", "pipeline.jsonl")
+FAKE_VERSION = "fake"
+SCENE_FILE = os.path.join("scenes", "bench.c4d")
+COMPLETION_TIMEOUT = 600.0
+
+# Pomiary, dla których większa wartość jest lepsza (reszta: mniejsza)
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def _write_commandline_wrapper(workdir: str) -> str:
+    """Tworzy plik wykonywalny uruchamiający atrapę bieżącym interpreterem"""
+    if os.name == "nt":
+        path = os.path.join(workdir, "Commandline.cmd")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_COMMANDLINE}" %*\n')
+    else:
+        path = os.path.join(workdir, "Commandline")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_COMMANDLINE}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def prepare_workdir() -> str:
+    """Tworzy katalog roboczy z config.json wskazującym na atrapę Commandline"""
+    workdir = tempfile.mkdtemp(prefix="c4d_pipeline_bench_")
+    config = {"c4d_versions": {FAKE_VERSION: _write_commandline_wrapper(workdir)}}
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    os.makedirs(os.path.dirname(os.path.join(workdir, SCENE_FILE)))
+    with open(os.path.join(workdir, SCENE_FILE), "wb") as f:
+        f.write(b"\x00" * 4096)
+    return workdir
+
+
+def make_tasks(count: int, frames: str = "1"):
+    from core.render_command import frame_set_fields
+    from models.task import RenderTask
+
+    frame_set, start_frame, end_frame = frame_set_fields(frames)
+    return [
+        RenderTask(
+            id=str(uuid.uuid4()),
+            name=f"bench_{i:05d}",
+            c4d_file_path=SCENE_FILE,
+            output_folder=os.path.join("output", f"bench_{i:05d}"),
+            cinema4d_version=FAKE_VERSION,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            frame_set=frame_set,
+        )
+        for i in range(count)
+    ]
+
+
+def _rss_mb() -> float:
+    import psutil
+
+    return psutil.Process().memory_info().rss / 1024**2
+
+
+def _percentile(values, percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _wait_until(condition, timeout: float = COMPLETION_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Scenariusz nie zakończył się w wyznaczonym czasie")
+        time.sleep(0.005)
+
+
+# --- Scenariusze (uruchamiane w procesie potomnym) ---
+
+
+def scenario_dispatch(count: int) -> dict:
+    """Przetwarza zadania przez QueueManager i mierzy narzut między nimi"""
+    from core.queue_manager import QueueManager
+
+    os.environ["FAKE_C4D_FRAME_TIME"] = "0"
+    queue_manager = QueueManager()
+    started, finished = {}, {}
+    queue_manager.on_task_started = lambda task: started.setdefault(
+        task.id, time.perf_counter()
+    )
+    queue_manager.on_task_completed = lambda task: finished.setdefault(
+        task.id, time.perf_counter()
+    )
+    queue_manager.on_task_failed = queue_manager.on_task_completed
+
+    tasks = make_tasks(count)
+    rss_before = _rss_mb()
+    queue_manager.add_tasks(tasks)
+    t0 = time.perf_counter()
+    queue_manager.start_processing()
+    _wait_until(lambda: len(finished) == count)
+    total = time.perf_counter() - t0
+    queue_manager.stop_processing()
+
+    failed = [task for task in tasks if task.status.value != "completed"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} zadań z błędem: {failed[0].error_message}")
+
+    gaps = [
+        (started[tasks[i + 1].id] - finished[tasks[i].id]) * 1000
+        for i in range(count - 1)
+    ]
+    overheads = [
+        (finished[task.id] - started[task.id]) * 1000
+        - task.resource_usage.get("wall_seconds", 0) * 1000
+        for task in tasks
+    ]
+    return {
+        "dispatch_first_ms": round((started[tasks[0].id] - t0) * 1000, 2),
+        "dispatch_gap_p50_ms": round(statistics.median(gaps), 2) if gaps else 0.0,
+        "dispatch_gap_p95_ms": round(_percentile(gaps, 95), 2) if gaps else 0.0,
+        "task_overhead_p50_ms": round(statistics.median(overheads), 2),
+        "queue_tasks_per_s": round(count / total, 2),
+        "dispatch_rss_growth_mb": round(_rss_mb() - rss_before, 2),
+    }
+
+
+def scenario_thread_manager(count: int, workers: int) -> dict:
+    """Przetwarza zadania przez ThreadManager z kilkoma workerami"""
+    from core.thread_manager import ThreadManager
+
+    os.environ["FAKE_C4D_FRAME_TIME"] = "0"
+    manager = ThreadManager(max_workers=workers)
+    added, started, finished = {}, {}, {}
+    lock = threading.Lock()
+
+    def on_started(task, worker_id):
+        with lock:
+            started[task.id] = time.perf_counter()
+
+    def on_finished(task, worker_id):
+        with lock:
+            finished[task.id] = time.perf_counter()
+
+    manager.on_task_started = on_started
+    manager.on_task_completed = on_finished
+    manager.on_task_failed = on_finished
+
+    tasks = make_tasks(count)
+    t0 = time.perf_counter()
+    manager.start()
+    for task in tasks:
+        added[task.id] = time.perf_counter()
+        manager.add_task(task)
+    _wait_until(lambda: len(finished) == count)
+    total = time.perf_counter() - t0
+    manager.stop()
+
+    latencies = [(started[task.id] - added[task.id]) * 1000 for task in tasks[:workers]]
+    return {
+        "thread_manager_start_p50_ms": round(statistics.median(latencies), 2),
+        "thread_manager_tasks_per_s": round(count / total, 2),
+    }
+
+
+def scenario_log_throughput(lines_per_frame: int, frames: int) -> dict:
+    """Porównuje przepustowość logu C4D w aplikacji i bez niej"""
+    from core.cinema4d_controller import Cinema4DController
+    from core.config import get_config
+
+    os.environ["FAKE_C4D_FRAME_TIME"] = "0"
+    os.environ["FAKE_C4D_LOG_LINES"] = str(lines_per_frame)
+    executable = get_config().get_c4d_versions()[FAKE_VERSION]
+    frame_args = ["-frame", "1", str(frames)]
+
+    t0 = time.perf_counter()
+    subprocess.run(
+        [executable, "-render", SCENE_FILE, *frame_args],
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    baseline = time.perf_counter() - t0
+
+    received = []
+    controller = Cinema4DController()
+    controller.on_log_message = received.append
+    task = make_tasks(1, f"1-{frames}")[0]
+    t0 = time.perf_counter()
+    if not controller.render_task(task):
+        raise RuntimeError(task.error_message)
+    pipeline = time.perf_counter() - t0
+
+    return {
+        "log_lines_per_s": round(len(received) / pipeline),
+        "log_baseline_lines_per_s": round(len(received) / baseline),
+        "log_overhead_ratio": round(pipeline / baseline, 2),
+    }
+
+
+def scenario_persistence(count: int) -> dict:
+    """Mierzy zapis i odczyt count zadań oraz pamięć zajmowaną przez zadania"""
+    from core.queue_manager import QueueManager
+
+    queue_manager = QueueManager()
+    queue_manager.get_tasks()
+    queue_manager.tasks = make_tasks(count)
+
+    t0 = time.perf_counter()
+    queue_manager.save_tasks()
+    save_all = time.perf_counter() - t0
+
+    single = []
+    for task in queue_manager.tasks[:50]:
+        t0 = time.perf_counter()
+        queue_manager.save_task(task)
+        single.append(time.perf_counter() - t0)
+    del queue_manager
+
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    loaded = QueueManager().get_tasks()
+    load_all = time.perf_counter() - t0
+    rss_growth = _rss_mb() - rss_before
+    if len(loaded) != count:
+        raise RuntimeError(f"Wczytano {len(loaded)} z {count} zadań")
+
+    return {
+        f"save_{count}_ms": round(save_all * 1000, 1),
+        f"save_one_at_{count}_ms": round(statistics.median(single) * 1000, 3),
+        f"load_{count}_ms": round(load_all * 1000, 1),
+        f"rss_per_1k_tasks_at_{count}_mb": round(rss_growth / count * 1000, 3),
+    }
+
+
+SCENARIOS = {
+    "dispatch": scenario_dispatch,
+    "thread_manager": scenario_thread_manager,
+    "log_throughput": scenario_log_throughput,
+    "persistence": scenario_persistence,
+}
+
+
+# --- Proces nadrzędny ---
+
+
+def run_scenario(name: str, workdir: str, *params) -> dict:
+    """Uruchamia scenariusz w świeżym interpreterze w osobnym katalogu"""
+    rundir = os.path.join(workdir, f"{name}_{uuid.uuid4().hex[:6]}")
+    os.makedirs(os.path.dirname(os.path.join(rundir, SCENE_FILE)))
+    shutil.copy(os.path.join(workdir, "config.json"), rundir)
+    shutil.copy(os.path.join(workdir, SCENE_FILE), os.path.join(rundir, SCENE_FILE))
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    command = [sys.executable, "-m", "benchmarks.pipeline_benchmark", "--child", name]
+    result = subprocess.run(
+        command + [json.dumps(list(params))],
+        cwd=rundir,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=COMPLETION_TIMEOUT * 2,
+    )
+    shutil.rmtree(rundir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{name}: {result.stderr.strip().splitlines()[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def is_regression(name: str, value: float, before: float) -> bool:
+    delta = (value - before) / before * 100
+    if name.endswith(HIGHER_IS_BETTER):
+        return delta < -REGRESSION_THRESHOLD
+    return delta > REGRESSION_THRESHOLD
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark narzutu silnika")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("params", nargs="?", help=argparse.SUPPRESS)
+    parser.add_argument("--tasks", type=int, default=50, help="zadania w kolejce")
+    parser.add_argument("--workers", type=int, default=4, help="workery ThreadManager")
+    parser.add_argument(
+        "--sizes", default="1000,10000,50000", help="rozmiary magazynu zadań"
+    )
+    parser.add_argument("--log-lines", type=int, default=2000, help="linie na klatkę")
+    parser.add_argument("--startup-repeat", type=int, default=3)
+    parser.add_argument("--no-startup", action="store_true", help="pomiń start")
+    parser.add_argument("--no-save", action="store_true", help="nie zapisuj wyniku")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        params = json.loads(args.params or "[]")
+        print(json.dumps(SCENARIOS[args.child](*params)))
+        return 0
+
+    params = {
+        "tasks": args.tasks,
+        "workers": args.workers,
+        "sizes": args.sizes,
+        "log_lines": args.log_lines,
+        "startup": not args.no_startup,
+    }
+    previous = load_previous(params, RESULTS_FILE)
+    workdir = prepare_workdir()
+    results = {}
+    try:
+        results.update(run_scenario("dispatch", workdir, args.tasks))
+        results.update(
+            run_scenario("thread_manager", workdir, args.tasks, args.workers)
+        )
+        results.update(run_scenario("log_throughput", workdir, args.log_lines, 10))
+        for size in (int(value) for value in args.sizes.split(",") if value):
+            results.update(run_scenario("persistence", workdir, size))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not args.no_startup:
+        startup = measure_startup(args.startup_repeat, 200, with_gui=False)
+        results.update({f"startup_{name}": value for name, value in startup.items()})
+
+    regressions = 0
+    print(f"{'pomiar':<34}{'wynik':>14}{'poprzednio':>14}{'zmiana':>10}")
+    for name, value in results.items():
+        before = previous.get(name)
+        change = ""
+        if before:
+            change = f"{(value - before) / before * 100:+.1f}%"
+            if is_regression(name, value, before):
+                change += " !"
+                regressions += 1
+        before_text = f"{before:g}" if before is not None else "-"
+        print(f"{name:<34}{value:>14g}{before_text:>14}{change:>10}")
+
+    if not args.no_save:
+        save_results(results, params, RESULTS_FILE)
+    if regressions:
+        print(f"Wykryto regresje (> {REGRESSION_THRESHOLD:.0f}%): {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
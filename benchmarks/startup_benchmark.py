@@ -0,0 +1,218 @@
+"""
+Benchmark czasu uruchamiania aplikacji.
+
+Mierzy (każdy pomiar w świeżym interpreterze):
+    - import modułów core (ścieżka bezgłowa, bez PyQt),
+    - start bezgłowy: QueueManager + wczytanie zadań,
+    - czas do pierwszego okna (import PyQt + MainWindow.show()),
+    - opóźnienie otwarcia TaskDialog.
+
+Wyniki są dopisywane do benchmarks/results/startup.jsonl razem z parametrami
+pomiaru i porównywane z poprzednim uruchomieniem o tych samych parametrach,
+aby regresje były widoczne.
+
+Użycie:
+    python -m benchmarks.startup_benchmark [--repeat 5] [--tasks 200]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(REPO_ROOT, "benchmarks", "results", "startup.jsonl")
+
+# Próg (w procentach) powyżej którego wynik jest oznaczany jako regresja
+REGRESSION_THRESHOLD = 20.0
+
+CHILD_IMPORT_CORE = """
+import time
+t0 = time.perf_counter()
+import core.queue_manager, core.cinema4d_controller, models.task
+print(time.perf_counter() - t0)
+"""
+
+CHILD_HEADLESS_START = """
+import time
+t0 = time.perf_counter()
+from core.queue_manager import QueueManager
+QueueManager().get_tasks()
+print(time.perf_counter() - t0)
+"""
+
+CHILD_GUI = """
+import os, statistics, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt6.QtWidgets import QApplication
+from gui.main_window import MainWindow
+from gui.task_dialog import TaskDialog
+app = QApplication(sys.argv)
+window = MainWindow()
+window.show()
+app.processEvents()
+first_window = time.perf_counter() - t0
+
+dialog_times = []
+for _ in range(5):
+    t1 = time.perf_counter()
+    dialog = TaskDialog(window)
+    dialog.show()
+    app.processEvents()
+    dialog_times.append(time.perf_counter() - t1)
+    dialog.close()
+window.close()
+print(first_window, statistics.median(dialog_times))
+"""
+
+
+def prepare_workdir(task_count: int) -> str:
+    """Tworzy katalog roboczy z kopią config.json i syntetycznymi zadaniami"""
+    workdir = tempfile.mkdtemp(prefix="c4d_startup_bench_")
+    config_path = os.path.join(REPO_ROOT, "config.json")
+    if os.path.exists(config_path):
+        shutil.copy(config_path, workdir)
+    else:
+        with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"c4d_versions": {"2023": "Commandline"}}, f)
+
+    with open(os.path.join(workdir, "config.json"), "r", encoding="utf-8") as f:
+        versions = list(json.load(f).get("c4d_versions", {}) or ["2023"])
+
+    tasks_dir = os.path.join(workdir, "tasks")
+    os.makedirs(tasks_dir)
+    for i in range(task_count):
+        task_id = str(uuid.uuid4())
+        data = {
+            "id": task_id,
+            "name": f"bench_{i:05d}",
+            "c4d_file_path": f"C:/projects/shot_{i:05d}.c4d",
+            "output_folder": f"C:/renders/shot_{i:05d}",
+            "cinema4d_version": versions[0],
+            "status": "completed",
+            "start_frame": 1,
+            "end_frame": 100,
+            "render_settings": {},
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "completed_at": None,
+            "error_message": None,
+            "output_files": [],
+        }
+        file_name = f"task_20250101_000000_{task_id}.json"
+        with open(os.path.join(tasks_dir, file_name), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return workdir
+
+
+def run_child(code: str, workdir: str) -> list[float]:
+    """Uruchamia kod w świeżym interpreterze i zwraca zmierzone wartości"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return [float(value) for value in result.stdout.strip().splitlines()[-1].split()]
+
+
+def measure(repeat: int, task_count: int, with_gui: bool) -> dict:
+    workdir = prepare_workdir(task_count)
+    samples = {
+        "import_core_ms": [],
+        "headless_start_ms": [],
+        "first_window_ms": [],
+        "task_dialog_open_ms": [],
+    }
+    try:
+        for _ in range(repeat):
+            samples["import_core_ms"].append(run_child(CHILD_IMPORT_CORE, workdir)[0])
+            samples["headless_start_ms"].append(
+                run_child(CHILD_HEADLESS_START, workdir)[0]
+            )
+            if with_gui:
+                first_window, dialog_open = run_child(CHILD_GUI, workdir)
+                samples["first_window_ms"].append(first_window)
+                samples["task_dialog_open_ms"].append(dialog_open)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        name: round(statistics.median(values) * 1000, 2)
+        for name, values in samples.items()
+        if values
+    }
+
+
+def load_previous(params: dict, path: str = RESULTS_FILE) -> dict:
+    """Zwraca wyniki ostatniego uruchomienia o tych samych parametrach"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    for line in reversed(lines):
+        entry = json.loads(line)
+        if entry.get("params") == params:
+            return entry["results"]
+    return {}
+
+
+def save_results(results: dict, params: dict, path: str = RESULTS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "params": params,
+        "results": results,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark czasu uruchamiania")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=200, help="liczba zadań")
+    parser.add_argument("--no-gui", action="store_true", help="pomiń pomiary PyQt")
+    parser.add_argument("--no-save", action="store_true", help="nie zapisuj wyniku")
+    args = parser.parse_args(argv)
+
+    params = {"tasks": args.tasks, "gui": not args.no_gui}
+    previous = load_previous(params)
+    results = measure(args.repeat, args.tasks, not args.no_gui)
+
+    regressions = 0
+    print(f"{'pomiar':<24}{'mediana':>12}{'poprzednio':>14}{'zmiana':>10}")
+    for name, value in results.items():
+        before = previous.get(name)
+        change = ""
+        if before:
+            delta = (value - before) / before * 100
+            change = f"{delta:+.1f}%"
+            if delta > REGRESSION_THRESHOLD:
+                change += " !"
+                regressions += 1
+        before_text = f"{before:.2f} ms" if before else "-"
+        print(f"{name:<24}{value:>9.2f} ms{before_text:>14}{change:>10}")
+
+    if not args.no_save:
+        save_results(results, params)
+    if regressions:
+        print(f"Wykryto regresje (> {REGRESSION_THRESHOLD:.0f}%): {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+Wypisuje zasoby projektu Cinema 4D jako listę JSON (uruchamiane przez c4dpy).
+
+Użycie: c4dpy list_assets.py <plik.c4d>
+"""
+
+import json
+import sys
+
+import c4d
+
+
+def main():
+    doc = c4d.documents.LoadDocument(
+        sys.argv[1], c4d.SCENEFILTER_OBJECTS | c4d.SCENEFILTER_MATERIALS
+    )
+    if doc is None:
+        sys.exit(f"Nie udało się wczytać projektu: {sys.argv[1]}")
+
+    assets = []
+    c4d.documents.GetAllAssetsNew(
+        doc, False, "", c4d.ASSETDATA_FLAG_WITHCACHES, assets
+    )
+    paths = sorted({asset["filename"] for asset in assets if asset.get("filename")})
+    # Ostatnia linia wyjścia - c4dpy wypisuje wcześniej własne komunikaty
+    print(json.dumps(paths))
+
+
+if __name__ == "__main__":
+    main()
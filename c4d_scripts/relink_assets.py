@@ -0,0 +1,49 @@
+"""
+Zapisuje kopię projektu Cinema 4D ze zmienionymi ścieżkami zasobów (c4dpy).
+
+Użycie: c4dpy relink_assets.py <plik.c4d> <kopia.c4d> <mapa.json>
+
+mapa.json to słownik: ścieżka zasobu zapisana w projekcie -> nowa ścieżka.
+Zasoby spoza mapy zostają bez zmian. Ostatnia linia wyjścia to liczba
+zmienionych parametrów.
+"""
+
+import json
+import sys
+
+import c4d
+
+
+def main():
+    source, target, mapping_path = sys.argv[1:4]
+    with open(mapping_path, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    doc = c4d.documents.LoadDocument(
+        source, c4d.SCENEFILTER_OBJECTS | c4d.SCENEFILTER_MATERIALS
+    )
+    if doc is None:
+        sys.exit(f"Nie udało się wczytać projektu: {source}")
+
+    assets = []
+    c4d.documents.GetAllAssetsNew(doc, False, "", c4d.ASSETDATA_FLAG_WITHCACHES, assets)
+    relinked = 0
+    for asset in assets:
+        new_path = mapping.get(asset.get("filename"))
+        owner = asset.get("owner")
+        param = asset.get("paramId")
+        if new_path is None or owner is None or param in (None, -1):
+            continue
+        owner[param] = new_path
+        relinked += 1
+
+    if not c4d.documents.SaveDocument(
+        doc, target, c4d.SAVEDOCUMENTFLAGS_NONE, c4d.FORMAT_C4DEXPORT
+    ):
+        sys.exit(f"Nie udało się zapisać projektu: {target}")
+    # Ostatnia linia wyjścia - c4dpy wypisuje wcześniej własne komunikaty
+    print(relinked)
+
+
+if __name__ == "__main__":
+    main()
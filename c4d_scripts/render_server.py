@@ -0,0 +1,137 @@
+"""
+Serwer renderowania działający wewnątrz Cinema 4D (tryb -script).
+
+Użycie: Commandline -nogui -script render_server.py
+(uruchamiane przez core.render_server z ustawionymi zmiennymi
+C4D_RENDER_SERVER_PORT i C4D_RENDER_SERVER_TOKEN).
+
+Skrypt łączy się z silnikiem przez lokalne gniazdo TCP i renderuje kolejne
+dokumenty w jednym procesie C4D - start aplikacji, wtyczek i licencji
+odbywa się raz. Protokół to linie JSON:
+    serwer -> silnik: {"event": "hello", "token": ..., "pid": ...}
+    silnik -> serwer: {"job": "<id>", "argv": [argumenty Commandline]}
+    serwer -> silnik: {"event": "log", "line": "..."} (dowolnie wiele)
+    serwer -> silnik: {"event": "done", "job": "<id>", "ok": true, "message": ""}
+    silnik -> serwer: {"command": "quit"}
+Zamknięcie połączenia przez silnik kończy serwer.
+"""
+
+import json
+import os
+import socket
+import sys
+
+# Argumenty Commandline z wartościami, które obsługuje serwer
+VALUE_OPTIONS = ("-render", "-frame", "-oimage", "-omultipass", "-threads")
+
+
+def parse_args(argv):
+    """Zwraca słownik opcji Commandline (opcja -> lista wartości)"""
+    options = {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in VALUE_OPTIONS:
+            values = []
+            while i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                i += 1
+                values.append(argv[i])
+            options[arg] = values
+        i += 1
+    return options
+
+
+def frame_range(values):
+    """Zwraca listę klatek z argumentów -frame (start [end [step]])"""
+    if not values:
+        return [0]
+    numbers = [int(value) for value in values]
+    start = numbers[0]
+    end = numbers[1] if len(numbers) > 1 else start
+    step = numbers[2] if len(numbers) > 2 else 1
+    return list(range(start, end + 1, step))
+
+
+def serve(render_job):
+    """Obsługuje zlecenia silnika; render_job(argv, log) zgłasza błąd wyjątkiem"""
+    port = int(os.environ["C4D_RENDER_SERVER_PORT"])
+    token = os.environ["C4D_RENDER_SERVER_TOKEN"]
+    connection = socket.create_connection(("127.0.0.1", port))
+    reader = connection.makefile("r", encoding="utf-8")
+    writer = connection.makefile("w", encoding="utf-8")
+
+    def send(message):
+        writer.write(json.dumps(message) + "\n")
+        writer.flush()
+
+    def log(line):
+        send({"event": "log", "line": line})
+
+    send({"event": "hello", "token": token, "pid": os.getpid()})
+    for line in reader:
+        request = json.loads(line)
+        if request.get("command") == "quit":
+            break
+        try:
+            render_job(request["argv"], log)
+            send({"event": "done", "job": request["job"], "ok": True, "message": ""})
+        except Exception as e:
+            send(
+                {"event": "done", "job": request["job"], "ok": False, "message": str(e)}
+            )
+    connection.close()
+
+
+def render_c4d(argv, log):
+    """Renderuje dokument przez API Cinema 4D (RenderDocument klatka po klatce)"""
+    import c4d
+
+    options = parse_args(argv)
+    path = options["-render"][0]
+    output = (options.get("-oimage") or [None])[0]
+    # Silnik wysyła tylko jawny zakres klatek i folder wyjściowy - bez nich
+    # render nie zapisałby oczekiwanych plików
+    if not options.get("-frame") or not output:
+        raise RuntimeError("Zlecenie bez -frame lub -oimage nie jest obsługiwane")
+    doc = c4d.documents.LoadDocument(
+        path, c4d.SCENEFILTER_OBJECTS | c4d.SCENEFILTER_MATERIALS
+    )
+    if doc is None:
+        raise RuntimeError(f"Nie udało się wczytać projektu: {path}")
+    try:
+        render_data = doc.GetActiveRenderData().GetDataInstance()
+        width = int(render_data[c4d.RDATA_XRES])
+        height = int(render_data[c4d.RDATA_YRES])
+        image_format = render_data[c4d.RDATA_FORMAT]
+        extension = {
+            c4d.FILTER_PNG: ".png",
+            c4d.FILTER_EXR: ".exr",
+            c4d.FILTER_TIF: ".tif",
+            c4d.FILTER_JPG: ".jpg",
+        }.get(image_format, ".png")
+        fps = doc.GetFps()
+        frames = frame_range(options.get("-frame"))
+        for frame in frames:
+            log(f"Rendering frame {frame} [{path}]")
+            time = c4d.BaseTime(frame, fps)
+            doc.SetTime(time)
+            render_data[c4d.RDATA_FRAMESEQUENCE] = c4d.RDATA_FRAMESEQUENCE_MANUAL
+            render_data[c4d.RDATA_FRAMEFROM] = time
+            render_data[c4d.RDATA_FRAMETO] = time
+            bitmap = c4d.bitmaps.MultipassBitmap(width, height, c4d.COLORMODE_RGB)
+            result = c4d.documents.RenderDocument(
+                doc, render_data, bitmap, c4d.RENDERFLAGS_EXTERNAL
+            )
+            if result != c4d.RENDERRESULT_OK:
+                raise RuntimeError(f"Błąd renderowania klatki {frame} (kod {result})")
+            if output:
+                bitmap.Save(f"{output}{frame:04d}{extension}", image_format)
+            log(f"Frame {frame} done")
+        log(f"Rendering successful: {len(frames)} frames")
+    finally:
+        c4d.documents.KillDocument(doc)
+
+
+if __name__ == "__main__":
+    serve(render_c4d)
+    sys.exit(0)
@@ -0,0 +1,429 @@
+"""
+Tryb bezgłowy (bez PyQt) dla węzłów renderujących.
+
+Użycie:
+    python -m cli run                      # demon przetwarzający kolejkę
+    python -m cli run --api                # demon z lokalnym API HTTP/JSON
+    python -m cli submit scena.c4d -v 2023 -o render/
+    python -m cli import --folder projekty/ -v 2023 [-o render/]
+    python -m cli import --manifest zadania.csv|sweep.json [--skip-invalid]
+    python -m cli list [--status pending]
+    python -m cli cancel <id>
+    python -m cli watch [<id>]
+    python -m cli trace [-o trace.json] [--hours 12]  # oś czasu dla chrome://tracing
+    python -m cli coordinator [--port 8766]  # koordynator farmy renderującej
+    python -m cli agent --coordinator host:8766 [--capacity 2]
+"""
+
+import argparse
+import signal
+import sys
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from core.config import get_config
+from core.queue_manager import QueueManager
+from core.render_command import FRAME_ORDERS, frame_set_fields, server_renders
+from models.task import RenderTask, TaskStatus
+
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+def format_task_row(task: RenderTask) -> str:
+    duration = f"{task.duration:.1f}s" if task.duration else "-"
+    return (
+        f"{task.id[:8]}  {task.status.value:<10} {task.cinema4d_version:<6} "
+        f"{duration:>9}  {task.name}"
+    )
+
+
+def cmd_run(args) -> int:
+    """Uruchamia demona przetwarzającego kolejkę zadań"""
+    queue_manager = QueueManager()
+    queue_manager.load_tasks()
+    queue_manager.start_processing()
+
+    api_server = None
+    api_enabled = get_config().get_api_settings()[0]
+    if args.api or api_enabled:
+        # Import leniwy - http.server nie jest potrzebny bez API
+        from core.api_server import QueueApiServer
+
+        api_server = QueueApiServer(queue_manager, port=args.api_port)
+        api_server.start()
+
+    stop_event = _wait_for_signal(queue_manager.logger)
+
+    # Okresowo dołączaj zadania dodane przez 'submit' z innych procesów
+    while not stop_event.wait(args.poll):
+        queue_manager.refresh_from_files()
+
+    if api_server:
+        api_server.stop()
+    queue_manager.stop_processing()
+    return 0
+
+
+def _wait_for_signal(logger) -> threading.Event:
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"Otrzymano sygnał {signum}, zatrzymywanie...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    return stop_event
+
+
+def cmd_coordinator(args) -> int:
+    """Uruchamia koordynatora farmy - kolejka jest renderowana przez agentów"""
+    from core.farm_coordinator import FarmCoordinator
+
+    queue_manager = QueueManager()
+    queue_manager.load_tasks()
+    coordinator = FarmCoordinator(
+        queue_manager, host=args.host, port=args.port, chunk_size=args.chunk_size
+    )
+    coordinator.start()
+
+    api_server = None
+    if args.api:
+        from core.api_server import QueueApiServer
+
+        api_server = QueueApiServer(queue_manager, port=args.api_port)
+        api_server.start()
+
+    stop_event = _wait_for_signal(coordinator.logger)
+    while not stop_event.wait(args.poll):
+        queue_manager.refresh_from_files()
+
+    if api_server:
+        api_server.stop()
+    coordinator.stop()
+    return 0
+
+
+def cmd_agent(args) -> int:
+    """Uruchamia agenta węzła renderującego"""
+    from core.farm_agent import FarmAgent
+
+    host, _, port = args.coordinator.partition(":")
+    agent = FarmAgent(
+        host,
+        int(port) if port else None,
+        node_id=args.node_id,
+        capacity=args.capacity,
+    )
+    stop_event = _wait_for_signal(agent.logger)
+    worker = threading.Thread(target=agent.run_forever, daemon=True)
+    worker.start()
+    stop_event.wait()
+    agent.stop()
+    worker.join()
+    return 0
+
+
+def cmd_submit(args) -> int:
+    """Dodaje zadanie do magazynu zadań"""
+    try:
+        frame_set, start_frame, end_frame = frame_set_fields(args.frames)
+    except ValueError:
+        print(f"Niepoprawny zakres klatek: {args.frames}", file=sys.stderr)
+        return 2
+
+    render_settings = {}
+    if args.threads:
+        render_settings["threads"] = args.threads
+    if args.memory_limit:
+        render_settings["memory_limit"] = args.memory_limit
+    if args.priority:
+        render_settings["priority"] = args.priority
+    if args.frame_order:
+        render_settings["frame_order"] = args.frame_order
+
+    queue_manager = QueueManager()
+    depends_on = []
+    for task_id in args.depends_on or []:
+        dependency = queue_manager.find_task(task_id)
+        if dependency is None:
+            print(f"Nie znaleziono zadania: {task_id}", file=sys.stderr)
+            return 1
+        depends_on.append(dependency.id)
+
+    task = RenderTask(
+        id=str(uuid.uuid4()),
+        name=args.name or args.c4d_file,
+        c4d_file_path=args.c4d_file,
+        output_folder=args.output or "",
+        cinema4d_version=args.version,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        frame_set=frame_set,
+        render_settings=render_settings,
+        depends_on=depends_on,
+    )
+    if args.frame_order == "progressive" and not server_renders(task):
+        print(
+            "Uwaga: zadanie nie może korzystać z serwera renderowania - "
+            "klatki zostaną wyrenderowane w kolejności",
+            file=sys.stderr,
+        )
+    queue_manager.save_task(task)
+    print(task.id)
+    return 0
+
+
+def cmd_import(args) -> int:
+    """Importuje wiele zadań z folderu lub manifestu CSV/JSON"""
+    from core.bulk_import import (
+        build_tasks,
+        payloads_from_folder,
+        payloads_from_manifest,
+        validate_tasks,
+    )
+
+    try:
+        if args.folder:
+            if not args.version:
+                print("Import z folderu wymaga --version", file=sys.stderr)
+                return 2
+            payloads = payloads_from_folder(
+                args.folder, args.version, args.output, args.frames
+            )
+        else:
+            payloads = payloads_from_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Nie udało się wczytać źródła importu: {e}", file=sys.stderr)
+        return 1
+    for payload in payloads:
+        if args.version:
+            payload.setdefault("cinema4d_version", args.version)
+        if args.frames:
+            payload.setdefault("frames", args.frames)
+
+    queue_manager = QueueManager()
+    result = build_tasks(payloads, [task.id for task in queue_manager.get_tasks()])
+    if not args.no_validate:
+        validate_tasks(result, queue_manager.c4d_controller, args.workers)
+    for name, issues in result.rejected.items():
+        print(f"Odrzucono {name}: {'; '.join(issues)}", file=sys.stderr)
+    if result.rejected and not args.skip_invalid:
+        print(
+            f"Przerwano import: {len(result.rejected)} niepoprawnych zadań "
+            "(użyj --skip-invalid, aby dodać pozostałe)",
+            file=sys.stderr,
+        )
+        return 1
+
+    if args.dry_run:
+        for task in result.tasks:
+            print(f"{task.cinema4d_version:<6} {task.frame_set or '-':<12} {task.name}")
+    else:
+        queue_manager.add_tasks(result.tasks)
+    print(f"Zadania: {len(result.tasks)}, odrzucone: {len(result.rejected)}")
+    return 0
+
+
+def cmd_list(args) -> int:
+    """Wypisuje zadania z magazynu zadań"""
+    tasks = QueueManager().get_tasks()
+    if args.status:
+        tasks = [task for task in tasks if task.status.value == args.status]
+    for task in tasks:
+        print(format_task_row(task))
+    return 0
+
+
+def cmd_cancel(args) -> int:
+    """Anuluje oczekujące zadanie"""
+    queue_manager = QueueManager()
+    task = queue_manager.find_task(args.task_id)
+    if task is None:
+        print(f"Nie znaleziono zadania: {args.task_id}", file=sys.stderr)
+        return 1
+    if not queue_manager.cancel_task(task.id):
+        print(
+            f"Można anulować tylko zadania 'pending' ({task.name}: "
+            f"{task.status.value})",
+            file=sys.stderr,
+        )
+        return 1
+    print(f"Anulowano: {task.name}")
+    return 0
+
+
+def cmd_watch(args) -> int:
+    """Śledzi zmiany statusów zadań aż do zakończenia"""
+    queue_manager = QueueManager()
+    last_status = {}
+    try:
+        while True:
+            queue_manager._load_tasks_from_files()
+            tasks: List[RenderTask] = queue_manager.get_tasks()
+            if args.task_id:
+                task = queue_manager.find_task(args.task_id)
+                tasks = [task] if task else []
+            for task in tasks:
+                if last_status.get(task.id) != task.status:
+                    last_status[task.id] = task.status
+                    print(format_task_row(task), flush=True)
+            if tasks and all(task.status in TERMINAL_STATUSES for task in tasks):
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+def cmd_trace(args) -> int:
+    """Eksportuje plik śledzenia do formatu Chrome trace-event"""
+    from utils.tracing import export_chrome_trace
+
+    _, trace_file = get_config().get_trace_settings()
+    source = args.input or trace_file
+    since = time.time() - args.hours * 3600 if args.hours else None
+    try:
+        count = export_chrome_trace(source, args.output, since)
+    except OSError as e:
+        print(f"Nie można wyeksportować śledzenia: {e}", file=sys.stderr)
+        return 1
+    print(f"Zapisano {count} zdarzeń do {args.output}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m cli", description="Cinema 4D Batch Renderer - tryb bezgłowy"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="uruchom demona kolejki")
+    run_parser.add_argument(
+        "--poll", type=float, default=5.0, help="interwał sprawdzania nowych zadań (s)"
+    )
+    run_parser.add_argument(
+        "--api", action="store_true", help="uruchom lokalne API HTTP/JSON"
+    )
+    run_parser.add_argument(
+        "--api-port", type=int, help="port API (domyślnie z config)"
+    )
+    run_parser.set_defaults(func=cmd_run)
+
+    submit_parser = subparsers.add_parser("submit", help="dodaj zadanie")
+    submit_parser.add_argument("c4d_file", help="ścieżka do pliku .c4d")
+    submit_parser.add_argument(
+        "-v", "--version", required=True, help="wersja Cinema 4D z config.json"
+    )
+    submit_parser.add_argument("-n", "--name", help="nazwa zadania")
+    submit_parser.add_argument("-o", "--output", help="folder wyjściowy")
+    submit_parser.add_argument("-f", "--frames", help="klatki, np. 1-100 lub 1,5,10")
+    submit_parser.add_argument("--threads", type=int, help="liczba wątków")
+    submit_parser.add_argument("--memory-limit", type=int, help="limit pamięci (MB)")
+    submit_parser.add_argument("--priority", choices=["low", "normal", "high"])
+    submit_parser.add_argument(
+        "--frame-order",
+        choices=FRAME_ORDERS,
+        help="progressive - najpierw rzadkie przejścia (preview_strides), potem "
+        "reszta; tylko z serwerem renderowania, bez niego w kolejności",
+    )
+    submit_parser.add_argument(
+        "--depends-on",
+        nargs="+",
+        metavar="TASK_ID",
+        help="zadania, które muszą się zakończyć sukcesem wcześniej",
+    )
+    submit_parser.set_defaults(func=cmd_submit)
+
+    import_parser = subparsers.add_parser(
+        "import", help="dodaj wiele zadań z folderu lub manifestu"
+    )
+    source = import_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--folder", help="folder z plikami .c4d (rekurencyjnie)")
+    source.add_argument(
+        "--manifest", help="plik CSV/JSON z zadaniami lub szablonem z 'sweep'"
+    )
+    import_parser.add_argument(
+        "-v", "--version", help="wersja Cinema 4D (domyślna dla manifestu)"
+    )
+    import_parser.add_argument(
+        "-o", "--output", help="folder bazowy wyników (import z folderu)"
+    )
+    import_parser.add_argument("-f", "--frames", help="klatki, np. 1-100")
+    import_parser.add_argument(
+        "--workers", type=int, default=8, help="wątki walidacji (domyślnie 8)"
+    )
+    import_parser.add_argument(
+        "--skip-invalid", action="store_true", help="dodaj poprawne, pomiń resztę"
+    )
+    import_parser.add_argument(
+        "--no-validate", action="store_true", help="pomiń walidację projektów"
+    )
+    import_parser.add_argument(
+        "--dry-run", action="store_true", help="tylko wypisz zadania"
+    )
+    import_parser.set_defaults(func=cmd_import)
+
+    list_parser = subparsers.add_parser("list", help="wypisz zadania")
+    list_parser.add_argument("--status", choices=[s.value for s in TaskStatus])
+    list_parser.set_defaults(func=cmd_list)
+
+    cancel_parser = subparsers.add_parser("cancel", help="anuluj zadanie")
+    cancel_parser.add_argument("task_id", help="ID zadania (lub jego prefiks)")
+    cancel_parser.set_defaults(func=cmd_cancel)
+
+    watch_parser = subparsers.add_parser("watch", help="śledź statusy zadań")
+    watch_parser.add_argument("task_id", nargs="?", help="ID zadania (opcjonalnie)")
+    watch_parser.add_argument("--interval", type=float, default=2.0)
+    watch_parser.set_defaults(func=cmd_watch)
+
+    trace_parser = subparsers.add_parser(
+        "trace", help="eksportuj śledzenie zadań do formatu Chrome"
+    )
+    trace_parser.add_argument("-i", "--input", help="plik JSONL (domyślnie z config)")
+    trace_parser.add_argument("-o", "--output", default="trace.json")
+    trace_parser.add_argument(
+        "--hours", type=float, help="tylko zdarzenia z ostatnich N godzin"
+    )
+    trace_parser.set_defaults(func=cmd_trace)
+
+    coordinator_parser = subparsers.add_parser(
+        "coordinator", help="uruchom koordynatora farmy renderującej"
+    )
+    coordinator_parser.add_argument("--host", default="0.0.0.0")
+    coordinator_parser.add_argument(
+        "--port", type=int, help="port TCP (domyślnie z config)"
+    )
+    coordinator_parser.add_argument(
+        "--chunk-size", type=int, help="liczba klatek w fragmencie pracy"
+    )
+    coordinator_parser.add_argument(
+        "--poll", type=float, default=5.0, help="interwał sprawdzania nowych zadań (s)"
+    )
+    coordinator_parser.add_argument(
+        "--api", action="store_true", help="uruchom lokalne API HTTP/JSON"
+    )
+    coordinator_parser.add_argument("--api-port", type=int)
+    coordinator_parser.set_defaults(func=cmd_coordinator)
+
+    agent_parser = subparsers.add_parser("agent", help="uruchom agenta węzła farmy")
+    agent_parser.add_argument(
+        "--coordinator", required=True, help="adres koordynatora host[:port]"
+    )
+    agent_parser.add_argument(
+        "--capacity", type=int, default=1, help="liczba równoległych renderów"
+    )
+    agent_parser.add_argument("--node-id", help="nazwa węzła (domyślnie hostname)")
+    agent_parser.set_defaults(func=cmd_agent)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Adaptacyjna liczba równoległych renderów (slotów) na węźle.
+
+Osobno dla każdej wersji C4D kontroler mierzy przepustowość w klatkach na
+godzinę (z komunikatów "Rendering frame N") w kolejnych oknach czasu i szuka
+liczby slotów, przy której jest największa:
+    - po każdym oknie z pełnym obciążeniem slotów zapisuje wynik dla bieżącego
+      limitu (średnia wykładnicza),
+    - sprawdza sąsiedni limit, którego wynik jest nieznany lub nieaktualny
+      (najpierw o jeden większy - wzrost addytywny),
+    - w przeciwnym razie wybiera limit o najlepszym zmierzonym wyniku,
+    - przy braku pamięci zmniejsza limit o połowę (spadek multiplikatywny)
+      i blokuje większe limity do czasu ich przedawnienia.
+Zwiększenie wymaga wolnej pamięci na kolejny proces C4D (szczyt RSS
+ostatnich zadań tej wersji z zapasem).
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+import psutil
+
+from core.config import get_config
+from models.task import RenderTask
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from utils.resource_monitor import ResourceMonitor
+
+# Wynik okna liczy się, gdy sloty były zajęte przez tę część próbek
+SATURATION = 0.8
+MIN_FRAMES = 5
+EWMA_ALPHA = 0.5
+# Po tylu oknach wynik limitu jest sprawdzany ponownie (sceny się zmieniają)
+STALE_WINDOWS = 6
+MEMORY_HIGH = 85.0
+MEMORY_MARGIN = 1.2
+# Zakładany szczyt RSS procesu C4D, zanim zmierzymy pierwsze zadanie
+DEFAULT_PEAK_RSS_MB = 2048.0
+
+
+@dataclass
+class VersionState:
+    """Stan kontrolera dla jednej wersji C4D"""
+
+    limit: int = 1
+    window_started: float = field(default_factory=time.monotonic)
+    frames: int = 0
+    ticks: int = 0
+    saturated_ticks: int = 0
+    windows: int = 0
+    # limit -> (klatki/h, numer okna pomiaru)
+    estimates: Dict[int, Tuple[float, int]] = field(default_factory=dict)
+    peak_rss_mb: Deque[float] = field(default_factory=lambda: deque(maxlen=10))
+
+
+class AdaptiveConcurrency:
+    """Limity równoległych renderów na wersję C4D (stałe lub adaptacyjne)"""
+
+    def __init__(self, adaptive: bool, max_slots: int, window: float = 300.0):
+        config = get_config()
+        log_to_file, log_file_path = config.get_logging_settings()
+        self.logger = setup_logger("adaptive_concurrency", log_to_file, log_file_path)
+
+        self.adaptive = adaptive
+        self.max_slots = max(1, max_slots)
+        self.window = max(10.0, window)
+        self.resource_monitor = ResourceMonitor() if adaptive else None
+        self._lock = threading.Lock()
+        self._states: Dict[str, VersionState] = {}
+        self._slots_gauge = get_metrics().gauge(
+            "c4d_render_slots", "Limit równoległych renderów według wersji C4D"
+        )
+
+    def _state(self, version: str) -> VersionState:
+        state = self._states.get(version)
+        if state is None:
+            state = self._states[version] = VersionState()
+            self._slots_gauge.set(self._limit(state), version=version)
+        return state
+
+    def _limit(self, state: VersionState) -> int:
+        return state.limit if self.adaptive else self.max_slots
+
+    def limit(self, version: str) -> int:
+        with self._lock:
+            return self._limit(self._state(version))
+
+    def slot_count(self) -> int:
+        """Zwraca łączną liczbę slotów węzła (do wyświetlenia workerów)"""
+        if not self.adaptive:
+            return self.max_slots
+        with self._lock:
+            limits = [state.limit for state in self._states.values()]
+        return min(self.max_slots, max(1, sum(limits)))
+
+    def can_start(self, task: RenderTask, running: Dict[str, int]) -> bool:
+        """Czy zadanie zmieści się w limicie węzła i swojej wersji C4D"""
+        if sum(running.values()) >= self.max_slots:
+            return False
+        return running.get(task.cinema4d_version, 0) < self.limit(task.cinema4d_version)
+
+    def frame_done(self, task: RenderTask, seconds: float):
+        with self._lock:
+            self._state(task.cinema4d_version).frames += 1
+
+    def task_finished(self, task: RenderTask):
+        """Zapamiętuje szczyt pamięci zadania - podstawa decyzji o zwiększeniu"""
+        peak = (task.resource_usage or {}).get("peak_rss_mb")
+        if peak:
+            with self._lock:
+                self._state(task.cinema4d_version).peak_rss_mb.append(peak)
+
+    def evaluate(self, running: Dict[str, int], pending: Dict[str, int]):
+        """Aktualizuje limity - wywoływane cyklicznie przez pętlę kolejki"""
+        if not self.adaptive:
+            return
+        now = time.monotonic()
+        memory = self.resource_monitor.get_average_resources()["memory"]
+        with self._lock:
+            for version in set(running) | set(pending):
+                state = self._state(version)
+                state.ticks += 1
+                if running.get(version, 0) >= state.limit:
+                    state.saturated_ticks += 1
+                if memory > MEMORY_HIGH and state.limit > 1:
+                    self._back_off(version, state, memory)
+                elif now - state.window_started >= self.window:
+                    self._close_window(version, state, now, pending.get(version, 0))
+
+    def _reset_window(self, state: VersionState):
+        state.window_started = time.monotonic()
+        state.frames = state.ticks = state.saturated_ticks = 0
+
+    def _back_off(self, version: str, state: VersionState, memory: float):
+        previous = state.limit
+        state.limit = max(1, state.limit // 2)
+        # Większe limity uznane za najgorsze, dopóki wynik się nie przedawni
+        for limit in range(state.limit + 1, previous + 1):
+            state.estimates[limit] = (0.0, state.windows)
+        self._reset_window(state)
+        self._slots_gauge.set(state.limit, version=version)
+        self.logger.warning(
+            f"Pamięć {memory:.0f}% - sloty C4D {version}: {previous} -> {state.limit}"
+        )
+
+    def _headroom(self, state: VersionState) -> bool:
+        """Czy wolna pamięć pomieści kolejny proces C4D"""
+        peak = max(state.peak_rss_mb, default=DEFAULT_PEAK_RSS_MB)
+        available_mb = psutil.virtual_memory().available / 1024**2
+        return available_mb > peak * MEMORY_MARGIN
+
+    def _close_window(
+        self, version: str, state: VersionState, now: float, pending: int
+    ):
+        elapsed = now - state.window_started
+        saturated = state.ticks and state.saturated_ticks / state.ticks >= SATURATION
+        if not saturated or state.frames < MIN_FRAMES:
+            # Za mało pracy, aby ocenić bieżący limit
+            self._reset_window(state)
+            return
+
+        state.windows += 1
+        throughput = state.frames * 3600.0 / elapsed
+        previous = state.estimates.get(state.limit)
+        if previous is not None and previous[0] > 0:
+            throughput = EWMA_ALPHA * throughput + (1 - EWMA_ALPHA) * previous[0]
+        state.estimates[state.limit] = (throughput, state.windows)
+
+        def known(limit: int) -> bool:
+            estimate = state.estimates.get(limit)
+            return estimate is not None and state.windows - estimate[1] < STALE_WINDOWS
+
+        up = state.limit + 1
+        can_grow = up <= self.max_slots and pending > 0 and self._headroom(state)
+        if can_grow and not known(up):
+            target = up
+        elif state.limit > 1 and not known(state.limit - 1):
+            target = state.limit - 1
+        else:
+            candidates = [state.limit] + ([up] if can_grow else [])
+            if state.limit > 1:
+                candidates.append(state.limit - 1)
+            # Przy równym wyniku mniej slotów - mniej pamięci i I/O
+            target = max(
+                candidates, key=lambda limit: (state.estimates[limit][0], -limit)
+            )
+
+        if target != state.limit:
+            self.logger.info(
+                f"Sloty C4D {version}: {state.limit} -> {target} "
+                f"({throughput:.0f} klatek/h przy {state.limit})"
+            )
+            state.limit = target
+            self._slots_gauge.set(target, version=version)
+        self._reset_window(state)
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Zwraca limity i zmierzoną przepustowość według wersji C4D"""
+        with self._lock:
+            return {
+                version: {
+                    "limit": self._limit(state),
+                    "frames_per_hour": (state.estimates.get(state.limit, (None, 0))[0]),
+                }
+                for version, state in self._states.items()
+            }
@@ -0,0 +1,393 @@
+"""
+Lokalne API HTTP/JSON przed QueueManager.
+
+Endpointy:
+    GET  /health                  - stan kolejki i limitów
+    GET  /tasks[?status=pending]  - lista zadań
+    GET  /tasks/<id>              - status pojedynczego zadania (z walidacją)
+    POST /tasks                   - zgłoszenie zadania (obiekt) lub wielu
+                                    (lista albo {"tasks": [...]})
+    POST /tasks/<id>/cancel       - anulowanie zadania PENDING
+    POST /queue/order             - {"task_ids": [...]} na początek kolejki
+    POST /queue/pause             - wstrzymanie kolejki (zamraża trwające rendery)
+    POST /queue/resume            - wznowienie kolejki
+    GET  /metrics                 - metryki silnika w formacie Prometheus
+
+Zgłoszone zadania są walidowane asynchronicznie w puli wątków; dopiero
+poprawne trafiają do kolejki. Stan walidacji przyjętych zadań jest usuwany
+po dodaniu ich do kolejki, a odrzucone zadania pamiętane są (do
+REJECTED_KEEP najnowszych) tylko na potrzeby GET /tasks/<id>. Gdy liczba
+oczekujących zadań przekroczy limit, API odpowiada 429 z nagłówkiem
+Retry-After.
+"""
+
+import concurrent.futures
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from core.bulk_import import task_from_payload
+from core.config import get_config
+from core.queue_manager import QueueManager
+from core.render_metrics import get_render_stats
+from models.task import RenderTask, TaskStatus
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+
+# Liczba ostatnio odrzuconych zadań, których status zwraca API
+REJECTED_KEEP = 1000
+
+
+class ApiError(Exception):
+    """Błąd żądania API zwracany klientowi jako JSON"""
+
+    def __init__(self, status: HTTPStatus, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.extra = extra
+
+
+class QueueApiServer:
+    def __init__(
+        self,
+        queue_manager: QueueManager,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        validation_workers: int = 4,
+    ):
+        config = get_config()
+        _, default_host, default_port, default_max_pending = config.get_api_settings()
+        self.queue_manager = queue_manager
+        self.host = host or default_host
+        self.port = default_port if port is None else port
+        self.max_pending = max_pending or default_max_pending
+
+        log_to_file, log_file_path = config.get_logging_settings()
+        self.logger = setup_logger("api_server", log_to_file, log_file_path)
+
+        # Stan walidacji zgłoszeń: id -> {"state": ..., "issues": [...]}
+        self._validation: Dict[str, Dict[str, Any]] = {}
+        self._rejected: "OrderedDict[str, RenderTask]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=validation_workers, thread_name_prefix="api-validation"
+        )
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Uruchamia serwer HTTP w wątku w tle"""
+        handler = type("BoundApiRequestHandler", (ApiRequestHandler,), {"api": self})
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        # Port 0 oznacza losowy wolny port - zapamiętaj faktycznie przydzielony
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="api-server", daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f"API HTTP nasłuchuje na http://{self.host}:{self.port}")
+
+    def stop(self):
+        """Zatrzymuje serwer HTTP i pulę walidacji"""
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.logger.info("Zatrzymano API HTTP")
+
+    # --- Operacje API ---
+
+    def validating_count(self) -> int:
+        with self._lock:
+            return self._validating_count()
+
+    def _validating_count(self) -> int:
+        return sum(
+            1 for state in self._validation.values() if state["state"] == "validating"
+        )
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "pending": self.queue_manager.pending_count(),
+            "validating": self.validating_count(),
+            "max_pending": self.max_pending,
+            "processing": self.queue_manager.is_processing,
+            "paused": self.queue_manager.is_paused,
+            "render_slots": self.queue_manager.concurrency.snapshot(),
+            "volumes": self.queue_manager.volumes.snapshot(),
+        }
+
+    def submit(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Przyjmuje zgłoszenia i kolejkuje ich asynchroniczną walidację"""
+        tasks = []
+        for index, payload in enumerate(payloads):
+            try:
+                tasks.append(task_from_payload(payload))
+            except (ValueError, TypeError) as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Zadanie #{index}: {e}")
+        self._check_ids(tasks)
+
+        with self._lock:
+            # Backpressure: oczekujące + w trakcie walidacji + nowe <= limit
+            queued = self.queue_manager.pending_count() + self._validating_count()
+            if queued + len(tasks) > self.max_pending:
+                raise ApiError(
+                    HTTPStatus.TOO_MANY_REQUESTS,
+                    "Kolejka jest przepełniona",
+                    pending=queued,
+                    max_pending=self.max_pending,
+                    retry_after=30,
+                )
+            for task in tasks:
+                self._validation[task.id] = {"state": "validating", "issues": []}
+
+        for task in tasks:
+            self._executor.submit(self._validate_and_enqueue, task)
+        self.logger.info(f"API: przyjęto {len(tasks)} zgłoszeń do walidacji")
+        return [
+            {"id": task.id, "name": task.name, "validation": "validating"}
+            for task in tasks
+        ]
+
+    def _check_ids(self, tasks: List[RenderTask]):
+        """Sprawdza unikalność ID i to, czy zależności wskazują znane zadania"""
+        known = {task.id for task in self.queue_manager.get_tasks()}
+        with self._lock:
+            known |= set(self._validation)
+        batch = set()
+        for task in tasks:
+            if task.id in known or task.id in batch:
+                raise ApiError(
+                    HTTPStatus.CONFLICT, f"Zadanie o ID {task.id} już istnieje"
+                )
+            batch.add(task.id)
+        for task in tasks:
+            unknown = [
+                task_id
+                for task_id in task.depends_on
+                if task_id not in known and task_id not in batch
+            ]
+            if unknown:
+                raise ApiError(
+                    HTTPStatus.BAD_REQUEST,
+                    f"Nieznane zależności zadania {task.name}: {', '.join(unknown)}",
+                )
+
+    def _validate_and_enqueue(self, task: RenderTask):
+        """Waliduje zadanie w puli wątków i dodaje poprawne do kolejki"""
+        controller = self.queue_manager.c4d_controller
+        with self._lock:
+            rejected = [
+                task_id for task_id in task.depends_on if task_id in self._rejected
+            ]
+        try:
+            if rejected:
+                issues = [f"Zależność odrzucona przy walidacji: {', '.join(rejected)}"]
+            else:
+                issues = controller.validate_cinema4d_path(task.cinema4d_version)
+            if not issues:
+                issues = controller.validate_project(task)
+        except Exception as e:
+            issues = [f"Błąd walidacji: {e}"]
+
+        if issues:
+            with self._lock:
+                self._validation[task.id] = {"state": "rejected", "issues": issues}
+                self._rejected[task.id] = task
+                while len(self._rejected) > REJECTED_KEEP:
+                    oldest, _ = self._rejected.popitem(last=False)
+                    self._validation.pop(oldest, None)
+            self.logger.warning(f"API: odrzucono zadanie {task.name}: {issues}")
+            # Zadania zależne, które już przeszły walidację, nie wykonają się
+            self.queue_manager.settle_dependents(
+                [replace(task, status=TaskStatus.FAILED)]
+            )
+            return
+
+        self.queue_manager.add_task(task)
+        with self._lock:
+            # Zadanie jest w kolejce - brak wpisu oznacza walidację zakończoną sukcesem
+            self._validation.pop(task.id, None)
+            # Zależność mogła zostać odrzucona w trakcie walidacji tego zadania
+            rejected = [
+                replace(self._rejected[task_id], status=TaskStatus.FAILED)
+                for task_id in task.depends_on
+                if task_id in self._rejected
+            ]
+        if rejected:
+            self.queue_manager.settle_dependents(rejected)
+
+    def task_status(self, task: RenderTask) -> Dict[str, Any]:
+        with self._lock:
+            validation = self._validation.get(task.id, {"state": "accepted"})
+        return {
+            "id": task.id,
+            "name": task.name,
+            "status": task.status.value,
+            "suspended": task.suspended,
+            "depends_on": task.depends_on,
+            "validation": validation["state"],
+            "issues": validation.get("issues", []),
+            "c4d_file_path": task.c4d_file_path,
+            "output_folder": task.output_folder,
+            "cinema4d_version": task.cinema4d_version,
+            "start_frame": task.start_frame,
+            "end_frame": task.end_frame,
+            "created_at": task.created_at.isoformat() if task.created_at else None,
+            "started_at": task.started_at.isoformat() if task.started_at else None,
+            "completed_at": (
+                task.completed_at.isoformat() if task.completed_at else None
+            ),
+            "duration": task.duration,
+            "error_message": task.error_message,
+        }
+
+    def get_task(self, task_id: str) -> Dict[str, Any]:
+        task = self.queue_manager.find_task(task_id)
+        if task is None:
+            with self._lock:
+                task = self._rejected.get(task_id)
+                validating = self._validation.get(task_id, {}).get("state")
+            if task is None and validating == "validating":
+                return {"id": task_id, "validation": "validating", "issues": []}
+        if task is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Nie znaleziono zadania: {task_id}")
+        return self.task_status(task)
+
+    def list_tasks(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        tasks = self.queue_manager.get_tasks()
+        if status:
+            tasks = [task for task in tasks if task.status.value == status]
+        return [self.task_status(task) for task in tasks]
+
+    def cancel(self, task_id: str) -> Dict[str, Any]:
+        task = self.queue_manager.find_task(task_id)
+        if task is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Nie znaleziono zadania: {task_id}")
+        if not self.queue_manager.cancel_task(task.id):
+            raise ApiError(
+                HTTPStatus.CONFLICT,
+                f"Można anulować tylko zadania 'pending' (status: {task.status.value})",
+            )
+        return self.task_status(task)
+
+    def metrics(self) -> str:
+        """Zwraca metryki silnika i kolejki w formacie tekstowym Prometheus"""
+        # Statystyki renderowania rejestrują swoje metryki przy utworzeniu
+        get_render_stats()
+        registry = get_metrics()
+        registry.gauge("c4d_queue_pending", "Zadania oczekujące w kolejce").set(
+            self.queue_manager.pending_count()
+        )
+        return registry.render_prometheus()
+
+    def reorder(self, task_ids: List[str]) -> Dict[str, Any]:
+        if not isinstance(task_ids, list):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "task_ids musi być listą")
+        moved = self.queue_manager.reorder_tasks([str(task_id) for task_id in task_ids])
+        return {"moved": moved}
+
+    def set_paused(self, paused: bool) -> Dict[str, Any]:
+        if paused:
+            self.queue_manager.pause_queue()
+        else:
+            self.queue_manager.resume_queue()
+        return self.health()
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    api: QueueApiServer = None
+    server_version = "C4DBatchRendererAPI/1.0"
+
+    def log_message(self, format, *args):
+        self.api.logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: HTTPStatus, data: Any, headers: Dict = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status: HTTPStatus, text: str, content_type: str):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw.decode("utf-8") or "null")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Niepoprawny JSON: {e}")
+
+    def _handle(self, method: str):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if method == "GET" and parts == ["metrics"]:
+                self._send_text(
+                    HTTPStatus.OK,
+                    self.api.metrics(),
+                    "text/plain; version=0.0.4; charset=utf-8",
+                )
+                return
+            status, data = self._route(method, parts, parse_qs(url.query))
+            self._send_json(status, data)
+        except ApiError as e:
+            headers = {}
+            if "retry_after" in e.extra:
+                headers["Retry-After"] = str(e.extra["retry_after"])
+            self._send_json(e.status, {"error": e.message, **e.extra}, headers)
+        except Exception as e:
+            self.api.logger.error(f"API: błąd obsługi żądania {self.path}: {e}")
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+    def _route(self, method: str, parts: List[str], query: Dict[str, List[str]]):
+        if method == "GET" and parts == ["health"]:
+            return HTTPStatus.OK, self.api.health()
+        if method == "GET" and parts == ["tasks"]:
+            status = query.get("status", [None])[0]
+            return HTTPStatus.OK, {"tasks": self.api.list_tasks(status)}
+        if method == "GET" and len(parts) == 2 and parts[0] == "tasks":
+            return HTTPStatus.OK, self.api.get_task(parts[1])
+        if method == "POST" and parts == ["tasks"]:
+            payload = self._read_json()
+            if isinstance(payload, dict) and "tasks" in payload:
+                payload = payload["tasks"]
+            payloads = payload if isinstance(payload, list) else [payload]
+            if not payloads:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Brak zadań w zgłoszeniu")
+            return HTTPStatus.ACCEPTED, {"tasks": self.api.submit(payloads)}
+        if method == "POST" and len(parts) == 3 and parts[::2] == ["tasks", "cancel"]:
+            return HTTPStatus.OK, self.api.cancel(parts[1])
+        if method == "POST" and parts == ["queue", "order"]:
+            payload = self._read_json()
+            if not isinstance(payload, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'Oczekiwano {"task_ids": [...]}')
+            return HTTPStatus.OK, self.api.reorder(payload.get("task_ids"))
+        if method == "POST" and parts in (["queue", "pause"], ["queue", "resume"]):
+            return HTTPStatus.OK, self.api.set_paused(parts[1] == "pause")
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Nieznany endpoint: {method} {self.path}")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
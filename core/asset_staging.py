@@ -0,0 +1,390 @@
+"""
+Lokalna kopia (staging) projektów i tekstur z magazynu sieciowego.
+
+Przed renderowaniem projekt i jego zależności o względnych ścieżkach są
+kopiowane równolegle na lokalny dysk, a C4D dostaje ścieżkę do kopii.
+Pliki trafiają do wspólnego bufora LRU (klucz: ścieżka, rozmiar, mtime),
+więc kolejne zadania na węźle korzystające z tych samych zasobów nie czytają
+ich ponownie z udziału. Każde zadanie dostaje własny katalog z dowiązaniami
+twardymi do plików bufora, odtwarzający układ folderu projektu.
+
+Zasoby o ścieżkach bezwzględnych (np. biblioteka tekstur na udziale UNC)
+trafiają do katalogu mirror/ kopii, odtwarzającego ich pełną ścieżkę, a kopia
+projektu jest zapisywana przez c4dpy (c4d_scripts/relink_assets.py) ze
+ścieżkami wskazującymi na nie. Bez c4dpy C4D wczytałby je spod oryginalnej
+ścieżki, więc nie są kopiowane. Zasoby brakujące lub niedające się
+skopiować są pomijane z ostrzeżeniem - C4D szuka ich jak przy renderze
+z oryginału.
+"""
+
+import contextlib
+import hashlib
+import json
+import ntpath
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from core.config import get_config
+from core.dependency_scanner import get_dependency_scanner
+from models.task import RenderTask
+from utils.atomic_file import (
+    ChecksumMismatchError,
+    atomic_write_json,
+    copy_file_verified,
+)
+from utils.logger import setup_logger
+
+COPY_ATTEMPTS = 2
+INDEX_FILE = "index.json"
+MIRROR_DIR = "mirror"
+RELINK_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "c4d_scripts",
+    "relink_assets.py",
+)
+
+
+class StagingError(Exception):
+    """Nie udało się przygotować lokalnej kopii projektu"""
+
+
+@dataclass
+class StagedProject:
+    """Lokalna kopia projektu przygotowana dla jednego zadania"""
+
+    project_path: str
+    view_dir: str
+    keys: List[str] = field(default_factory=list)
+
+
+def _is_absolute(reference: str) -> bool:
+    return os.path.isabs(reference) or bool(ntpath.splitdrive(reference)[0])
+
+
+def _mirror_path(reference: str) -> str:
+    """Zwraca ścieżkę względną kopii zasobu o ścieżce bezwzględnej
+
+    "C:\\tex\\a.jpg" -> mirror/C/tex/a.jpg,
+    "\\\\nas\\lib\\a.exr" -> mirror/nas/lib/a.exr
+    """
+    drive, rest = ntpath.splitdrive(reference.replace("\\", "/"))
+    parts = (drive.replace(":", "") + "/" + rest).split("/")
+    return os.path.join(
+        MIRROR_DIR, *(part for part in parts if part not in ("", ".", ".."))
+    )
+
+
+def _file_key(path: str, size: int, mtime_ns: int) -> str:
+    """Klucz pliku w buforze - zmiana rozmiaru lub mtime unieważnia kopię"""
+    raw = f"{os.path.normcase(os.path.abspath(path))}|{size}|{mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(source: str, target: str):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class StagingCache:
+    """Bufor LRU plików projektów na lokalnym dysku, wspólny dla zadań węzła"""
+
+    def __init__(self, root: str, max_bytes: int, workers: int = 4):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("asset_staging", log_to_file, log_file_path)
+
+        self.root = root
+        self.files_dir = os.path.join(root, "files")
+        self.views_dir = os.path.join(root, "views")
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.max_bytes = max_bytes
+        os.makedirs(self.files_dir, exist_ok=True)
+        os.makedirs(self.views_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # klucz -> {"source", "blob", "size", "sha1", "last_used"}
+        self._entries: Dict[str, Dict] = {}
+        # Liczba zadań korzystających z pliku - przypięte pliki nie są usuwane
+        self._pins: Dict[str, int] = {}
+        # Pliki kopiowane właśnie przez inny wątek
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="staging-copy"
+        )
+        self._load_index()
+        self._remove_stale_views()
+
+    # --- Indeks ---
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Pominięto uszkodzony indeks kopii lokalnych: {e}")
+            return
+        self._entries = {
+            key: entry
+            for key, entry in entries.items()
+            if os.path.exists(os.path.join(self.files_dir, entry["blob"]))
+        }
+
+    def _save_index(self):
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._entries.items()}
+        try:
+            atomic_write_json(self.index_path, entries, indent=None)
+        except OSError as e:
+            self.logger.warning(f"Nie udało się zapisać indeksu kopii lokalnych: {e}")
+
+    def _remove_stale_views(self):
+        """Usuwa katalogi zadań pozostawione przez zakończone procesy"""
+        for entry in os.scandir(self.views_dir):
+            pid = entry.name.split("-", 1)[0]
+            if not pid.isdigit() or not psutil.pid_exists(int(pid)):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    # --- Bufor plików ---
+
+    def _evict(self, needed: int):
+        """Usuwa najdawniej używane, nieprzypięte pliki, aby zmieścić needed"""
+        with self._lock:
+            total = sum(entry["size"] for entry in self._entries.values())
+            candidates = sorted(
+                (entry["last_used"], key)
+                for key, entry in self._entries.items()
+                if not self._pins.get(key)
+            )
+            evicted = []
+            for _, key in candidates:
+                if total + needed <= self.max_bytes:
+                    break
+                entry = self._entries.pop(key)
+                total -= entry["size"]
+                evicted.append(entry)
+        for entry in evicted:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.files_dir, entry["blob"]))
+            self.logger.info(f"Usunięto z kopii lokalnej: {entry['source']}")
+
+    def _acquire_file(self, source: str) -> Tuple[str, str]:
+        """Zwraca (klucz, ścieżka kopii) pliku, kopiując go w razie potrzeby
+
+        Plik zostaje przypięty do czasu zwolnienia zadania.
+        """
+        stat = os.stat(source)
+        key = _file_key(source, stat.st_size, stat.st_mtime_ns)
+        blob = key + os.path.splitext(source)[1].lower()
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["last_used"] = time.time()
+                    self._pins[key] = self._pins.get(key, 0) + 1
+                    return key, os.path.join(self.files_dir, entry["blob"])
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            # Ten sam plik kopiuje inne zadanie - poczekaj na jego wynik
+            pending.wait()
+
+        try:
+            if stat.st_size > self.max_bytes:
+                raise StagingError(f"Plik większy niż bufor lokalny: {source}")
+            self._evict(stat.st_size)
+            target = os.path.join(self.files_dir, blob)
+            for attempt in range(COPY_ATTEMPTS):
+                try:
+                    digest = copy_file_verified(source, target)
+                    break
+                except ChecksumMismatchError:
+                    if attempt == COPY_ATTEMPTS - 1:
+                        raise
+            with self._lock:
+                self._entries[key] = {
+                    "source": source,
+                    "blob": blob,
+                    "size": stat.st_size,
+                    "sha1": digest,
+                    "last_used": time.time(),
+                }
+                self._pins[key] = self._pins.get(key, 0) + 1
+            self.logger.info(f"Skopiowano lokalnie: {source}")
+            return key, target
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def _unpin(self, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                count = self._pins.get(key, 0) - 1
+                if count > 0:
+                    self._pins[key] = count
+                else:
+                    self._pins.pop(key, None)
+
+    # --- Zadania ---
+
+    def _layout(self, task: RenderTask) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Zwraca pliki do skopiowania i zasoby do przepięcia
+
+        Pliki: ścieżka względna w kopii -> źródło, przepięcia: referencja
+        -> ścieżka względna w kopii.
+        """
+        project = os.path.abspath(task.c4d_file_path)
+        project_dir = os.path.dirname(project)
+        report = get_dependency_scanner().scan(project)
+        for reference in report.missing:
+            # C4D poszuka zasobu jak przy renderze z oryginału
+            self.logger.warning(
+                f"Pominięto w kopii lokalnej brakujący zasób: {reference}"
+            )
+        c4dpy_path = self.config.get_asset_settings()[2]
+        can_relink = bool(c4dpy_path) and os.path.exists(c4dpy_path)
+
+        layout = {os.path.basename(project): project}
+        relinks = {}
+        for reference, path in report.resolved.items():
+            if _is_absolute(reference):
+                if not can_relink:
+                    # Bez przepięcia C4D i tak wczyta zasób spod oryginalnej ścieżki
+                    continue
+                relative = _mirror_path(reference)
+                relinks[reference] = relative
+            else:
+                relative = os.path.relpath(path, project_dir)
+                if relative.startswith(os.pardir):
+                    # Zasób z asset_search_paths - C4D znajdzie go w tex/ kopii
+                    relative = os.path.join("tex", os.path.basename(path))
+            layout[relative] = path
+        return layout, relinks
+
+    def _relink(self, staged: StagedProject, relinks: Dict[str, str]):
+        """Zapisuje kopię projektu ze ścieżkami zasobów w katalogu mirror/"""
+        c4dpy_path = self.config.get_asset_settings()[2]
+        mapping = {
+            reference: os.path.join(staged.view_dir, relative)
+            for reference, relative in relinks.items()
+        }
+        mapping_path = os.path.join(staged.view_dir, "relink.json")
+        source = staged.project_path + ".orig"
+        # Projekt w kopii jest dowiązaniem do pliku bufora - zapis go nie zmienia
+        os.replace(staged.project_path, source)
+        try:
+            atomic_write_json(mapping_path, mapping, indent=None)
+            result = subprocess.run(
+                [c4dpy_path, RELINK_SCRIPT, source, staged.project_path, mapping_path],
+                capture_output=True,
+                text=True,
+                timeout=600,
+            )
+            if result.returncode != 0 or not os.path.exists(staged.project_path):
+                raise StagingError(
+                    result.stderr.strip()
+                    or f"c4dpy zakończył się kodem {result.returncode}"
+                )
+        except (OSError, subprocess.SubprocessError, StagingError) as e:
+            # Kopia bez przepięcia - zasoby bezwzględne C4D wczyta z oryginału
+            self.logger.warning(f"Nie przepięto zasobów bezwzględnych: {e}")
+            with contextlib.suppress(OSError):
+                os.replace(source, staged.project_path)
+            return
+        self.logger.info(
+            f"Przepięto zasoby bezwzględne na kopię lokalną: {len(relinks)}"
+        )
+
+    def stage(self, task: RenderTask) -> StagedProject:
+        """Kopiuje projekt i jego zależności; zwraca ścieżkę do lokalnej kopii"""
+        started = time.time()
+        layout, relinks = self._layout(task)
+        view_dir = os.path.join(
+            self.views_dir, f"{os.getpid()}-{task.id}-{uuid.uuid4().hex[:8]}"
+        )
+        staged = StagedProject(
+            project_path=os.path.join(view_dir, os.path.basename(task.c4d_file_path)),
+            view_dir=view_dir,
+        )
+
+        futures = {
+            relative: self._executor.submit(self._acquire_file, source)
+            for relative, source in layout.items()
+        }
+        project_name = os.path.basename(task.c4d_file_path)
+        errors = []
+        for relative, future in futures.items():
+            try:
+                key, blob_path = future.result()
+                staged.keys.append(key)
+                _link_or_copy(blob_path, os.path.join(view_dir, relative))
+            except Exception as e:
+                if relative == project_name:
+                    errors.append(f"{layout[relative]}: {e}")
+                else:
+                    # Zasób zostaje w oryginalnej lokalizacji
+                    self.logger.warning(
+                        f"Pominięto w kopii lokalnej {layout[relative]}: {e}"
+                    )
+                    relinks = {
+                        reference: path
+                        for reference, path in relinks.items()
+                        if path != relative
+                    }
+        self._save_index()
+
+        if errors:
+            self.release(staged)
+            raise StagingError("; ".join(errors))
+        if relinks:
+            self._relink(staged, relinks)
+
+        self.logger.info(
+            f"Przygotowano lokalną kopię projektu ({len(layout)} plików) "
+            f"w {time.time() - started:.1f}s"
+        )
+        return staged
+
+    def release(self, staged: StagedProject):
+        """Zwalnia kopię zadania - pliki zostają w buforze dla kolejnych zadań"""
+        shutil.rmtree(staged.view_dir, ignore_errors=True)
+        self._unpin(staged.keys)
+
+
+_staging_cache: Optional[StagingCache] = None
+_staging_lock = threading.Lock()
+
+
+def get_staging_cache() -> Optional[StagingCache]:
+    """Zwraca wspólny bufor kopii lokalnych lub None, jeśli jest wyłączony"""
+    global _staging_cache
+    enabled, staging_dir, max_gb, workers = get_config().get_staging_settings()
+    if not enabled:
+        return None
+    with _staging_lock:
+        if _staging_cache is None:
+            root = staging_dir or os.path.join(
+                tempfile.gettempdir(), "c4d_render_staging"
+            )
+            _staging_cache = StagingCache(root, int(max_gb * 1024**3), workers)
+        return _staging_cache
@@ -0,0 +1,279 @@
+"""
+Masowy import zadań renderowania.
+
+Źródła:
+    - folder z plikami .c4d (rekurencyjnie),
+    - manifest CSV (nagłówek: name, c4d_file_path, output_folder,
+      cinema4d_version, frames oraz kolumny render_settings, np. threads),
+    - manifest JSON: lista zadań, {"tasks": [...]} albo szablon z przemiataniem
+      parametrów {"template": {...}, "sweep": {"frames": [...], ...}}.
+
+Zgłoszenie może nadać zadaniu własne "id" i wskazać "depends_on" - listę ID
+zadań (z tego samego importu lub już w kolejce), które muszą się zakończyć
+sukcesem wcześniej; w CSV ID rozdziela się średnikiem.
+
+Zadania są walidowane równolegle w puli wątków i dodawane do kolejki
+jednym wywołaniem QueueManager.add_tasks.
+"""
+
+import copy
+import csv
+import itertools
+import json
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.render_command import FRAME_ORDERS, SETTING_FLAGS, frame_set_fields
+from models.task import RenderTask
+
+REQUIRED_FIELDS = ("c4d_file_path", "cinema4d_version")
+
+# Krótsze nazwy kolumn akceptowane w manifestach
+FIELD_ALIASES = {
+    "file": "c4d_file_path",
+    "project": "c4d_file_path",
+    "output": "output_folder",
+    "version": "cinema4d_version",
+}
+TASK_FIELDS = (
+    "id",
+    "name",
+    "c4d_file_path",
+    "output_folder",
+    "cinema4d_version",
+    "frames",
+)
+# ID trafia do nazwy pliku zadania
+TASK_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+SETTING_KEYS = {key for key, _, _ in SETTING_FLAGS} | {
+    "multipass_output",
+    "frame_order",
+}
+
+
+@dataclass
+class ImportResult:
+    """Wynik importu: poprawne zadania i odrzucone (nazwa -> problemy)"""
+
+    tasks: List[RenderTask] = field(default_factory=list)
+    rejected: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def task_from_payload(payload: Dict[str, Any]) -> RenderTask:
+    """Tworzy RenderTask ze słownika (API, manifest, szablon)"""
+    if not isinstance(payload, dict):
+        raise ValueError("Zadanie musi być obiektem JSON")
+    missing = [name for name in REQUIRED_FIELDS if not payload.get(name)]
+    if missing:
+        raise ValueError(f"Brak wymaganych pól: {', '.join(missing)}")
+    render_settings = payload.get("render_settings") or {}
+    if not isinstance(render_settings, dict):
+        raise ValueError("render_settings musi być obiektem JSON")
+    frame_order = render_settings.get("frame_order")
+    if frame_order is not None and frame_order not in FRAME_ORDERS:
+        raise ValueError(f"Nieznana kolejność klatek: {frame_order}")
+
+    task_id = str(payload.get("id") or uuid.uuid4())
+    if not TASK_ID_PATTERN.match(task_id):
+        raise ValueError(f"Niepoprawne ID zadania: {task_id}")
+    frame_set, start_frame, end_frame = frame_set_fields(payload.get("frames"))
+    return RenderTask(
+        id=task_id,
+        name=payload.get("name") or payload["c4d_file_path"],
+        c4d_file_path=payload["c4d_file_path"],
+        output_folder=payload.get("output_folder", ""),
+        cinema4d_version=str(payload["cinema4d_version"]),
+        start_frame=start_frame,
+        end_frame=end_frame,
+        frame_set=frame_set,
+        render_settings=render_settings,
+        depends_on=dependency_list(payload.get("depends_on")),
+    )
+
+
+def dependency_list(value: Any) -> List[str]:
+    """Zamienia depends_on (lista albo tekst "a;b" / "a,b") na listę ID"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r"[;,]", value)
+    if not isinstance(value, list):
+        raise ValueError("depends_on musi być listą ID zadań")
+    return [str(task_id).strip() for task_id in value if str(task_id).strip()]
+
+
+def _setting_value(text: str) -> Any:
+    """Zamienia wartość z komórki CSV na typ oczekiwany przez render_settings"""
+    lowered = text.strip().lower()
+    if lowered in ("true", "yes", "tak"):
+        return True
+    if lowered in ("false", "no", "nie", ""):
+        return None
+    try:
+        return int(lowered)
+    except ValueError:
+        return text.strip()
+
+
+def _normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Ujednolica nazwy pól i przenosi ustawienia renderowania do render_settings"""
+    if not isinstance(row, dict):
+        raise ValueError(f"Zadanie w manifeście musi być obiektem, nie {row!r}")
+    payload: Dict[str, Any] = {}
+    settings = dict(row.get("render_settings") or {})
+    for key, value in row.items():
+        key = FIELD_ALIASES.get(key, key)
+        if key == "render_settings" or value is None:
+            continue
+        if key in SETTING_KEYS:
+            value = _setting_value(value) if isinstance(value, str) else value
+            if value is not None:
+                settings[key] = value
+        else:
+            payload[key] = value
+    payload["render_settings"] = settings
+    return payload
+
+
+def expand_sweep(template: Dict[str, Any], sweep: Dict[str, List[Any]]):
+    """Rozwija szablon zadania dla wszystkich kombinacji wartości parametrów
+
+    Pola tekstowe szablonu mogą odwoływać się do parametrów, np.
+    "output_folder": "render/{cinema4d_version}/{frames}".
+    Rzuca ValueError dla odwołania do nieznanego parametru.
+    """
+    if not isinstance(template, dict) or not isinstance(sweep, dict):
+        raise ValueError("template i sweep manifestu muszą być obiektami")
+    for key, values in sweep.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Wartości parametru {key} muszą być listą")
+    keys = list(sweep)
+    payloads = []
+    for index, values in enumerate(itertools.product(*(sweep[k] for k in keys))):
+        combination = dict(zip(keys, values))
+        payload = copy.deepcopy(template)
+        payload.update(combination)
+        placeholders = {**combination, "index": index}
+        for key in TASK_FIELDS:
+            if isinstance(payload.get(key), str) and key not in combination:
+                try:
+                    payload[key] = payload[key].format_map(placeholders)
+                except KeyError as e:
+                    raise ValueError(
+                        f"Pole {key} odwołuje się do nieznanego parametru {e}"
+                        f" (dostępne: {', '.join(placeholders)})"
+                    )
+                except (IndexError, ValueError) as e:
+                    raise ValueError(f"Niepoprawny szablon pola {key}: {e}")
+        if "name" not in template:
+            suffix = ", ".join(f"{k}={v}" for k, v in combination.items())
+            payload["name"] = f"{payload.get('c4d_file_path', '')} [{suffix}]"
+        payloads.append(_normalize(payload))
+    return payloads
+
+
+def payloads_from_folder(
+    root: str,
+    cinema4d_version: str,
+    output_root: Optional[str] = None,
+    frames: Optional[str] = None,
+    recursive: bool = True,
+) -> List[Dict[str, Any]]:
+    """Zwraca zgłoszenia dla plików .c4d w folderze
+
+    Bez output_root klatki trafiają do podfolderu "render" obok projektu,
+    z nim - do odpowiadającego mu miejsca w drzewie output_root.
+    """
+    payloads = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+        if not recursive:
+            subdirs.clear()
+        for filename in sorted(files):
+            if not filename.lower().endswith(".c4d"):
+                continue
+            path = os.path.join(directory, filename)
+            relative = os.path.splitext(os.path.relpath(path, root))[0]
+            if output_root:
+                output_folder = os.path.join(output_root, relative)
+            else:
+                output_folder = os.path.join(directory, "render")
+            payloads.append(
+                {
+                    "name": relative.replace(os.sep, "/"),
+                    "c4d_file_path": path,
+                    "output_folder": output_folder,
+                    "cinema4d_version": cinema4d_version,
+                    "frames": frames,
+                    "render_settings": {},
+                }
+            )
+    return payloads
+
+
+def payloads_from_manifest(path: str) -> List[Dict[str, Any]]:
+    """Wczytuje zgłoszenia z manifestu CSV lub JSON"""
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return [_normalize(row) for row in csv.DictReader(f)]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "template" in data:
+        return expand_sweep(data["template"], data.get("sweep") or {})
+    if isinstance(data, dict):
+        data = data.get("tasks", [])
+    if not isinstance(data, list):
+        raise ValueError("Manifest JSON musi zawierać listę zadań")
+    return [_normalize(item) for item in data]
+
+
+def build_tasks(
+    payloads: List[Dict[str, Any]], existing_ids: Iterable[str] = ()
+) -> ImportResult:
+    """Tworzy zadania ze zgłoszeń; niepoprawne trafiają do rejected
+
+    existing_ids - ID zadań już obecnych w kolejce (nie mogą się powtórzyć).
+    """
+    result = ImportResult()
+    used_ids = set(existing_ids)
+    for index, payload in enumerate(payloads):
+        try:
+            task = task_from_payload(payload)
+            if task.id in used_ids:
+                raise ValueError(f"Zadanie o ID {task.id} już istnieje")
+            used_ids.add(task.id)
+            result.tasks.append(task)
+        except (ValueError, TypeError) as e:
+            name = payload.get("name") or payload.get("c4d_file_path") or f"#{index}"
+            result.rejected[str(name)] = [str(e)]
+    return result
+
+
+def validate_tasks(result: ImportResult, controller, workers: int = 8) -> ImportResult:
+    """Waliduje zadania równolegle; odrzucone usuwa z result.tasks"""
+
+    def validate(task: RenderTask) -> List[str]:
+        try:
+            issues = controller.validate_cinema4d_path(task.cinema4d_version)
+            return issues or controller.validate_project(task)
+        except Exception as e:
+            return [f"Błąd walidacji: {e}"]
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="import-validation"
+    ) as executor:
+        issues = list(executor.map(validate, result.tasks))
+
+    valid = []
+    for task, task_issues in zip(result.tasks, issues):
+        if task_issues:
+            result.rejected[task.name] = task_issues
+        else:
+            valid.append(task)
+    result.tasks = valid
+    return result
@@ -2,19 +2,46 @@ import logging
 import os
 import subprocess
 import time
+from dataclasses import replace
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from core.config import Config
+from core.asset_staging import StagedProject, get_staging_cache
+from core.config import get_config
+from core.dependency_scanner import get_dependency_scanner
+from core.output_uploader import OutputDelivery, get_output_uploader
+from core.process_launcher import get_process_launcher
+from core.render_command import compile_task
+from core.render_manifest import find_up_to_date, record_render, task_fingerprint
+from core.render_metrics import FrameTimer, get_render_stats
+from core.render_server import (
+    RenderServerError,
+    get_render_server_pool,
+    server_supports,
+)
+from core.task_batching import (
+    distribute_outputs,
+    frame_owner,
+    merge_batch,
+    split_shared_phases,
+)
 from models.task import RenderTask
 from utils.logger import setup_logger
+from utils.tracing import get_tracer
+from utils.process_accounting import (
+    ProcessTreeSampler,
+    merge_usage_summaries,
+    process_identity,
+)
 
 
 class Cinema4DController:
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
         self.c4d_installations = self.config.get_c4d_versions()
         self.on_log_message: Optional[Callable[[str], None]] = None
+        # Wywoływane po uruchomieniu procesu C4D (np. aby utrwalić jego PID)
+        self.on_process_started: Optional[Callable[[RenderTask], None]] = None
 
         # Inicjalizacja loggera
         log_to_file, log_file_path = self.config.get_logging_settings()
@@ -55,96 +82,338 @@ class Cinema4DController:
             issues.append(f"Plik projektu nie istnieje: {task.c4d_file_path}")
             return issues
 
-        # Tutaj można dodać bardziej zaawansowaną walidację
-        # np. parsowanie pliku C4D w poszukiwaniu referencji do tekstur
+        mode, _, _ = self.config.get_asset_settings()
+        if mode == "off":
+            return issues
+
+        try:
+            report = get_dependency_scanner().scan(task.c4d_file_path)
+        except Exception as e:
+            self.logger.warning(f"Nie udało się przeskanować zależności: {e}")
+            return issues
+
+        self.logger.info(
+            f"Zależności projektu: {len(report.references)} "
+            f"({report.source}{', z bufora' if report.from_cache else ''}), "
+            f"brakujących: {len(report.missing)}"
+        )
+        # Lista z parsera jest heurystyczna - domyślnie blokuje tylko c4dpy
+        blocking = mode == "fail" or (mode == "auto" and report.source == "c4dpy")
+        for reference in report.missing:
+            if blocking:
+                issues.append(f"Brakujący zasób: {reference}")
+            else:
+                self.logger.warning(f"Brakujący zasób: {reference}")
 
         return issues
 
     def render_task(self, task: RenderTask) -> bool:
         """Wykonuje renderowanie zadania"""
+        return self.render_batch([task])[0]
+
+    def render_batch(self, tasks: List[RenderTask]) -> List[bool]:
+        """Renderuje zgodne zadania jednego projektu wspólnym uruchomieniem C4D
+
+        Pierwsze zadanie (lider) prowadzi render - jego proces C4D jest
+        nadzorowany przez kolejkę. Zwraca wynik dla każdego zadania.
+        """
         try:
             # Walidacja ścieżki Cinema 4D
-            issues = self.validate_cinema4d_path(task.cinema4d_version)
+            issues = self.validate_cinema4d_path(tasks[0].cinema4d_version)
             if issues:
-                task.error_message = "\n".join(issues)
-                self.logger.error(f"Błędy walidacji: {task.error_message}")
-                return False
+                for task in tasks:
+                    task.error_message = "\n".join(issues)
+                self.logger.error(f"Błędy walidacji: {tasks[0].error_message}")
+                return [False] * len(tasks)
 
-            c4d_exe = self.c4d_installations.get(task.cinema4d_version)
+            c4d_exe = self.c4d_installations.get(tasks[0].cinema4d_version)
             if not c4d_exe:
                 raise ValueError(
-                    f"Nie znaleziono wersji Cinema 4D: {task.cinema4d_version}"
+                    f"Nie znaleziono wersji Cinema 4D: {tasks[0].cinema4d_version}"
                 )
 
-            # Wykonanie renderowania
-            cmd = [c4d_exe, "-render", task.c4d_file_path]
-
-            # Dodaj parametry z render_settings TYLKO jeśli zostały wybrane w UI
-            if (
-                task.render_settings.get("threads")
-                and task.render_settings["threads"] > 0
-            ):
-                cmd.extend(["-threads", str(task.render_settings["threads"])])
-            if (
-                task.render_settings.get("shutdown")
-                and task.render_settings["shutdown"]
-            ):
-                cmd.append("-shutdown")
-            if task.render_settings.get("quit") and task.render_settings["quit"]:
-                cmd.append("-quit")
-            if task.render_settings.get("use_gpu") and task.render_settings["use_gpu"]:
-                cmd.append("-gpu")
-            if task.render_settings.get("no_gui") and task.render_settings["no_gui"]:
-                cmd.append("cmd-nogui")
-            if (
-                task.render_settings.get("debug_mode")
-                and task.render_settings["debug_mode"]
-            ):
-                cmd.append("cmd-debug")
-            if (
-                task.render_settings.get("show_console")
-                and task.render_settings["show_console"]
-            ):
-                cmd.append("-console")
-            if (
-                task.render_settings.get("log_file")
-                and task.render_settings["log_file"]
-            ):
-                cmd.extend(["-log", task.render_settings["log_file"]])
-            if task.render_settings.get("verbose") and task.render_settings["verbose"]:
-                cmd.append("-verbose")
-            if (
-                task.render_settings.get("memory_limit")
-                and task.render_settings["memory_limit"] > 0
-            ):
-                cmd.extend(["cmd-memory", str(task.render_settings["memory_limit"])])
-            if (
-                task.render_settings.get("priority")
-                and task.render_settings["priority"]
-            ):
-                cmd.extend(["-priority", task.render_settings["priority"]])
-
-            # Dodaj wymagane parametry na końcu
-            cmd.extend(["-verbose", "-console"])
-
-            # Logowanie komendy
-            self.logger.info("=" * 80)
-            self.logger.info("KOMENDA RENDEROWANIA:")
-            self.logger.info(" ".join(cmd))
-            self.logger.info("=" * 80)
-            start_time = time.time()
+            stats = get_render_stats()
+            fingerprints = {}
+            pending = []
+            for task in tasks:
+                started = time.monotonic()
+                fingerprint = self._fingerprint(task, c4d_exe)
+                if fingerprint:
+                    outputs = find_up_to_date(task, fingerprint)
+                    stats.record_phase(task, "verification", time.monotonic() - started)
+                    if outputs is not None:
+                        task.output_files = outputs
+                        message = "Wyniki są aktualne - pominięto renderowanie"
+                        self.logger.info(f"{message}: {task.name}")
+                        if self.on_log_message:
+                            self.on_log_message(message)
+                        continue
+                fingerprints[task.id] = fingerprint
+                pending.append(task)
+            if not pending:
+                return [True] * len(tasks)
+
+            errors = self._render_together(pending, c4d_exe)
+            for task in pending:
+                if task.id in errors:
+                    task.error_message = errors[task.id]
+                    continue
+                if fingerprints[task.id]:
+                    with stats.phase(task, "verification"):
+                        recorded = record_render(task, fingerprints[task.id])
+                    if not recorded:
+                        self.logger.warning(
+                            "Nie zapisano manifestu - brak plików części klatek"
+                        )
+            return [task.id not in errors for task in tasks]
 
+        except Exception as e:
+            error_msg = f"Wyjątek podczas renderowania: {str(e)}"
+            self.logger.error(error_msg)
+            for task in tasks:
+                task.error_message = error_msg
+            return [False] * len(tasks)
+
+    def _render_together(self, tasks: List[RenderTask], c4d_exe: str) -> Dict[str, str]:
+        """Renderuje zadania jedną komendą; zwraca błędy według ID zadania"""
+        lead = tasks[0]
+        batched = len(tasks) > 1
+        shared_before = dict(lead.phase_timings)
+        if batched:
+            self.logger.info(
+                f"Wspólny render {len(tasks)} zadań projektu {lead.c4d_file_path}"
+            )
+        source = merge_batch(tasks) if batched else lead
+        owner = frame_owner(tasks) if batched else None
+
+        staged = self._stage_project(lead)
+        if staged:
+            source = replace(source, c4d_file_path=staged.project_path)
+        source, delivery = self._redirect_output(source)
+        command = compile_task(source, c4d_exe)
+        usages = []
+        rendered = True
+        stats = get_render_stats()
+        try:
+            for argv in command.invocations:
+                if not self._run_invocation(lead, list(argv), usages, owner):
+                    rendered = False
+                    break
+        finally:
+            if staged:
+                get_staging_cache().release(staged)
+            # Klatki wyrenderowane przed błędem też są dostarczane - wznowienie
+            # zadania zacznie się od pierwszej brakującej
+            if delivery:
+                with stats.phase(lead, "upload"):
+                    if not self._finish_delivery(lead, delivery):
+                        rendered = False
+            lead.resource_usage = merge_usage_summaries(usages)
+            if lead.resource_usage:
+                self._log_resource_usage(lead)
+
+        if not batched:
+            return {} if rendered else {lead.id: lead.error_message}
+        errors = distribute_outputs(tasks)
+        split_shared_phases(tasks, shared_before)
+        for task in tasks:
+            # Proces był wspólny - zużycie zasobów dotyczy całej paczki
+            task.resource_usage = dict(lead.resource_usage)
+            if not rendered:
+                errors[task.id] = lead.error_message
+        return errors
+
+    def _fingerprint(self, task: RenderTask, c4d_exe: str) -> Optional[str]:
+        """Zwraca odcisk wejść zadania (None - renderowanie przyrostowe wyłączone)"""
+        if not self.config.get_incremental_render() or not task.output_folder:
+            return None
+        try:
+            return task_fingerprint(task, c4d_exe)
+        except Exception as e:
+            self.logger.warning(f"Nie udało się obliczyć odcisku zadania: {e}")
+            return None
+
+    def _stage_project(self, task: RenderTask) -> Optional[StagedProject]:
+        """Kopiuje projekt na dysk lokalny (jeśli włączono); None - bez kopii"""
+        cache = get_staging_cache()
+        if cache is None:
+            return None
+        try:
+            with get_render_stats().phase(task, "staging"):
+                return cache.stage(task)
+        except Exception as e:
+            self.logger.warning(
+                f"Renderowanie z oryginalnej lokalizacji - kopia lokalna nieudana: {e}"
+            )
+            return None
+
+    def _redirect_output(
+        self, task: RenderTask
+    ) -> Tuple[RenderTask, Optional[OutputDelivery]]:
+        """Kieruje zapis klatek do lokalnego folderu roboczego (jeśli włączono)"""
+        uploader = get_output_uploader()
+        if uploader is None or not task.output_folder:
+            return task, None
+
+        image_dir = uploader.scratch_folder(task.id, "image")
+        folders = {image_dir: task.output_folder}
+        settings = dict(task.render_settings)
+        multipass = settings.get("multipass_output")
+        if multipass:
+            settings["multipass_output"] = uploader.scratch_folder(task.id, "multipass")
+            folders[settings["multipass_output"]] = multipass
+        self.logger.info(f"Zapis lokalny klatek: {image_dir}")
+        return (
+            replace(task, output_folder=image_dir, render_settings=settings),
+            uploader.start_delivery(task.id, folders),
+        )
+
+    def _finish_delivery(self, task: RenderTask, delivery: OutputDelivery) -> bool:
+        """Czeka na wysłanie wszystkich klatek do folderu docelowego"""
+        delivered = delivery.finish()
+        task.output_files = sorted(set(task.output_files) | set(delivery.delivered))
+        self.logger.info(f"Dostarczono plików: {len(delivery.delivered)}")
+        if not delivered:
+            task.error_message = (
+                f"Nie dostarczono {len(delivery.failed)} plików do folderu "
+                f"docelowego: {', '.join(delivery.failed[:5])}"
+            )
+            self.logger.error(task.error_message)
+        return delivered
+
+    def _run_invocation(
+        self,
+        task: RenderTask,
+        cmd: List[str],
+        usages: List[dict],
+        owner: Optional[Callable[[int], RenderTask]] = None,
+    ) -> bool:
+        """Renderuje jedno wywołanie na serwerze renderowania lub w nowym procesie
+
+        owner przypisuje klatki wspólnego renderu do zadań paczki.
+        """
+        enabled = self.config.get_render_server_settings()[0]
+        # Limit pamięci dotyczy jednego zadania, nie współdzielonego serwera
+        if (
+            enabled
+            and server_supports(cmd)
+            and not task.render_settings.get("memory_limit")
+        ):
             try:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1,
-                    universal_newlines=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
+                return self._run_on_server(task, cmd, owner)
+            except RenderServerError as e:
+                self.logger.warning(
+                    f"Serwer renderowania niedostępny - osobny proces C4D: {e}"
                 )
+        return self._run_render_process(task, cmd, usages, owner)
+
+    def _run_on_server(
+        self,
+        task: RenderTask,
+        cmd: List[str],
+        owner: Optional[Callable[[int], RenderTask]] = None,
+    ) -> bool:
+        """Wysyła wywołanie do serwera renderowania zamiast uruchamiać Commandline
+
+        RenderServerError przy starcie serwera oznacza, że nic nie zostało
+        wyrenderowane i można uruchomić zwykły proces. Zużycie zasobów nie
+        jest rozliczane - liczniki procesu serwera obejmują wiele zadań.
+        """
+        pool = get_render_server_pool()
+        stats = get_render_stats()
+        spawn_started = time.monotonic()
+        server = pool.acquire(
+            task.cinema4d_version, cmd[0], task.render_settings.get("priority")
+        )
+        stats.record_phase(task, "spawn", time.monotonic() - spawn_started)
+        self.logger.info(
+            f"Zlecenie na serwerze renderowania {server.pid}: "
+            f"{subprocess.list2cmdline(cmd[1:])}"
+        )
+        frames = FrameTimer(stats, task, time.monotonic(), owner)
+        start_time = time.time()
+        task.render_process = process_identity(server.pid)
+        if self.on_process_started:
+            self.on_process_started(task)
+
+        def on_line(line: str):
+            line = line.strip()
+            if line.startswith("Cinema 4D: "):
+                line = line[11:]
+            self.logger.info(line)
+            stats.log_line()
+            frames.feed(line)
+            if self.on_log_message:
+                self.on_log_message(line)
+
+        try:
+            ok, message = server.render(task.id, cmd[1:], on_line)
+        except RenderServerError as e:
+            pool.discard(server)
+            task.error_message = str(e)
+            self.logger.error(task.error_message)
+            return False
+        else:
+            pool.release(server)
+        finally:
+            frames.finish()
+            get_tracer().complete(
+                "c4d_server_job",
+                start_time,
+                time.time() - start_time,
+                cat="process",
+                task_id=task.id,
+                pid=server.pid,
+            )
+            task.render_process = {}
+
+        self.logger.info(f"Czas renderowania: {time.time() - start_time:.2f} sekund")
+        if ok:
+            self.logger.info(f"Renderowanie zakończone pomyślnie: {task.name}")
+            return True
+        task.error_message = f"Błąd renderowania na serwerze: {message}"
+        self.logger.error(task.error_message)
+        return False
+
+    def _run_render_process(
+        self,
+        task: RenderTask,
+        cmd: List[str],
+        usages: List[dict],
+        owner: Optional[Callable[[int], RenderTask]] = None,
+    ) -> bool:
+        """Uruchamia jedno wywołanie Commandline i czyta jego wyjście"""
+        # Logowanie komendy
+        self.logger.info("=" * 80)
+        self.logger.info("KOMENDA RENDEROWANIA:")
+        self.logger.info(subprocess.list2cmdline(cmd))
+        self.logger.info("=" * 80)
+        start_time = time.time()
+        stats = get_render_stats()
+
+        try:
+            launcher = get_process_launcher()
+            spawn_started = time.monotonic()
+            process = launcher.launch(
+                cmd,
+                task.render_settings,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                universal_newlines=True,
+            )
+
+            stats.record_phase(task, "spawn", time.monotonic() - spawn_started)
+            frames = FrameTimer(stats, task, time.monotonic(), owner)
+            task.render_process = process_identity(process.pid)
+            if self.on_process_started:
+                self.on_process_started(task)
 
+            # Rozliczanie zasobów procesu C4D i jego procesów potomnych
+            accounting = ProcessTreeSampler(process.pid)
+            accounting.start()
+            try:
                 # Czytanie wyjścia w czasie rzeczywistym z timeoutem
                 while True:
                     try:
@@ -156,6 +425,8 @@ class Cinema4DController:
                             if clean_output.startswith("Cinema 4D: "):
                                 clean_output = clean_output[11:]
                             self.logger.info(clean_output)
+                            stats.log_line()
+                            frames.feed(clean_output)
                             if self.on_log_message:
                                 self.on_log_message(clean_output)
                     except Exception as e:
@@ -167,7 +438,7 @@ class Cinema4DController:
                     process.wait(timeout=300)  # 5 minut timeout
                 except subprocess.TimeoutExpired:
                     self.logger.error("Timeout - proces przekroczył 5 minut")
-                    process.kill()
+                    launcher.kill(process)
                     task.error_message = "Timeout - proces przekroczył 5 minut"
                     return False
 
@@ -179,6 +450,8 @@ class Cinema4DController:
                         if clean_line.startswith("Cinema 4D: "):
                             clean_line = clean_line[11:]
                         self.logger.info(clean_line)
+                        stats.log_line()
+                        frames.feed(clean_line)
                         if self.on_log_message:
                             self.on_log_message(clean_line)
 
@@ -187,8 +460,10 @@ class Cinema4DController:
                     for line in stderr.splitlines():
                         error_msg = f"BŁĄD: {line.strip()}"
                         self.logger.error(error_msg)
+                        stats.log_line()
                         if self.on_log_message:
                             self.on_log_message(error_msg)
+                frames.finish()
 
                 end_time = time.time()
                 duration = end_time - start_time
@@ -204,15 +479,33 @@ class Cinema4DController:
                     self.logger.error(error_msg)
                     task.error_message = error_msg
                     return False
-
-            except Exception as e:
-                error_msg = f"Wyjątek podczas renderowania: {str(e)}"
-                self.logger.error(error_msg)
-                task.error_message = error_msg
-                return False
+            finally:
+                get_tracer().complete(
+                    "c4d_process",
+                    start_time,
+                    time.time() - start_time,
+                    cat="process",
+                    task_id=task.id,
+                    pid=process.pid,
+                    returncode=process.returncode,
+                )
+                task.render_process = {}
+                usages.append(accounting.stop())
+                launcher.release(process)
 
         except Exception as e:
             error_msg = f"Wyjątek podczas renderowania: {str(e)}"
             self.logger.error(error_msg)
             task.error_message = error_msg
             return False
+
+    def _log_resource_usage(self, task: RenderTask):
+        """Loguje podsumowanie zużycia zasobów przez zadanie"""
+        usage = task.resource_usage
+        self.logger.info(
+            f"Zasoby zadania {task.name}: szczyt RAM {usage['peak_rss_mb']:.0f} MB, "
+            f"CPU {usage['cpu_seconds']:.1f} s, "
+            f"śr. rdzenie {usage['avg_cores']:.1f}/{usage['cpu_count']}, "
+            f"odczyt {usage['read_bytes'] / 1024**2:.1f} MB, "
+            f"zapis {usage['write_bytes'] / 1024**2:.1f} MB"
+        )
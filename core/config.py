@@ -1,6 +1,9 @@
 import json
 import os
-from typing import Dict, Optional
+import threading
+from typing import Dict, List, Optional
+
+from utils.atomic_file import atomic_write_json
 
 
 class Config:
@@ -9,6 +12,54 @@ class Config:
         self.c4d_versions: Dict[str, str] = {}
         self.log_to_file: bool = False
         self.log_file_path: Optional[str] = None
+        self.resource_sample_interval: float = 2.0
+        self.resource_history_size: int = 900
+        self.api_enabled: bool = False
+        self.api_host: str = "127.0.0.1"
+        self.api_port: int = 8765
+        self.api_max_pending: int = 1000
+        self.farm_port: int = 8766
+        self.farm_chunk_size: int = 10
+        self.farm_heartbeat_interval: float = 5.0
+        self.farm_heartbeat_timeout: float = 20.0
+        self.shared_queue_enabled: bool = False
+        self.lease_duration: float = 60.0
+        self.node_id: str = ""
+        self.asset_validation: str = "auto"
+        self.asset_search_paths: List[str] = []
+        self.c4dpy_path: str = ""
+        self.staging_enabled: bool = False
+        self.staging_dir: str = ""
+        self.staging_max_gb: float = 50.0
+        self.staging_workers: int = 4
+        self.local_output_enabled: bool = False
+        self.local_output_dir: str = ""
+        self.upload_workers: int = 4
+        self.upload_retries: int = 5
+        self.incremental_render: bool = False
+        self.trace_enabled: bool = False
+        self.trace_file: str = ""
+        self.memory_limit_mode: str = "auto"
+        self.render_cgroup: str = ""
+        self.adaptive_concurrency: bool = False
+        self.max_render_slots: int = 1
+        self.concurrency_window: float = 300.0
+        self.suspend_on_pressure: bool = False
+        self.suspend_memory_percent: float = 90.0
+        self.resume_memory_percent: float = 75.0
+        self.suspend_cpu_percent: float = 0.0
+        self.resume_cpu_percent: float = 30.0
+        self.min_free_space_mb: int = 2048
+        self.space_margin: float = 1.2
+        self.default_frame_size_mb: float = 20.0
+        self.render_server_enabled: bool = False
+        self.render_server_script: str = ""
+        self.render_server_max_jobs: int = 50
+        self.render_server_max_growth_mb: int = 2048
+        self.render_server_startup_timeout: float = 300.0
+        self.batch_tasks: bool = False
+        self.max_batch_tasks: int = 10
+        self.preview_strides: List[int] = [50, 10]
         self.load_config()
 
     def load_config(self):
@@ -20,6 +71,68 @@ class Config:
                     self.c4d_versions = data.get("c4d_versions", {})
                     self.log_to_file = data.get("log_to_file", False)
                     self.log_file_path = data.get("log_file_path", None)
+                    self.resource_sample_interval = data.get(
+                        "resource_sample_interval", 2.0
+                    )
+                    self.resource_history_size = data.get("resource_history_size", 900)
+                    self.api_enabled = data.get("api_enabled", False)
+                    self.api_host = data.get("api_host", "127.0.0.1")
+                    self.api_port = data.get("api_port", 8765)
+                    self.api_max_pending = data.get("api_max_pending", 1000)
+                    self.farm_port = data.get("farm_port", 8766)
+                    self.farm_chunk_size = data.get("farm_chunk_size", 10)
+                    self.farm_heartbeat_interval = data.get(
+                        "farm_heartbeat_interval", 5.0
+                    )
+                    self.farm_heartbeat_timeout = data.get(
+                        "farm_heartbeat_timeout", 20.0
+                    )
+                    self.shared_queue_enabled = data.get("shared_queue_enabled", False)
+                    self.lease_duration = data.get("lease_duration", 60.0)
+                    self.node_id = data.get("node_id", "")
+                    self.asset_validation = data.get("asset_validation", "auto")
+                    self.asset_search_paths = data.get("asset_search_paths", [])
+                    self.c4dpy_path = data.get("c4dpy_path", "")
+                    self.staging_enabled = data.get("staging_enabled", False)
+                    self.staging_dir = data.get("staging_dir", "")
+                    self.staging_max_gb = data.get("staging_max_gb", 50.0)
+                    self.staging_workers = data.get("staging_workers", 4)
+                    self.local_output_enabled = data.get("local_output_enabled", False)
+                    self.local_output_dir = data.get("local_output_dir", "")
+                    self.upload_workers = data.get("upload_workers", 4)
+                    self.upload_retries = data.get("upload_retries", 5)
+                    self.incremental_render = data.get("incremental_render", False)
+                    self.trace_enabled = data.get("trace_enabled", False)
+                    self.trace_file = data.get("trace_file", "")
+                    self.memory_limit_mode = data.get("memory_limit_mode", "auto")
+                    self.render_cgroup = data.get("render_cgroup", "")
+                    self.adaptive_concurrency = data.get("adaptive_concurrency", False)
+                    self.max_render_slots = data.get("max_render_slots", 1)
+                    self.concurrency_window = data.get("concurrency_window", 300.0)
+                    self.suspend_on_pressure = data.get("suspend_on_pressure", False)
+                    self.suspend_memory_percent = data.get(
+                        "suspend_memory_percent", 90.0
+                    )
+                    self.resume_memory_percent = data.get("resume_memory_percent", 75.0)
+                    self.suspend_cpu_percent = data.get("suspend_cpu_percent", 0.0)
+                    self.resume_cpu_percent = data.get("resume_cpu_percent", 30.0)
+                    self.min_free_space_mb = data.get("min_free_space_mb", 2048)
+                    self.space_margin = data.get("space_margin", 1.2)
+                    self.default_frame_size_mb = data.get("default_frame_size_mb", 20.0)
+                    self.render_server_enabled = data.get(
+                        "render_server_enabled", False
+                    )
+                    self.render_server_script = data.get("render_server_script", "")
+                    self.render_server_max_jobs = data.get("render_server_max_jobs", 50)
+                    self.render_server_max_growth_mb = data.get(
+                        "render_server_max_growth_mb", 2048
+                    )
+                    self.render_server_startup_timeout = data.get(
+                        "render_server_startup_timeout", 300.0
+                    )
+                    self.batch_tasks = data.get("batch_tasks", False)
+                    self.max_batch_tasks = data.get("max_batch_tasks", 10)
+                    self.preview_strides = data.get("preview_strides", [50, 10])
             except Exception as e:
                 print(f"Błąd ładowania konfiguracji: {str(e)}")
                 self.c4d_versions = {}
@@ -33,9 +146,56 @@ class Config:
                 "c4d_versions": self.c4d_versions,
                 "log_to_file": self.log_to_file,
                 "log_file_path": self.log_file_path,
+                "resource_sample_interval": self.resource_sample_interval,
+                "resource_history_size": self.resource_history_size,
+                "api_enabled": self.api_enabled,
+                "api_host": self.api_host,
+                "api_port": self.api_port,
+                "api_max_pending": self.api_max_pending,
+                "farm_port": self.farm_port,
+                "farm_chunk_size": self.farm_chunk_size,
+                "farm_heartbeat_interval": self.farm_heartbeat_interval,
+                "farm_heartbeat_timeout": self.farm_heartbeat_timeout,
+                "shared_queue_enabled": self.shared_queue_enabled,
+                "lease_duration": self.lease_duration,
+                "node_id": self.node_id,
+                "asset_validation": self.asset_validation,
+                "asset_search_paths": self.asset_search_paths,
+                "c4dpy_path": self.c4dpy_path,
+                "staging_enabled": self.staging_enabled,
+                "staging_dir": self.staging_dir,
+                "staging_max_gb": self.staging_max_gb,
+                "staging_workers": self.staging_workers,
+                "local_output_enabled": self.local_output_enabled,
+                "local_output_dir": self.local_output_dir,
+                "upload_workers": self.upload_workers,
+                "upload_retries": self.upload_retries,
+                "incremental_render": self.incremental_render,
+                "trace_enabled": self.trace_enabled,
+                "trace_file": self.trace_file,
+                "memory_limit_mode": self.memory_limit_mode,
+                "render_cgroup": self.render_cgroup,
+                "adaptive_concurrency": self.adaptive_concurrency,
+                "max_render_slots": self.max_render_slots,
+                "concurrency_window": self.concurrency_window,
+                "suspend_on_pressure": self.suspend_on_pressure,
+                "suspend_memory_percent": self.suspend_memory_percent,
+                "resume_memory_percent": self.resume_memory_percent,
+                "suspend_cpu_percent": self.suspend_cpu_percent,
+                "resume_cpu_percent": self.resume_cpu_percent,
+                "min_free_space_mb": self.min_free_space_mb,
+                "space_margin": self.space_margin,
+                "default_frame_size_mb": self.default_frame_size_mb,
+                "render_server_enabled": self.render_server_enabled,
+                "render_server_script": self.render_server_script,
+                "render_server_max_jobs": self.render_server_max_jobs,
+                "render_server_max_growth_mb": self.render_server_max_growth_mb,
+                "render_server_startup_timeout": self.render_server_startup_timeout,
+                "batch_tasks": self.batch_tasks,
+                "max_batch_tasks": self.max_batch_tasks,
+                "preview_strides": self.preview_strides,
             }
-            with open(self.config_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            atomic_write_json(self.config_file, data, indent=4)
         except Exception as e:
             print(f"Błąd zapisywania konfiguracji: {str(e)}")
 
@@ -59,3 +219,109 @@ class Config:
         self.log_to_file = log_to_file
         self.log_file_path = log_file_path
         self.save_config()
+
+    def get_resource_sampling_settings(self) -> tuple[float, int]:
+        """Zwraca interwał próbkowania zasobów (s) i rozmiar historii"""
+        return self.resource_sample_interval, self.resource_history_size
+
+    def get_api_settings(self) -> tuple[bool, str, int, int]:
+        """Zwraca ustawienia API HTTP (włączone, host, port, limit oczekujących)"""
+        return self.api_enabled, self.api_host, self.api_port, self.api_max_pending
+
+    def get_farm_settings(self) -> tuple[int, int, float, float]:
+        """Zwraca ustawienia farmy (port, klatki na fragment, heartbeat, timeout)"""
+        return (
+            self.farm_port,
+            self.farm_chunk_size,
+            self.farm_heartbeat_interval,
+            self.farm_heartbeat_timeout,
+        )
+
+    def get_shared_queue_settings(self) -> tuple[bool, float, str]:
+        """Zwraca ustawienia wspólnego folderu zadań (włączony, dzierżawa s, węzeł)"""
+        return self.shared_queue_enabled, self.lease_duration, self.node_id
+
+    def get_asset_settings(self) -> tuple[str, List[str], str]:
+        """Zwraca ustawienia walidacji zasobów (tryb, ścieżki szukania, c4dpy)"""
+        return self.asset_validation, self.asset_search_paths, self.c4dpy_path
+
+    def get_staging_settings(self) -> tuple[bool, str, float, int]:
+        """Zwraca ustawienia lokalnej kopii projektów (włączona, folder, GB, wątki)"""
+        return (
+            self.staging_enabled,
+            self.staging_dir,
+            self.staging_max_gb,
+            self.staging_workers,
+        )
+
+    def get_local_output_settings(self) -> tuple[bool, str, int, int]:
+        """Zwraca ustawienia zapisu lokalnego (włączony, folder, wątki, próby)"""
+        return (
+            self.local_output_enabled,
+            self.local_output_dir,
+            self.upload_workers,
+            self.upload_retries,
+        )
+
+    def get_incremental_render(self) -> bool:
+        """Zwraca czy pomijać zadania z aktualnymi wynikami (manifest renderu)"""
+        return self.incremental_render
+
+    def get_trace_settings(self) -> tuple[bool, str]:
+        """Zwraca ustawienia śledzenia zadań (włączone, plik JSONL)"""
+        return self.trace_enabled, self.trace_file or os.path.join(
+            "logs", "trace.jsonl"
+        )
+
+    def get_process_limit_settings(self) -> tuple[str, str]:
+        """Zwraca tryb limitu pamięci renderu (auto/cgroup/rlimit/off) i cgroup"""
+        return self.memory_limit_mode, self.render_cgroup
+
+    def get_concurrency_settings(self) -> tuple[bool, int, float]:
+        """Zwraca ustawienia slotów renderowania (adaptacja, maks. slotów, okno s)"""
+        return self.adaptive_concurrency, self.max_render_slots, self.concurrency_window
+
+    def get_suspend_settings(self) -> tuple[bool, float, float, float, float]:
+        """Zwraca progi wstrzymania/wznowienia renderów (pamięć %, CPU innych %)"""
+        return (
+            self.suspend_on_pressure,
+            self.suspend_memory_percent,
+            self.resume_memory_percent,
+            self.suspend_cpu_percent,
+            self.resume_cpu_percent,
+        )
+
+    def get_disk_space_settings(self) -> tuple[int, float, float]:
+        """Zwraca ustawienia kontroli miejsca (min. wolne MB, zapas, klatka MB)"""
+        return self.min_free_space_mb, self.space_margin, self.default_frame_size_mb
+
+    def get_render_server_settings(self) -> tuple[bool, str, int, int, float]:
+        """Zwraca ustawienia serwera renderowania (skrypt, recykling, timeout startu)"""
+        return (
+            self.render_server_enabled,
+            self.render_server_script,
+            self.render_server_max_jobs,
+            self.render_server_max_growth_mb,
+            self.render_server_startup_timeout,
+        )
+
+    def get_batch_settings(self) -> tuple[bool, int]:
+        """Zwraca czy łączyć zadania jednego projektu i maks. wielkość paczki"""
+        return self.batch_tasks, self.max_batch_tasks
+
+    def get_preview_strides(self) -> List[int]:
+        """Zwraca odstępy przejść kolejności progresywnej (np. co 50., co 10.)"""
+        return self.preview_strides
+
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    """Zwraca wspólną instancję konfiguracji (config.json parsowany raz)"""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = Config()
+        return _config
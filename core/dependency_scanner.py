@@ -0,0 +1,309 @@
+"""
+Skaner zależności projektu Cinema 4D (tekstury, cache, pliki XRef).
+
+Referencje są wyciągane z projektu przez c4dpy (jeśli skonfigurowano
+"c4dpy_path" - dokładna lista z GetAllAssetsNew) albo heurystycznie,
+przez wyszukanie ścieżek plików w treści .c4d (ASCII i UTF-16), czytanej
+blokami. Adresy z protokołem (assetdb://, preset://) wskazują zasoby
+wewnątrz C4D i są pomijane.
+
+Bufory:
+    - referencje projektu są zapamiętywane według skrótu SHA-1 jego treści
+      (skrót liczony ponownie tylko po zmianie rozmiaru/mtime pliku);
+      trwały bufor trafia do cache/dependencies.json,
+    - wynik sprawdzenia istnienia zasobu jest pamiętany przez kilka sekund,
+      więc sceny korzystające ze wspólnej biblioteki tekstur nie powtarzają
+      tych samych operacji stat na udziale sieciowym.
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.config import get_config
+from utils.atomic_file import atomic_write_json, file_sha1
+from utils.logger import setup_logger
+
+CACHE_FILE = os.path.join("cache", "dependencies.json")
+HELPER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "c4d_scripts",
+    "list_assets.py",
+)
+
+ASSET_EXTENSIONS = (
+    "png|jpe?g|tiff?|exr|hdr|psd|tga|bmp|dds|b3d|tx|ies|"
+    "abc|vdb|obj|fbx|c4d|lib4d|mp4|mov|avi|gif|sbsar"
+)
+
+# Ciągi drukowalnych znaków w treści pliku (ASCII / UTF-16 LE / UTF-16 BE)
+_ASCII_RUNS = re.compile(rb"[\x20-\x7e]{5,}")
+_UTF16LE_RUNS = re.compile(rb"(?:[\x20-\x7e]\x00){5,}")
+_UTF16BE_RUNS = re.compile(rb"(?:\x00[\x20-\x7e]){5,}")
+
+# Ścieżka pliku zasobu: opcjonalny dysk/UNC, potem znaki ścieżki i rozszerzenie;
+# nie może zaczynać się w środku słowa
+_PATH_PATTERN = re.compile(
+    r"(?<![\w\-.~$:\\/])"
+    r"((?:[A-Za-z]:[\\/]|\\\\)?[\w\-. ()\\/~$]+?\.(?:" + ASSET_EXTENSIONS + r"))"
+    r"(?![\w])",
+    re.IGNORECASE,
+)
+# Adres z protokołem (assetdb:///tex/a.jpg, preset://Materials.lib4d/a.png)
+_URL_PATTERN = re.compile(r"[A-Za-z][\w+.\-]*://[\w\-. ()\\/~$]*")
+
+# Treść projektu czytana blokami; zakładka obejmuje ścieżkę przeciętą granicą
+READ_BLOCK = 8 * 1024 * 1024
+READ_OVERLAP = 4096
+
+STAT_TTL = 10.0
+STAT_WORKERS = 16
+
+
+@dataclass
+class DependencyReport:
+    """Wynik skanowania zależności projektu"""
+
+    project: str
+    # Skrót SHA-1 treści projektu
+    digest: str = ""
+    references: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    # referencja -> ścieżka, pod którą znaleziono zasób
+    resolved: Dict[str, str] = field(default_factory=dict)
+    source: str = "parser"  # parser / c4dpy
+    from_cache: bool = False
+
+
+def _is_reference(reference: str) -> bool:
+    """Odrzuca zwykły tekst - nazwa bez katalogu nie zawiera spacji"""
+    if len(reference) <= 4:
+        return False
+    return "/" in reference or "\\" in reference or " " not in reference
+
+
+def _find_references(data: bytes) -> Iterator[str]:
+    """Zwraca ścieżki zasobów znalezione w fragmencie treści projektu"""
+    runs = [match.group().decode("ascii") for match in _ASCII_RUNS.finditer(data)]
+    runs += [
+        match.group().decode("utf-16-le") for match in _UTF16LE_RUNS.finditer(data)
+    ]
+    runs += [
+        match.group().decode("utf-16-be") for match in _UTF16BE_RUNS.finditer(data)
+    ]
+
+    for run in runs:
+        for match in _PATH_PATTERN.finditer(_URL_PATTERN.sub("\0", run)):
+            reference = match.group(1).strip()
+            if _is_reference(reference):
+                yield reference
+
+
+def _unique(found: Iterable[str]) -> List[str]:
+    references = list(dict.fromkeys(found))
+    # Dopasowanie UTF-16 z przesunięciem o bajt daje ścieżkę bez pierwszej litery
+    return [
+        reference
+        for reference in references
+        if not any(
+            other != reference and other.endswith(reference) for other in references
+        )
+    ]
+
+
+def extract_references(data: bytes) -> List[str]:
+    """Wyszukuje ścieżki plików zasobów w treści projektu"""
+    return _unique(_find_references(data))
+
+
+def extract_file_references(path: str) -> List[str]:
+    """Wyszukuje ścieżki zasobów w pliku projektu bez wczytywania go w całości"""
+    found: List[str] = []
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                break
+            found.extend(_find_references(tail + block))
+            # Parzysta zakładka zachowuje wyrównanie znaków UTF-16
+            tail = (tail + block)[-READ_OVERLAP:]
+    return _unique(found)
+
+
+class DependencyScanner:
+    """Skanuje zależności projektów i buforuje wyniki między zadaniami"""
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("dependency_scanner", log_to_file, log_file_path)
+
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        # ścieżka projektu -> (rozmiar, mtime_ns, sha1)
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        # sha1 -> (źródło, referencje)
+        self._references: Dict[str, Tuple[str, List[str]]] = {}
+        # ścieżka zasobu -> (istnieje, czas sprawdzenia)
+        self._stat_cache: Dict[str, Tuple[bool, float]] = {}
+        self._dirty = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=STAT_WORKERS, thread_name_prefix="asset-stat"
+        )
+        self._load_cache()
+
+    # --- Trwały bufor ---
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._digests = {
+                path: tuple(value) for path, value in data.get("digests", {}).items()
+            }
+            self._references = {
+                digest: (value["source"], value["references"])
+                for digest, value in data.get("references", {}).items()
+            }
+        except Exception as e:
+            self.logger.warning(f"Pominięto uszkodzony bufor zależności: {e}")
+
+    def _save_cache(self):
+        with self._lock:
+            self._dirty = False
+            data = {
+                "digests": {path: list(value) for path, value in self._digests.items()},
+                "references": {
+                    digest: {"source": source, "references": references}
+                    for digest, (source, references) in self._references.items()
+                },
+            }
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            atomic_write_json(self.cache_file, data, indent=None)
+        except OSError as e:
+            self.logger.warning(f"Nie udało się zapisać bufora zależności: {e}")
+
+    # --- Skanowanie ---
+
+    def file_digest(self, path: str) -> str:
+        """Zwraca skrót SHA-1 pliku (liczony ponownie tylko po zmianie pliku)"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._digests.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = file_sha1(path)
+        with self._lock:
+            self._digests[key] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._dirty = True
+        return digest
+
+    def flush(self):
+        """Zapisuje bufor na dysk, jeśli zmienił się od ostatniego zapisu"""
+        if self._dirty:
+            self._save_cache()
+
+    def _references_with_c4dpy(self, project: str, c4dpy_path: str) -> List[str]:
+        result = subprocess.run(
+            [c4dpy_path, HELPER_SCRIPT, project],
+            capture_output=True,
+            text=True,
+            timeout=600,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"kod {result.returncode}")
+        # Skrypt wypisuje listę JSON w ostatniej linii (c4dpy dodaje własne logi)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def _extract(self, project: str) -> Tuple[str, List[str]]:
+        _, _, c4dpy_path = self.config.get_asset_settings()
+        if c4dpy_path and os.path.exists(c4dpy_path):
+            try:
+                return "c4dpy", self._references_with_c4dpy(project, c4dpy_path)
+            except Exception as e:
+                self.logger.warning(
+                    f"c4dpy nie zwrócił listy zasobów ({e}) - używam parsera"
+                )
+        return "parser", extract_file_references(project)
+
+    def _candidates(self, reference: str, project_dir: str) -> List[str]:
+        """Ścieżki, pod którymi C4D szuka zasobu (jak przy ładowaniu sceny)"""
+        _, search_paths, _ = self.config.get_asset_settings()
+        normalized = reference.replace("\\", os.sep).replace("/", os.sep)
+        if os.path.isabs(reference) or re.match(r"^[A-Za-z]:[\\/]", reference):
+            candidates = [reference]
+        else:
+            candidates = [os.path.join(project_dir, normalized)]
+        name = os.path.basename(normalized)
+        candidates.append(os.path.join(project_dir, "tex", name))
+        candidates.extend(os.path.join(path, name) for path in search_paths)
+        return candidates
+
+    def _exists(self, path: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._stat_cache.get(path)
+        if cached and now - cached[1] < STAT_TTL:
+            return cached[0]
+        exists = os.path.exists(path)
+        with self._lock:
+            self._stat_cache[path] = (exists, now)
+        return exists
+
+    def _resolve(self, reference: str, project_dir: str) -> Optional[str]:
+        for path in self._candidates(reference, project_dir):
+            if self._exists(path):
+                return path
+        return None
+
+    def scan(self, project: str) -> DependencyReport:
+        """Zwraca referencje projektu i listę brakujących zasobów"""
+        digest = self.file_digest(project)
+        with self._lock:
+            cached = self._references.get(digest)
+        report = DependencyReport(
+            project=project, digest=digest, from_cache=cached is not None
+        )
+        if cached is None:
+            cached = self._extract(project)
+            with self._lock:
+                self._references[digest] = cached
+                self._dirty = True
+        self.flush()
+        report.source, report.references = cached
+
+        project_dir = os.path.dirname(os.path.abspath(project))
+        resolved = self._executor.map(
+            lambda reference: self._resolve(reference, project_dir),
+            report.references,
+        )
+        for reference, path in zip(report.references, resolved):
+            if path is None:
+                report.missing.append(reference)
+            else:
+                report.resolved[reference] = path
+        return report
+
+
+_scanner: Optional[DependencyScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_dependency_scanner() -> DependencyScanner:
+    """Zwraca wspólny skaner - bufor jest dzielony przez wszystkie kontrolery"""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = DependencyScanner()
+        return _scanner
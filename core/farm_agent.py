@@ -0,0 +1,219 @@
+import itertools
+import os
+import queue
+import socket
+import threading
+from typing import Any, Dict, Optional
+
+from core import farm_protocol as protocol
+from core.cinema4d_controller import Cinema4DController
+from core.config import get_config
+from utils.logger import setup_logger
+
+
+class FarmAgent:
+    """Agent węzła renderującego - pobiera fragmenty pracy od koordynatora"""
+
+    RECONNECT_DELAY = 5.0
+    IDLE_POLL_INTERVAL = 2.0
+
+    def __init__(
+        self,
+        coordinator_host: str,
+        coordinator_port: Optional[int] = None,
+        node_id: Optional[str] = None,
+        capacity: int = 1,
+        heartbeat_interval: Optional[float] = None,
+    ):
+        config = get_config()
+        default_port, _, default_interval, _ = config.get_farm_settings()
+        self.coordinator_host = coordinator_host
+        self.coordinator_port = coordinator_port or default_port
+        self.node_id = node_id or socket.gethostname()
+        self.capacity = max(1, capacity)
+        self.heartbeat_interval = heartbeat_interval or default_interval
+        self.versions = list(config.get_c4d_versions().keys())
+
+        log_to_file, log_file_path = config.get_logging_settings()
+        self.logger = setup_logger("farm_agent", log_to_file, log_file_path)
+
+        self._stop_event = threading.Event()
+        self._session_closed = threading.Event()
+        self._socket: Optional[socket.socket] = None
+        self._wfile = None
+        self._send_lock = threading.Lock()
+        self._pending_requests: Dict[int, queue.Queue] = {}
+        self._request_ids = itertools.count(1)
+        self._running_units: set = set()
+        self._running_lock = threading.Lock()
+
+    def stop(self):
+        """Kończy pracę agenta (po zakończeniu bieżących fragmentów)"""
+        self._stop_event.set()
+        self._close_socket()
+
+    def run_forever(self):
+        """Łączy się z koordynatorem i ponawia połączenie po jego utracie"""
+        while not self._stop_event.is_set():
+            try:
+                self._run_session()
+            except OSError as e:
+                self.logger.warning(f"Brak połączenia z koordynatorem: {e}")
+            if not self._stop_event.is_set():
+                self._stop_event.wait(self.RECONNECT_DELAY)
+
+    # --- Sesja z koordynatorem ---
+
+    def _run_session(self):
+        self._socket = socket.create_connection(
+            (self.coordinator_host, self.coordinator_port), timeout=10
+        )
+        self._socket.settimeout(None)
+        rfile = self._socket.makefile("rb")
+        self._wfile = self._socket.makefile("wb")
+        self._session_closed.clear()
+
+        self._send(
+            protocol.MSG_REGISTER,
+            node_id=self.node_id,
+            capacity=self.capacity,
+            versions=self.versions,
+            pid=os.getpid(),
+        )
+        reply = protocol.read_message(rfile)
+        if not reply or reply.get("type") != protocol.MSG_REGISTERED:
+            raise OSError(f"Koordynator odrzucił rejestrację: {reply}")
+        self.logger.info(
+            f"Zarejestrowano w koordynatorze {self.coordinator_host}:"
+            f"{self.coordinator_port} jako {self.node_id}"
+        )
+
+        threads = [
+            threading.Thread(target=self._heartbeat_loop, daemon=True),
+            *[
+                threading.Thread(target=self._slot_loop, args=(slot,), daemon=True)
+                for slot in range(self.capacity)
+            ],
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                message = protocol.read_message(rfile)
+                if message is None:
+                    break
+                request_id = message.get("request_id")
+                if request_id in self._pending_requests:
+                    self._pending_requests.pop(request_id).put(message)
+                elif message.get("type") == protocol.MSG_ERROR:
+                    self.logger.error(f"Błąd koordynatora: {message.get('error')}")
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Utracono połączenie z koordynatorem: {e}")
+        finally:
+            self._session_closed.set()
+            self._close_socket()
+            # Odblokuj sloty czekające na odpowiedź
+            for pending in list(self._pending_requests.values()):
+                pending.put(None)
+            self._pending_requests.clear()
+            for thread in threads:
+                thread.join()
+
+    def _close_socket(self):
+        if self._socket:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._socket.close()
+
+    def _send(self, message_type: str, **payload):
+        with self._send_lock:
+            protocol.send_message(self._wfile, message_type, **payload)
+
+    def _request(self, message_type: str, **payload) -> Optional[Dict[str, Any]]:
+        """Wysyła żądanie i czeka na odpowiedź z tym samym request_id"""
+        request_id = next(self._request_ids)
+        reply_queue: queue.Queue = queue.Queue(maxsize=1)
+        self._pending_requests[request_id] = reply_queue
+        try:
+            self._send(message_type, request_id=request_id, **payload)
+        except OSError:
+            self._pending_requests.pop(request_id, None)
+            return None
+        return reply_queue.get()
+
+    def _heartbeat_loop(self):
+        while not self._session_closed.wait(self.heartbeat_interval):
+            with self._running_lock:
+                running = list(self._running_units)
+            try:
+                self._send(protocol.MSG_HEARTBEAT, running=running)
+            except OSError:
+                return
+
+    # --- Renderowanie ---
+
+    def _slot_loop(self, slot: int):
+        controller = Cinema4DController()
+        while not self._session_closed.is_set() and not self._stop_event.is_set():
+            reply = self._request(protocol.MSG_PULL, slot=slot)
+            if reply is None:
+                return
+            if reply.get("type") != protocol.MSG_WORK:
+                self._session_closed.wait(self.IDLE_POLL_INTERVAL)
+                continue
+            self._render_unit(controller, reply)
+
+    def _render_unit(self, controller: Cinema4DController, work: Dict[str, Any]):
+        unit_id = work["unit_id"]
+        task = protocol.task_from_message(work["task"])
+        task.start_frame = work.get("start_frame")
+        task.end_frame = work.get("end_frame")
+        if work.get("frame_set"):
+            # Fragment przejścia progresywnego - kolejność ustalił koordynator
+            task.frame_set = work["frame_set"]
+            task.render_settings = {
+                key: value
+                for key, value in task.render_settings.items()
+                if key != "frame_order"
+            }
+        task.resource_usage = {}
+
+        def forward_log(message: str):
+            try:
+                self._send(protocol.MSG_PROGRESS, unit_id=unit_id, message=message)
+            except OSError:
+                pass
+
+        controller.on_log_message = forward_log
+        with self._running_lock:
+            self._running_units.add(unit_id)
+        self.logger.info(
+            f"Renderuję {task.name} [{task.start_frame}-{task.end_frame}] ({unit_id})"
+        )
+        try:
+            issues = controller.validate_project(task)
+            if issues:
+                task.error_message = "; ".join(issues)
+                success = False
+            else:
+                success = controller.render_task(task)
+        except Exception as e:
+            task.error_message = str(e)
+            success = False
+        finally:
+            with self._running_lock:
+                self._running_units.discard(unit_id)
+
+        try:
+            self._send(
+                protocol.MSG_DONE,
+                unit_id=unit_id,
+                success=success,
+                error_message=task.error_message,
+                resource_usage=task.resource_usage,
+            )
+        except OSError:
+            self.logger.warning(f"Nie udało się odesłać wyniku fragmentu {unit_id}")
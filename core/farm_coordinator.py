@@ -0,0 +1,409 @@
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from core import farm_protocol as protocol
+from core.config import get_config
+from core.queue_manager import QueueManager
+from core.render_command import (
+    FrameRuns,
+    format_frame_set,
+    frame_runs,
+    parse_frame_set,
+    task_frame_ranges,
+    task_frame_strides,
+    task_frames,
+)
+from core.task_graph import is_ready, task_index
+from models.task import RenderTask
+from utils.logger import setup_logger
+from utils.process_accounting import merge_usage_summaries
+
+
+@dataclass
+class WorkUnit:
+    """Fragment zadania (zakres klatek) przydzielany pojedynczemu węzłowi"""
+
+    unit_id: str
+    task: RenderTask
+    start_frame: Optional[int] = None
+    end_frame: Optional[int] = None
+    # Klatki fragmentu przejścia kolejności progresywnej (np. "1,51,101")
+    frame_set: Optional[str] = None
+    state: str = "pending"  # pending / assigned / done / failed
+    node_id: Optional[str] = None
+    attempts: int = 0
+    error_message: Optional[str] = None
+    resource_usage: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class FarmNode:
+    """Zarejestrowany agent węzła renderującego"""
+
+    node_id: str
+    capacity: int
+    versions: List[str]
+    address: str
+    connection: socket.socket
+    stream: Any
+    last_seen: float = field(default_factory=time.time)
+    running: Set[str] = field(default_factory=set)
+    alive: bool = True
+    send_lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def send(self, message_type: str, **payload):
+        with self.send_lock:
+            protocol.send_message(self.stream, message_type, **payload)
+
+
+def split_frames(frames: Optional[List[int]], chunk_size: int) -> List[tuple]:
+    """Dzieli klatki zadania na fragmenty po chunk_size klatek
+
+    Fragment to zakres (pierwsza, ostatnia klatka) - przy zbiorze klatek
+    z przerwami agent renderuje tylko klatki zbioru z tego zakresu.
+    """
+    if frames is None:
+        return [(None, None)]
+    if chunk_size <= 0:
+        return [(frames[0], frames[-1])] if frames else []
+    return [
+        (frames[i], frames[min(i + chunk_size, len(frames)) - 1])
+        for i in range(0, len(frames), chunk_size)
+    ]
+
+
+def split_runs(runs: FrameRuns, chunk_size: int) -> List[tuple]:
+    """Dzieli przejścia kolejności progresywnej na fragmenty po chunk_size klatek
+
+    Fragment to (pierwsza, ostatnia klatka, zbiór klatek) - klatki co krok
+    przejścia. Fragmenty są w kolejności przejść, więc węzły renderują
+    najpierw rzadkie przejścia całej sekwencji.
+    """
+    chunks = []
+    for first, last, step in runs:
+        frames = list(range(first, last + 1, step))
+        for i in range(0, len(frames), chunk_size):
+            chunk = frames[i : i + chunk_size]
+            frame_set = format_frame_set(parse_frame_set(",".join(map(str, chunk))))
+            chunks.append((chunk[0], chunk[-1], frame_set))
+    return chunks
+
+
+class FarmCoordinator:
+    """Koordynator farmy - trzyma kolejkę i rozdziela pracę między agentów"""
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        queue_manager: QueueManager,
+        host: str = "0.0.0.0",
+        port: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        heartbeat_timeout: Optional[float] = None,
+    ):
+        config = get_config()
+        default_port, default_chunk, _, default_timeout = config.get_farm_settings()
+        self.queue_manager = queue_manager
+        self.host = host
+        self.port = default_port if port is None else port
+        self.chunk_size = default_chunk if chunk_size is None else chunk_size
+        self.heartbeat_timeout = heartbeat_timeout or default_timeout
+
+        log_to_file, log_file_path = config.get_logging_settings()
+        self.logger = setup_logger("farm_coordinator", log_to_file, log_file_path)
+
+        self.nodes: Dict[str, FarmNode] = {}
+        self.units: List[WorkUnit] = []
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Uruchamia serwer TCP i wątek wykrywania martwych węzłów"""
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._handle_connection(self.connection, self.rfile, self.wfile)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(
+                target=self._server.serve_forever, name="farm-server", daemon=True
+            ),
+            threading.Thread(
+                target=self._monitor_nodes, name="farm-monitor", daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.logger.info(f"Koordynator farmy nasłuchuje na {self.host}:{self.port}")
+
+    def stop(self):
+        """Zatrzymuje koordynatora i rozłącza agentów"""
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._lock:
+            for node in self.nodes.values():
+                self._close_node_connection(node)
+        self.logger.info("Zatrzymano koordynatora farmy")
+
+    # --- Obsługa połączeń agentów ---
+
+    def _handle_connection(self, connection: socket.socket, rfile, wfile):
+        address = "%s:%s" % connection.getpeername()[:2]
+        try:
+            message = protocol.read_message(rfile)
+        except (OSError, ValueError):
+            return
+        if not message or message.get("type") != protocol.MSG_REGISTER:
+            protocol.send_message(
+                wfile, protocol.MSG_ERROR, error="Oczekiwano register"
+            )
+            return
+
+        node = self._register_node(message, address, connection, wfile)
+        try:
+            while not self._stop_event.is_set():
+                message = protocol.read_message(rfile)
+                if message is None:
+                    break
+                node.last_seen = time.time()
+                self._dispatch_message(node, message)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Błąd połączenia z węzłem {node.node_id}: {e}")
+        finally:
+            self._mark_node_dead(node, "połączenie zamknięte")
+
+    def _register_node(self, message, address, connection, wfile) -> FarmNode:
+        node = FarmNode(
+            node_id=message.get("node_id") or address,
+            capacity=max(1, int(message.get("capacity", 1))),
+            versions=[str(version) for version in message.get("versions", [])],
+            address=address,
+            connection=connection,
+            stream=wfile,
+        )
+        with self._lock:
+            previous = self.nodes.get(node.node_id)
+            if previous and previous.alive:
+                self._mark_node_dead(previous, "ponowna rejestracja")
+            self.nodes[node.node_id] = node
+        node.send(protocol.MSG_REGISTERED, node_id=node.node_id)
+        self.logger.info(
+            f"Zarejestrowano węzeł {node.node_id} ({address}), "
+            f"sloty: {node.capacity}, wersje C4D: {', '.join(node.versions)}"
+        )
+        return node
+
+    def _dispatch_message(self, node: FarmNode, message: Dict[str, Any]):
+        message_type = message.get("type")
+        if message_type == protocol.MSG_HEARTBEAT:
+            return
+        if message_type == protocol.MSG_PULL:
+            unit = self._assign_unit(node)
+            if unit is None:
+                node.send(protocol.MSG_NO_WORK, request_id=message.get("request_id"))
+            else:
+                node.send(
+                    protocol.MSG_WORK,
+                    request_id=message.get("request_id"),
+                    unit_id=unit.unit_id,
+                    task=protocol.task_to_message(unit.task),
+                    start_frame=unit.start_frame,
+                    end_frame=unit.end_frame,
+                    frame_set=unit.frame_set,
+                )
+        elif message_type == protocol.MSG_PROGRESS:
+            self.logger.info(f"[{node.node_id}] {message.get('message', '')}")
+        elif message_type == protocol.MSG_DONE:
+            self._complete_unit(node, message)
+        else:
+            self.logger.warning(f"Nieznana wiadomość od {node.node_id}: {message}")
+
+    # --- Przydział pracy ---
+
+    def _create_units(self, task: RenderTask):
+        ranges = task_frame_ranges(task)
+        strides = task_frame_strides(task)
+        if strides and ranges is not None and self.chunk_size > 0:
+            chunks = split_runs(frame_runs(ranges, strides), self.chunk_size)
+        else:
+            chunks = [
+                (start_frame, end_frame, None)
+                for start_frame, end_frame in split_frames(
+                    task_frames(task), self.chunk_size
+                )
+            ]
+        for start_frame, end_frame, frame_set in chunks:
+            self.units.append(
+                WorkUnit(
+                    unit_id=str(uuid.uuid4()),
+                    task=task,
+                    start_frame=start_frame,
+                    end_frame=end_frame,
+                    frame_set=frame_set,
+                )
+            )
+        if self.queue_manager.on_task_started:
+            self.queue_manager.on_task_started(task)
+        self.queue_manager.save_task(task)
+        if not chunks:
+            # Wszystkie klatki wznowionego zadania są już wyrenderowane
+            self.queue_manager.complete_task(task, True)
+
+    def _find_pending_unit(self, node: FarmNode) -> Optional[WorkUnit]:
+        for unit in self.units:
+            if unit.state == "pending" and unit.task.cinema4d_version in node.versions:
+                return unit
+        return None
+
+    def _assign_unit(self, node: FarmNode) -> Optional[WorkUnit]:
+        """Przydziela węzłowi następny fragment pracy zgodny z jego wersjami C4D"""
+        with self._lock:
+            if not node.alive or len(node.running) >= node.capacity:
+                return None
+            unit = self._find_pending_unit(node)
+            while unit is None:
+                # Pobierz kolejne gotowe zadanie z wersją C4D węzła - zadania
+                # dla innych wersji zostają w kolejce dla pozostałych węzłów
+                by_id = task_index(self.queue_manager.get_tasks())
+                task = self.queue_manager.claim_next_task(
+                    lambda task: is_ready(task, by_id)
+                    and task.cinema4d_version in node.versions
+                )
+                if task is None:
+                    return None
+                self._create_units(task)
+                unit = self._find_pending_unit(node)
+
+            unit.state = "assigned"
+            unit.node_id = node.node_id
+            unit.attempts += 1
+            node.running.add(unit.unit_id)
+        self.logger.info(
+            f"Przydzielono {unit.task.name} [{unit.start_frame}-{unit.end_frame}] "
+            f"do węzła {node.node_id}"
+        )
+        return unit
+
+    def _complete_unit(self, node: FarmNode, message: Dict[str, Any]):
+        unit_id = message.get("unit_id")
+        with self._lock:
+            node.running.discard(unit_id)
+            unit = next((u for u in self.units if u.unit_id == unit_id), None)
+            if unit is None or unit.state != "assigned" or unit.node_id != node.node_id:
+                # Spóźniony wynik z węzła, któremu praca została już odebrana
+                return
+
+            unit.resource_usage = message.get("resource_usage") or {}
+            if message.get("success"):
+                unit.state = "done"
+            elif unit.attempts < self.MAX_ATTEMPTS:
+                unit.state = "pending"
+                unit.node_id = None
+                self.logger.warning(
+                    f"Fragment {unit.task.name} [{unit.start_frame}-{unit.end_frame}] "
+                    f"nie powiódł się na {node.node_id}, ponawiam "
+                    f"({unit.attempts}/{self.MAX_ATTEMPTS})"
+                )
+                return
+            else:
+                unit.state = "failed"
+                unit.error_message = message.get("error_message")
+
+            self._check_task_finished(unit.task)
+
+    def _check_task_finished(self, task: RenderTask):
+        task_units = [unit for unit in self.units if unit.task is task]
+        failed = [unit for unit in task_units if unit.state == "failed"]
+        if failed:
+            # Pozostałe fragmenty nieudanego zadania nie są już potrzebne
+            for unit in task_units:
+                if unit.state == "pending":
+                    unit.state = "failed"
+            if any(unit.state == "assigned" for unit in task_units):
+                return
+            error = failed[0].error_message or "Błąd renderowania na węźle"
+            success = False
+        elif all(unit.state == "done" for unit in task_units):
+            error = None
+            success = True
+        else:
+            return
+
+        task.resource_usage = merge_usage_summaries(
+            [unit.resource_usage for unit in task_units]
+        )
+        self.units = [unit for unit in self.units if unit.task is not task]
+        self.queue_manager.complete_task(task, success, error)
+
+    # --- Wykrywanie martwych węzłów ---
+
+    def _monitor_nodes(self):
+        while not self._stop_event.wait(max(1.0, self.heartbeat_timeout / 4)):
+            # Zadania zależne od nieudanych nie trafią już do węzłów
+            self.queue_manager.settle_dependents()
+            deadline = time.time() - self.heartbeat_timeout
+            with self._lock:
+                stale = [
+                    node
+                    for node in self.nodes.values()
+                    if node.alive and node.last_seen < deadline
+                ]
+            for node in stale:
+                self._mark_node_dead(node, "brak heartbeat")
+
+    def _mark_node_dead(self, node: FarmNode, reason: str):
+        """Oznacza węzeł jako martwy i zwraca jego pracę do puli"""
+        with self._lock:
+            if not node.alive:
+                return
+            node.alive = False
+            reassigned = 0
+            for unit in self.units:
+                if unit.state == "assigned" and unit.node_id == node.node_id:
+                    unit.state = "pending"
+                    unit.node_id = None
+                    reassigned += 1
+            node.running.clear()
+        self._close_node_connection(node)
+        self.logger.warning(
+            f"Węzeł {node.node_id} niedostępny ({reason}), "
+            f"przekazano ponownie fragmentów: {reassigned}"
+        )
+
+    def _close_node_connection(self, node: FarmNode):
+        try:
+            node.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def get_nodes_status(self) -> List[Dict[str, Any]]:
+        """Zwraca stan zarejestrowanych węzłów"""
+        with self._lock:
+            return [
+                {
+                    "node_id": node.node_id,
+                    "alive": node.alive,
+                    "capacity": node.capacity,
+                    "running": len(node.running),
+                    "versions": node.versions,
+                    "last_seen": node.last_seen,
+                }
+                for node in self.nodes.values()
+            ]
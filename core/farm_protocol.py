@@ -0,0 +1,61 @@
+"""
+Protokół komunikacji koordynatora farmy z agentami węzłów.
+
+Wiadomości to obiekty JSON zakończone znakiem nowej linii (JSON lines)
+przesyłane przez jedno połączenie TCP na agenta. Każda wiadomość ma pole
+"type" z jedną z poniższych wartości.
+"""
+
+import json
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Optional
+
+from models.task import RenderTask, TaskStatus
+
+# Agent -> koordynator
+MSG_REGISTER = "register"  # node_id, capacity, versions
+MSG_HEARTBEAT = "heartbeat"  # running: [unit_id]
+MSG_PULL = "pull"  # prośba o pracę dla wolnego slotu
+MSG_PROGRESS = "progress"  # unit_id, message
+MSG_DONE = "done"  # unit_id, success, error_message, resource_usage
+
+# Koordynator -> agent
+MSG_REGISTERED = "registered"
+MSG_WORK = "work"  # unit_id, task, start_frame, end_frame, frame_set
+MSG_NO_WORK = "no_work"
+MSG_ERROR = "error"
+
+
+def send_message(stream: BinaryIO, message_type: str, **payload):
+    """Wysyła wiadomość jako linię JSON"""
+    data = {"type": message_type, **payload}
+    stream.write((json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def read_message(stream: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Czyta jedną wiadomość; zwraca None po zamknięciu połączenia"""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def task_to_message(task: RenderTask) -> Dict[str, Any]:
+    """Serializuje zadanie do słownika przesyłanego w wiadomości"""
+    data = asdict(task)
+    data["status"] = task.status.value
+    for name in ("created_at", "started_at", "completed_at"):
+        if data[name]:
+            data[name] = data[name].isoformat()
+    return data
+
+
+def task_from_message(data: Dict[str, Any]) -> RenderTask:
+    """Odtwarza zadanie ze słownika otrzymanego w wiadomości"""
+    data = dict(data)
+    data["status"] = TaskStatus(data["status"])
+    for name in ("created_at", "started_at", "completed_at"):
+        data[name] = datetime.fromisoformat(data[name]) if data.get(name) else None
+    return RenderTask(**data)
@@ -0,0 +1,192 @@
+"""
+Zapis klatek na dysk lokalny i asynchroniczne wysyłanie do folderu docelowego.
+
+C4D zapisuje klatki w lokalnym folderze roboczym, a wspólna pula wątków
+przenosi gotowe pliki do task.output_folder (kopia przez plik .part,
+weryfikacja SHA-1, ponowienia z rosnącym odstępem). Wysyłanie trwa równolegle
+z renderowaniem kolejnych klatek; zadanie kończy się dopiero po dostarczeniu
+wszystkich plików.
+"""
+
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from core.config import get_config
+from utils.atomic_file import copy_file_verified
+from utils.logger import setup_logger
+from utils.tracing import get_tracer
+
+POLL_INTERVAL = 0.5
+# Plik uznawany jest za gotowy, gdy jego rozmiar i mtime nie zmieniły się
+# przez tyle sekund (C4D zapisuje klatkę w całości przed następną)
+STABLE_AFTER = 1.0
+MAX_RETRY_DELAY = 30.0
+
+
+class OutputDelivery:
+    """Dostarczanie plików jednego zadania z folderów roboczych do docelowych"""
+
+    def __init__(
+        self, uploader: "OutputUploader", task_id: str, folders: Dict[str, str]
+    ):
+        self.uploader = uploader
+        self.task_id = task_id
+        # folder roboczy -> folder docelowy
+        self.folders = folders
+        self.delivered: List[str] = []
+        self.failed: List[str] = []
+
+        self._lock = threading.Lock()
+        # plik roboczy -> (rozmiar, mtime_ns, czas ostatniej zmiany)
+        self._seen: Dict[str, Tuple[int, int, float]] = {}
+        self._submitted: Dict[str, Future] = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="output-delivery", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(POLL_INTERVAL):
+            self._scan(final=False)
+
+    def _scan(self, final: bool):
+        """Zleca wysłanie plików, które przestały się zmieniać"""
+        now = time.monotonic()
+        for local_dir, target_dir in self.folders.items():
+            if not os.path.isdir(local_dir):
+                continue
+            for root, _, files in os.walk(local_dir):
+                for name in files:
+                    if name.endswith(".part"):
+                        continue
+                    path = os.path.join(root, name)
+                    if path in self._submitted:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    state = (stat.st_size, stat.st_mtime_ns)
+                    previous = self._seen.get(path)
+                    if previous is None or previous[:2] != state:
+                        self._seen[path] = state + (now,)
+                        if not final:
+                            continue
+                    elif not final and now - previous[2] < STABLE_AFTER:
+                        continue
+                    get_tracer().instant(
+                        "output_file", cat="file", task_id=self.task_id, file=path
+                    )
+                    target = os.path.join(target_dir, os.path.relpath(path, local_dir))
+                    self._submitted[path] = self.uploader.submit(self, path, target)
+
+    def record(self, target: str, ok: bool):
+        with self._lock:
+            (self.delivered if ok else self.failed).append(target)
+
+    def finish(self) -> bool:
+        """Kończy obserwację, wysyła pozostałe pliki i czeka na ich dostarczenie
+
+        Wywoływane po zakończeniu procesu C4D - wszystkie pliki są już kompletne.
+        Zwraca True, jeśli dostarczono wszystkie pliki.
+        """
+        self._stop_event.set()
+        self._thread.join()
+        self._scan(final=True)
+        for future in list(self._submitted.values()):
+            future.result()
+        for local_dir in self.folders:
+            _remove_empty_dirs(local_dir)
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(local_dir))
+        return not self.failed
+
+
+def _remove_empty_dirs(directory: str):
+    for root, _, _ in sorted(os.walk(directory), key=lambda item: -len(item[0])):
+        with contextlib.suppress(OSError):
+            os.rmdir(root)
+
+
+class OutputUploader:
+    """Wspólna pula wątków wysyłających klatki do folderów docelowych"""
+
+    def __init__(self, scratch_dir: str, workers: int = 4, retries: int = 5):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("output_uploader", log_to_file, log_file_path)
+
+        self.scratch_dir = scratch_dir
+        self.retries = max(1, retries)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="output-upload"
+        )
+
+    def scratch_folder(self, task_id: str, name: str = "") -> str:
+        """Zwraca lokalny folder roboczy zadania
+
+        Folder nie zależy od uruchomienia, więc pliki pozostawione przez
+        przerwany render zostaną wysłane przy kolejnej próbie.
+        """
+        return os.path.join(self.scratch_dir, task_id, name)
+
+    def start_delivery(self, task_id: str, folders: Dict[str, str]) -> OutputDelivery:
+        """Rozpoczyna obserwację folderów roboczych zadania (roboczy -> docelowy)"""
+        for local_dir in folders:
+            os.makedirs(local_dir, exist_ok=True)
+        return OutputDelivery(self, task_id, folders)
+
+    def submit(self, delivery: OutputDelivery, path: str, target: str) -> Future:
+        return self._executor.submit(self._deliver, delivery, path, target)
+
+    def _deliver(self, delivery: OutputDelivery, path: str, target: str):
+        with get_tracer().span("upload_file", cat="upload", file=target) as span:
+            span["ok"] = self._deliver_with_retries(delivery, path, target)
+
+    def _deliver_with_retries(
+        self, delivery: OutputDelivery, path: str, target: str
+    ) -> bool:
+        delay = 1.0
+        for attempt in range(1, self.retries + 1):
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                copy_file_verified(path, target)
+                os.remove(path)
+                delivery.record(target, True)
+                return True
+            except OSError as e:
+                self.logger.warning(
+                    f"Wysyłanie {os.path.basename(path)} nieudane "
+                    f"(próba {attempt}/{self.retries}): {e}"
+                )
+                if attempt < self.retries:
+                    time.sleep(delay)
+                    delay = min(delay * 2, MAX_RETRY_DELAY)
+        self.logger.error(f"Nie dostarczono pliku {path} do {target}")
+        delivery.record(target, False)
+        return False
+
+
+_uploader: Optional[OutputUploader] = None
+_uploader_lock = threading.Lock()
+
+
+def get_output_uploader() -> Optional[OutputUploader]:
+    """Zwraca wspólną pulę wysyłania lub None, jeśli zapis lokalny jest wyłączony"""
+    global _uploader
+    enabled, scratch_dir, workers, retries = get_config().get_local_output_settings()
+    if not enabled:
+        return None
+    with _uploader_lock:
+        if _uploader is None:
+            root = scratch_dir or os.path.join(
+                tempfile.gettempdir(), "c4d_render_output"
+            )
+            _uploader = OutputUploader(root, workers, retries)
+        return _uploader
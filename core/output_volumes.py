@@ -0,0 +1,297 @@
+"""
+Kontrola miejsca na wolumenach folderów wyjściowych.
+
+Każde zadanie przed startem dostaje szacunek rozmiaru wyników: pozostałe
+klatki razy średni rozmiar klatki - zmierzony na już zapisanych klatkach
+zadania, zapamiętany z poprzednich zadań tego projektu albo domyślny
+(default_frame_size_mb). Zadanie startuje, jeśli po odjęciu przewidywanego
+przyrostu trwających renderów na tym samym wolumenie zostaje na nie miejsce
+(z zapasem space_margin) i min_free_space_mb wolnego. W przeciwnym razie
+czeka w kolejce, a zadania na innych wolumenach renderują się dalej - pełny
+dysk nie kończy błędem kolejnych zadań jedno po drugim.
+
+Wolne miejsce wolumenu jest odczytywane (statvfs, często na udziale
+sieciowym) najwyżej raz na SCAN_INTERVAL przy sprawdzaniu czekających zadań -
+zajęte w międzyczasie miejsce pokrywają rezerwacje trwających renderów.
+
+Przepustowość zapisu to tempo ubywania wolnego miejsca (netto) w ostatniej
+minucie; razem z nim podawany jest czas do zapełnienia wolumenu.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from core.config import get_config
+from core.render_command import task_frames
+from core.task_recovery import rendered_frame_sizes
+from models.task import RenderTask
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+
+# Co ile sekund skanowane są foldery wyjściowe (trwających i czekających zadań)
+SCAN_INTERVAL = 15.0
+RATE_WINDOW = 60.0
+EWMA_ALPHA = 0.3
+
+
+def volume_of(path: str) -> str:
+    """Zwraca punkt montowania wolumenu, na którym leży (lub powstanie) ścieżka"""
+    path = os.path.abspath(path or ".")
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class OutputVolumeMonitor:
+    """Szacuje rozmiar wyników zadań i pilnuje wolnego miejsca na wolumenach"""
+
+    def __init__(self):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("output_volumes", log_to_file, log_file_path)
+        self._lock = threading.Lock()
+        self._volumes: Dict[str, str] = {}  # folder -> wolumen
+        # Średni rozmiar klatki i liczba klatek zadań według projektu
+        self._frame_bytes: Dict[str, float] = {}
+        self._frame_counts: Dict[str, float] = {}
+        # Przewidywany przyrost trwających zadań (ID -> (wolumen, bajty))
+        self._reserved: Dict[str, Tuple[str, float]] = {}
+        # Szacunki czekających zadań (ID -> (czas, bajty)) - bez skanu co pętlę
+        self._estimates: Dict[str, Tuple[float, float]] = {}
+        self._scanned = 0.0
+        # Ostatni odczyt miejsca (wolumen -> (czas, disk_usage lub None))
+        self._free: Dict[str, Tuple[float, Optional[Tuple[int, int, int, float]]]] = {}
+        self._usage: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._blocked: Dict[str, str] = {}  # ID zadania -> wolumen
+
+        metrics = get_metrics()
+        self._free_gauge = metrics.gauge(
+            "c4d_volume_free_bytes", "Wolne miejsce na wolumenie wyjściowym"
+        )
+        self._reserved_gauge = metrics.gauge(
+            "c4d_volume_reserved_bytes", "Przewidywany przyrost trwających renderów"
+        )
+        self._rate_gauge = metrics.gauge(
+            "c4d_volume_write_bytes_per_second",
+            "Tempo zapisu na wolumen wyjściowy (ostatnia minuta)",
+        )
+
+    def volume(self, task: RenderTask) -> str:
+        folder = task.output_folder
+        with self._lock:
+            volume = self._volumes.get(folder)
+        if volume is None:
+            volume = volume_of(folder)
+            with self._lock:
+                self._volumes[folder] = volume
+        return volume
+
+    def _average_frame_bytes(self, task: RenderTask, sizes: Dict[int, int]) -> float:
+        if sizes:
+            # Wczesne klatki zadania mówią o nim najwięcej
+            return sum(sizes.values()) / len(sizes)
+        with self._lock:
+            learned = self._frame_bytes.get(task.c4d_file_path)
+            if learned is None and self._frame_bytes:
+                learned = sum(self._frame_bytes.values()) / len(self._frame_bytes)
+        if learned is not None:
+            return learned
+        _, _, default_frame_mb = self.config.get_disk_space_settings()
+        return default_frame_mb * 1024**2
+
+    def estimate_bytes(self, task: RenderTask) -> float:
+        """Szacuje, ile bajtów zadanie jeszcze zapisze"""
+        sizes = rendered_frame_sizes(task)
+        frames = task_frames(task)
+        if frames is None:
+            # Zakres z pliku C4D - liczba klatek z poprzednich zadań projektu
+            with self._lock:
+                count = self._frame_counts.get(task.c4d_file_path, 1.0)
+            remaining = max(1.0, count - len(sizes))
+        else:
+            remaining = sum(1 for frame in frames if frame not in sizes)
+        return remaining * self._average_frame_bytes(task, sizes)
+
+    def _cached_estimate(self, task: RenderTask) -> float:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._estimates.get(task.id)
+        if cached is not None and now - cached[0] < SCAN_INTERVAL:
+            return cached[1]
+        estimate = self.estimate_bytes(task)
+        with self._lock:
+            self._estimates[task.id] = (now, estimate)
+        return estimate
+
+    def _volume_usage(self, volume: str) -> Optional[Tuple[int, int, int, float]]:
+        try:
+            usage = psutil.disk_usage(volume)
+        except OSError as e:
+            self.logger.error(f"Błąd odczytu miejsca na {volume}: {e}")
+            usage = None
+        with self._lock:
+            self._free[volume] = (time.monotonic(), usage)
+        return usage
+
+    def _cached_usage(self, volume: str) -> Optional[Tuple[int, int, int, float]]:
+        """Zwraca odczyt miejsca nie starszy niż SCAN_INTERVAL"""
+        with self._lock:
+            cached = self._free.get(volume)
+        if cached is not None and time.monotonic() - cached[0] < SCAN_INTERVAL:
+            return cached[1]
+        return self._volume_usage(volume)
+
+    def update(self, running: Iterable[RenderTask]):
+        """Odświeża przyrost trwających zadań i tempo zapisu - cyklicznie z kolejki"""
+        running = list(running)
+        now = time.monotonic()
+        if now - self._scanned >= SCAN_INTERVAL:
+            self._scanned = now
+            reserved = {
+                task.id: (self.volume(task), self.estimate_bytes(task))
+                for task in running
+            }
+            with self._lock:
+                self._reserved = reserved
+                # Szacunki zadań, które zniknęły z kolejki (np. anulowanych)
+                self._estimates = {
+                    task_id: value
+                    for task_id, value in self._estimates.items()
+                    if now - value[0] < SCAN_INTERVAL
+                }
+        else:
+            ids = {task.id for task in running}
+            with self._lock:
+                self._reserved = {
+                    task_id: value
+                    for task_id, value in self._reserved.items()
+                    if task_id in ids
+                }
+
+        with self._lock:
+            volumes = set(self._volumes.values())
+        for volume in volumes:
+            usage = self._volume_usage(volume)
+            if usage is None:
+                continue
+            with self._lock:
+                samples = self._usage.setdefault(volume, deque())
+                samples.append((now, usage.used))
+                while now - samples[0][0] > RATE_WINDOW:
+                    samples.popleft()
+            self._free_gauge.set(usage.free, volume=volume)
+            self._reserved_gauge.set(self._reserved_on(volume), volume=volume)
+            self._rate_gauge.set(self.write_rate(volume), volume=volume)
+
+    def _reserved_on(self, volume: str) -> float:
+        with self._lock:
+            return sum(
+                size
+                for (task_volume, size) in self._reserved.values()
+                if task_volume == volume
+            )
+
+    def write_rate(self, volume: str) -> float:
+        """Tempo zapisu (bajty/s netto) na wolumenie w ostatniej minucie"""
+        with self._lock:
+            samples = list(self._usage.get(volume, ()))
+        if len(samples) < 2 or samples[-1][0] <= samples[0][0]:
+            return 0.0
+        (start, used_start), (end, used_end) = samples[0], samples[-1]
+        return max(0.0, (used_end - used_start) / (end - start))
+
+    def can_start(self, task: RenderTask) -> bool:
+        """Czy wyniki zadania zmieszczą się na jego wolumenie"""
+        volume = self.volume(task)
+        usage = self._cached_usage(volume)
+        if usage is None:
+            return True
+        min_free_mb, margin, _ = self.config.get_disk_space_settings()
+        needed = self._cached_estimate(task) * margin
+        available = usage.free - self._reserved_on(volume) - min_free_mb * 1024**2
+        with self._lock:
+            was_blocked = task.id in self._blocked
+            if needed <= available:
+                self._blocked.pop(task.id, None)
+            else:
+                self._blocked[task.id] = volume
+        if needed <= available:
+            if was_blocked:
+                self.logger.info(f"Jest miejsce na {volume} - {task.name} może ruszyć")
+            return True
+        if not was_blocked:
+            self.logger.warning(
+                f"Za mało miejsca na {volume} dla {task.name}: potrzeba "
+                f"{needed / 1024**2:.0f} MB, dostępne {available / 1024**2:.0f} MB"
+                f" - zadanie czeka"
+            )
+        return False
+
+    def start(self, task: RenderTask):
+        """Rezerwuje szacowany przyrost zadania do najbliższego skanowania"""
+        volume = self.volume(task)
+        estimate = self._cached_estimate(task)
+        with self._lock:
+            self._reserved[task.id] = (volume, estimate)
+            self._estimates.pop(task.id, None)
+
+    def task_finished(self, task: RenderTask):
+        """Zapamiętuje rozmiar i liczbę klatek zadania dla kolejnych szacunków"""
+        sizes = rendered_frame_sizes(task)
+        frames = task_frames(task)
+        if frames is not None:
+            sizes = {frame: size for frame, size in sizes.items() if frame in frames}
+        with self._lock:
+            self._reserved.pop(task.id, None)
+            self._blocked.pop(task.id, None)
+            self._estimates.pop(task.id, None)
+            if not sizes:
+                return
+            project = task.c4d_file_path
+            for learned, value in (
+                (self._frame_bytes, sum(sizes.values()) / len(sizes)),
+                (self._frame_counts, float(len(frames or sizes))),
+            ):
+                previous = learned.get(project)
+                learned[project] = (
+                    value
+                    if previous is None
+                    else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
+                )
+
+    def snapshot(self) -> List[Dict[str, float]]:
+        """Zwraca stan wolumenów (wolne, zarezerwowane, tempo zapisu, czekające)"""
+        with self._lock:
+            volumes = sorted(set(self._volumes.values()))
+            blocked = list(self._blocked.values())
+        result = []
+        for volume in volumes:
+            usage = self._cached_usage(volume)
+            if usage is None:
+                continue
+            rate = self.write_rate(volume)
+            result.append(
+                {
+                    "volume": volume,
+                    "free_bytes": usage.free,
+                    "percent": usage.percent,
+                    "reserved_bytes": self._reserved_on(volume),
+                    "write_bytes_per_second": rate,
+                    "seconds_to_full": usage.free / rate if rate > 0 else None,
+                    "blocked_tasks": blocked.count(volume),
+                }
+            )
+        return result
@@ -0,0 +1,211 @@
+"""
+Uruchamianie procesów Commandline zależne od platformy.
+
+Linux/macOS: każdy render startuje we własnej sesji (grupie procesów), więc
+przerwanie zadania kończy całe drzewo procesów C4D. Ustawienie priority
+zadania przekłada się na nice i ionice, a memory_limit (MB) jest egzekwowany
+przez cgroup v2 (memory.max bez swapu). RLIMIT_AS wymaga jawnego
+memory_limit_mode "rlimit" - ogranicza przestrzeń adresową, którą C4D,
+stosy wątków i sterowniki GPU rezerwują daleko ponad zużytą pamięć.
+
+Windows: proces bez okna konsoli, we własnej grupie procesów, z klasą
+priorytetu odpowiadającą ustawieniu priority. memory_limit trafia tam tylko
+do flagi C4D.
+
+Priorytet i limity są ustawiane zaraz po starcie procesu - C4D wczytuje
+scenę znacznie dłużej, niż trwa ich nałożenie.
+"""
+
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from core.config import get_config
+from utils.logger import setup_logger
+
+# Ujemne nice wymaga CAP_SYS_NICE - bez uprawnień "high" zostaje przy 0
+PRIORITY_NICE = {"low": 10, "normal": 0, "high": -5}
+# Poziom ionice w klasie best-effort (0 - najwyższy, 7 - najniższy)
+PRIORITY_IONICE = {"low": 7, "normal": 4, "high": 0}
+PRIORITY_CLASSES = {
+    "low": "BELOW_NORMAL_PRIORITY_CLASS",
+    "normal": "NORMAL_PRIORITY_CLASS",
+    "high": "ABOVE_NORMAL_PRIORITY_CLASS",
+}
+
+
+class ProcessLauncher:
+    """Uruchamia proces renderowania i nakłada na niego limity"""
+
+    def __init__(self):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("process_launcher", log_to_file, log_file_path)
+
+    def popen_kwargs(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        return {}
+
+    def launch(
+        self, cmd: List[str], settings: Dict[str, Any], **kwargs
+    ) -> subprocess.Popen:
+        """Uruchamia komendę z ustawieniami zadania (priority, memory_limit)"""
+        kwargs.update(self.popen_kwargs(settings))
+        process = subprocess.Popen(cmd, **kwargs)
+        try:
+            self.apply_limits(process, settings)
+        except Exception as e:
+            self.logger.warning(f"Nie udało się nałożyć limitów procesu: {e}")
+        return process
+
+    def apply_limits(self, process: subprocess.Popen, settings: Dict[str, Any]):
+        pass
+
+    def kill(self, process: subprocess.Popen):
+        """Kończy proces renderowania wraz z jego procesami potomnymi"""
+        process.kill()
+
+    def release(self, process: subprocess.Popen):
+        """Sprząta po zakończonym procesie (np. usuwa jego cgroup)"""
+
+
+class WindowsProcessLauncher(ProcessLauncher):
+    def popen_kwargs(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        flags = subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+        priority_class = PRIORITY_CLASSES.get(settings.get("priority"))
+        if priority_class:
+            flags |= getattr(subprocess, priority_class)
+        return {"creationflags": flags}
+
+    def kill(self, process: subprocess.Popen):
+        with contextlib.suppress(psutil.Error):
+            for child in psutil.Process(process.pid).children(recursive=True):
+                with contextlib.suppress(psutil.Error):
+                    child.kill()
+        process.kill()
+
+
+class PosixProcessLauncher(ProcessLauncher):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # PID procesu -> katalog jego cgroup
+        self._cgroups: Dict[int, str] = {}
+
+    def popen_kwargs(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        # Własna sesja - sygnał do grupy dociera do wszystkich procesów C4D
+        return {"start_new_session": True}
+
+    def apply_limits(self, process: subprocess.Popen, settings: Dict[str, Any]):
+        priority = settings.get("priority")
+        if priority in PRIORITY_NICE:
+            self._set_priority(process.pid, priority)
+        memory_limit = settings.get("memory_limit")
+        if memory_limit:
+            self._limit_memory(process.pid, int(memory_limit) * 1024**2)
+
+    def _set_priority(self, pid: int, priority: str):
+        proc = psutil.Process(pid)
+        try:
+            proc.nice(PRIORITY_NICE[priority])
+        except psutil.AccessDenied:
+            self.logger.info(f"Brak uprawnień do nice {PRIORITY_NICE[priority]}")
+        if hasattr(proc, "ionice") and sys.platform.startswith("linux"):
+            with contextlib.suppress(psutil.Error, OSError):
+                proc.ionice(psutil.IOPRIO_CLASS_BE, PRIORITY_IONICE[priority])
+
+    def _limit_memory(self, pid: int, limit_bytes: int):
+        mode, cgroup_root = self.config.get_process_limit_settings()
+        if mode == "off":
+            return
+        if mode == "rlimit":
+            if hasattr(resource, "prlimit"):
+                resource.prlimit(pid, resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+                self.logger.info(
+                    f"Limit pamięci (RLIMIT_AS): {limit_bytes // 1024**2} MB"
+                )
+            else:
+                self.logger.warning("Limit pamięci niedostępny na tej platformie")
+            return
+        error = self._join_cgroup(pid, cgroup_root, limit_bytes)
+        if error is not None:
+            self.logger.warning(f"Nie nałożono limitu pamięci (cgroup): {error}")
+
+    def _join_cgroup(self, pid: int, root: str, limit_bytes: int) -> Optional[str]:
+        """Przenosi proces do nowej cgroup z limitem pamięci; zwraca błąd lub None
+
+        root to delegowana gałąź cgroup v2 z prawem zapisu dla użytkownika
+        (np. utworzona przez systemd z Delegate=yes).
+        """
+        if not root:
+            return "nie ustawiono render_cgroup"
+        if not os.path.exists(os.path.join(root, "cgroup.controllers")):
+            return f"{root} nie jest katalogiem cgroup v2"
+        path = os.path.join(root, f"c4d-render-{pid}")
+        try:
+            with open(os.path.join(root, "cgroup.subtree_control"), "r") as f:
+                enabled = f.read().split()
+            if "memory" not in enabled:
+                with open(os.path.join(root, "cgroup.subtree_control"), "w") as f:
+                    f.write("+memory")
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "memory.max"), "w") as f:
+                f.write(str(limit_bytes))
+            # Bez swapu - przekroczenie limitu kończy render zamiast spowalniać węzeł
+            with contextlib.suppress(OSError):
+                with open(os.path.join(path, "memory.swap.max"), "w") as f:
+                    f.write("0")
+            with open(os.path.join(path, "cgroup.procs"), "w") as f:
+                f.write(str(pid))
+        except OSError as e:
+            with contextlib.suppress(OSError):
+                os.rmdir(path)
+            return str(e)
+        with self._lock:
+            self._cgroups[pid] = path
+        self.logger.info(f"Limit pamięci (cgroup): {limit_bytes // 1024**2} MB")
+        return None
+
+    def kill(self, process: subprocess.Popen):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.kill()
+
+    def release(self, process: subprocess.Popen):
+        with self._lock:
+            path = self._cgroups.pop(process.pid, None)
+        if path is None:
+            return
+        # Procesy potomne pozostawione przez C4D blokowałyby usunięcie cgroup
+        with contextlib.suppress(OSError):
+            with open(os.path.join(path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        with contextlib.suppress(OSError):
+            os.rmdir(path)
+
+
+_launcher: Optional[ProcessLauncher] = None
+_launcher_lock = threading.Lock()
+
+
+def get_process_launcher() -> ProcessLauncher:
+    """Zwraca launcher procesów dla bieżącej platformy"""
+    global _launcher
+    with _launcher_lock:
+        if _launcher is None:
+            if os.name == "nt":
+                _launcher = WindowsProcessLauncher()
+            else:
+                _launcher = PosixProcessLauncher()
+        return _launcher
@@ -4,26 +4,63 @@ import threading
 import time
 from datetime import datetime
 from queue import Queue
-from typing import Callable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
 
+from core.adaptive_concurrency import AdaptiveConcurrency
 from core.cinema4d_controller import Cinema4DController
-from core.config import Config
+from core.config import get_config
+from core.output_volumes import OutputVolumeMonitor
+from core.render_metrics import get_render_stats
+from core.render_server import get_render_server_pool
+from core.render_suspender import get_render_suspender, kill_tree, resume_tree
+from core.render_command import compile_task, frame_set_fields, task_frames
+from core.task_batching import batch_key, select_batch
+from core.task_graph import blocking_dependency, find_cycle, is_ready, task_index
+from core.task_leases import LeaseManager
+from core.task_recovery import (
+    find_rendered_frames,
+    missing_frames,
+    remaining_frame_set,
+)
 from models.task import RenderTask, TaskStatus
+from utils.atomic_file import atomic_write_json, remove_stale_temp_files
 from utils.logger import setup_logger
+from utils.process_accounting import find_process
+from utils.tracing import TASK_SPAN, get_tracer
 
 
 class QueueManager:
     TASKS_DIR = "tasks"
+    # Co ile sekund kontroler slotów ocenia obciążenie
+    CONCURRENCY_INTERVAL = 1.0
 
     def __init__(self):
         self.task_queue = Queue()
         self.tasks: List[RenderTask] = []
-        self.current_task: Optional[RenderTask] = None
         self.is_processing = False
+        # Ręczne wstrzymanie kolejki - trwające rendery są zamrażane
+        self.is_paused = False
         self.worker_thread: Optional[threading.Thread] = None
-        self.c4d_controller = Cinema4DController()
-        self.config = Config()
-        self.c4d_paths = self._load_c4d_paths()
+        self.config = get_config()
+
+        # Równoległe rendery: slot -> zadanie i wątek, który je wykonuje
+        self.running_tasks: Dict[int, RenderTask] = {}
+        self._slot_threads: Dict[int, threading.Thread] = {}
+        # Slot -> zadania renderowane razem z zadaniem slotu (task_batching)
+        self._batches: Dict[int, List[RenderTask]] = {}
+        adaptive, max_slots, window = self.config.get_concurrency_settings()
+        self.concurrency = AdaptiveConcurrency(adaptive, max_slots, window)
+        get_render_stats().add_frame_listener(self.concurrency.frame_done)
+        self.suspender = get_render_suspender()
+        self.volumes = OutputVolumeMonitor()
+
+        # Blokada chroniąca listę zadań, kolejkę i zapisy przed dostępem
+        # z wielu wątków (worker, GUI, API HTTP)
+        self._lock = threading.RLock()
+
+        # Kontroler C4D tworzony leniwie - listowanie i anulowanie go nie potrzebują
+        self._c4d_controller: Optional[Cinema4DController] = None
+        self._tasks_loaded = False
 
         # Inicjalizacja loggera
         log_to_file, log_file_path = self.config.get_logging_settings()
@@ -37,54 +74,308 @@ class QueueManager:
         # Upewnij się, że folder tasks istnieje
         os.makedirs(self.TASKS_DIR, exist_ok=True)
 
-        # Wczytaj zadania, ale nie dodawaj ich do kolejki
-        self._load_tasks_from_files()
+        # Wspólny folder zadań - wiele instancji pobiera pracę przez dzierżawy
+        shared, lease_duration, node_id = self.config.get_shared_queue_settings()
+        self._leases: Optional[LeaseManager] = (
+            LeaseManager(self.TASKS_DIR, node_id, lease_duration, self._on_lease_lost)
+            if shared
+            else None
+        )
+        # Zadania, których dzierżawę przejął inny węzeł w trakcie renderu -
+        # ich wynik nie jest zapisywany (stan na dysku należy do nowego węzła)
+        self._lost_leases: Set[str] = set()
+
+    @property
+    def c4d_controller(self) -> Cinema4DController:
+        """Zwraca kontroler Cinema 4D (tworzony przy pierwszym użyciu)"""
+        if self._c4d_controller is None:
+            self.c4d_controller = Cinema4DController()
+        return self._c4d_controller
+
+    @c4d_controller.setter
+    def c4d_controller(self, controller: Cinema4DController):
+        # PID procesu C4D trafia od razu do pliku zadania (odzyskiwanie po awarii)
+        controller.on_process_started = self.save_task
+        self._c4d_controller = controller
 
     def _load_c4d_paths(self) -> dict:
-        """Wczytuje ścieżki do Cinema 4D z config.json"""
-        try:
-            with open("config.json", "r", encoding="utf-8") as f:
-                config = json.load(f)
-                return config.get("c4d_versions", {})
-        except Exception as e:
-            self.logger.error(f"Błąd wczytywania config.json: {e}")
-            return {}
+        """Zwraca ścieżki do Cinema 4D ze wspólnej konfiguracji"""
+        return self.config.get_c4d_versions()
+
+    def _ensure_tasks_loaded(self):
+        """Wczytuje zadania z plików przy pierwszym dostępie"""
+        if not self._tasks_loaded:
+            self._load_tasks_from_files()
+
+    def _iter_task_files(self) -> List[str]:
+        """Zwraca posortowane ścieżki plików zadań z folderu tasks"""
+        return [
+            os.path.join(self.TASKS_DIR, filename)
+            for filename in sorted(os.listdir(self.TASKS_DIR))
+            if filename.startswith("task_") and filename.endswith(".json")
+        ]
+
+    def _read_task_file(self, task_file: str) -> RenderTask:
+        """Wczytuje pojedyncze zadanie z pliku JSON"""
+        with open(task_file, "r", encoding="utf-8") as f:
+            return self._dict_to_task(json.load(f))
 
     def _load_tasks_from_files(self):
         """Wczytuje zadania z plików JSON bez dodawania do kolejki"""
+        # Wczytaj wszystkie pliki zadań z folderu tasks; uszkodzony lub
+        # zapisywany właśnie przez inny proces plik nie blokuje pozostałych
+        self.tasks = []
+        for task_file in self._iter_task_files():
+            try:
+                self.tasks.append(self._read_task_file(task_file))
+            except Exception as e:
+                self.logger.error(f"Błąd odczytu zadania {task_file}: {e}")
+
+        self.logger.info(f"Wczytano {len(self.tasks)} zadań")
+        self._tasks_loaded = True
+
+    def refresh_from_files(self) -> int:
+        """Dołącza zadania dodane przez inne procesy i anulowania zapisane na dysku"""
+        self._ensure_tasks_loaded()
+        known = {task.id: task for task in self.tasks}
+        added = 0
+        for task_file in self._iter_task_files():
+            try:
+                disk_task = self._read_task_file(task_file)
+            except Exception as e:
+                self.logger.error(f"Błąd odczytu zadania {task_file}: {e}")
+                continue
+
+            with self._lock:
+                task = known.get(disk_task.id)
+                if task is None:
+                    self.tasks.append(disk_task)
+                    if disk_task.status == TaskStatus.PENDING:
+                        self.task_queue.put(disk_task)
+                        self.logger.info(f"Dodano zadanie do kolejki: {disk_task.name}")
+                    added += 1
+                elif self._leases:
+                    self._sync_shared_task(task, disk_task)
+                elif (
+                    task.status == TaskStatus.PENDING
+                    and disk_task.status == TaskStatus.CANCELLED
+                ):
+                    # Pętla kolejki pomija anulowane zadania
+                    task.status = TaskStatus.CANCELLED
+                    self.logger.info(f"Zadanie anulowane z zewnątrz: {task.name}")
+        return added
+
+    def is_shared_queue(self) -> bool:
+        """Czy folder zadań jest współdzielony z innymi instancjami"""
+        return self._leases is not None
+
+    def _read_disk_task(self, task: RenderTask) -> Optional[RenderTask]:
+        """Wczytuje aktualny stan zadania z jego pliku (None przy błędzie)"""
         try:
-            # Wczytaj wszystkie pliki zadań z folderu tasks
-            self.tasks = []
-            for filename in os.listdir(self.TASKS_DIR):
-                if filename.startswith("task_") and filename.endswith(".json"):
-                    task_file = os.path.join(self.TASKS_DIR, filename)
-                    with open(task_file, "r", encoding="utf-8") as f:
-                        task_data = json.load(f)
-                        task = self._dict_to_task(task_data)
-                        self.tasks.append(task)
-
-            self.logger.info(f"Wczytano {len(self.tasks)} zadań")
-        except Exception as e:
-            self.logger.error(f"Błąd odczytu zadań: {e}")
+            return self._read_task_file(self.get_task_file_path(task))
+        except Exception:
+            return None
+
+    def _apply_disk_state(self, task: RenderTask, disk_task: RenderTask):
+        """Przepisuje stan zadania zapisany na dysku przez inny węzeł"""
+        task.status = disk_task.status
+        task.started_at = disk_task.started_at
+        task.completed_at = disk_task.completed_at
+        task.error_message = disk_task.error_message
+        task.output_files = disk_task.output_files
+        task.resource_usage = disk_task.resource_usage
+
+    def _sync_shared_task(self, task: RenderTask, disk_task: RenderTask):
+        """Uzgadnia zadanie ze stanem we wspólnym folderze (pod blokadą)"""
+        if self._leases.holds(task.id):
+            # To zadanie renderuje ten węzeł - stan lokalny jest aktualny
+            return
+
+        if disk_task.status == TaskStatus.RUNNING and self._leases.is_expired(task.id):
+            # Węzeł renderujący zadanie przestał działać - zwróć je do kolejki
+            if self._leases.acquire(task.id):
+                disk_task = self._read_disk_task(task) or disk_task
+                if disk_task.status == TaskStatus.RUNNING:
+                    disk_task.status = TaskStatus.PENDING
+                    disk_task.started_at = None
+                    self._apply_disk_state(task, disk_task)
+                    self.save_task(task)
+                    self.logger.warning(
+                        f"Przywrócono zadanie porzucone przez inny węzeł: {task.name}"
+                    )
+                self._leases.release(task.id)
+        elif disk_task.status != task.status:
+            self._apply_disk_state(task, disk_task)
+
+        if (
+            task.status == TaskStatus.PENDING
+            and task not in list(self.task_queue.queue)
+            and self._leases.is_expired(task.id)
+        ):
+            self.task_queue.put(task)
+            self.logger.info(f"Dodano zadanie do kolejki: {task.name}")
+
+    def _claim_shared_task(self, task: RenderTask) -> bool:
+        """Przejmuje dzierżawę zadania i sprawdza, czy nadal czeka na dysku"""
+        if not self._leases.acquire(task.id):
+            self.logger.info(f"Zadanie przejęte przez inny węzeł: {task.name}")
+            return False
+        disk_task = self._read_disk_task(task)
+        if disk_task is not None and disk_task.status != TaskStatus.PENDING:
+            self._leases.release(task.id)
+            self._apply_disk_state(task, disk_task)
+            self.logger.info(
+                f"Zadanie ma już status {task.status.value} na dysku: {task.name}"
+            )
+            return False
+        return True
+
+    def _on_lease_lost(self, task_id: str):
+        """Przerywa lokalny render zadania, którego dzierżawę przejął inny węzeł"""
+        with self._lock:
+            self._lost_leases.add(task_id)
+            # Render paczki prowadzi zadanie slotu - jego proces renderuje też resztę
+            renders = [
+                lead
+                for slot, lead in self.running_tasks.items()
+                if task_id
+                in {lead.id, *(item.id for item in self._batches.get(slot, ()))}
+            ]
+            task = self.find_task(task_id)
+        if task is not None and task.render_process and not renders:
+            # Proces przejęty po awarii aplikacji (_adopt_render_process)
+            renders = [task]
+        self.logger.error(
+            f"Dzierżawę zadania {task.name if task else task_id} przejął inny węzeł"
+            f" - przerywam lokalny render"
+        )
+        for lead in renders:
+            try:
+                kill_tree(lead)
+            except Exception as e:
+                self.logger.error(f"Nie udało się przerwać renderu {lead.name}: {e}")
+
+    def _lease_was_lost(self, task: RenderTask) -> bool:
+        """Sprawdza (i zapomina), czy dzierżawa zadania przepadła w trakcie renderu"""
+        with self._lock:
+            if task.id not in self._lost_leases:
+                return False
+            self._lost_leases.discard(task.id)
+        self.logger.warning(
+            f"Pominięto zapis wyniku zadania {task.name} - renderuje je inny węzeł"
+        )
+        return True
+
+    def _release_task(self, task: RenderTask):
+        """Zwalnia dzierżawę zadania (po zapisaniu jego wyniku)"""
+        if self._leases:
+            self._leases.release(task.id)
 
     def load_tasks(self):
         """Wczytuje zadania i dodaje PENDING do kolejki"""
-        self._load_tasks_from_files()
+        with self._lock:
+            self._load_tasks_from_files()
+            self.recover_interrupted_tasks()
+
+            # Wyczyść kolejkę
+            while not self.task_queue.empty():
+                self.task_queue.get()
+
+            # Dodaj tylko PENDING zadania do kolejki
+            pending_count = 0
+            for task in self.tasks:
+                if task.status == TaskStatus.PENDING:
+                    self.task_queue.put(task)
+                    pending_count += 1
+                    self.logger.info(f"Dodano zadanie do kolejki: {task.name}")
+
+            self.logger.info(f"Dodano do kolejki {pending_count} zadań")
+            if not self._leases:
+                # We wspólnym folderze zapis wszystkich plików nadpisałby
+                # zmiany wprowadzone przez inne węzły
+                self.save_tasks()
 
-        # Wyczyść kolejkę
-        while not self.task_queue.empty():
-            self.task_queue.get()
+    def recover_interrupted_tasks(self) -> int:
+        """Odzyskuje zadania RUNNING pozostawione przez przerwane uruchomienie
 
-        # Dodaj tylko PENDING zadania do kolejki
-        pending_count = 0
+        Jeśli proces C4D zapisany w zadaniu nadal działa, jest przejmowany
+        (nadzór do jego zakończenia). W przeciwnym razie zadanie wraca do
+        kolejki i jest wznawiane od ostatniej wyrenderowanej klatki.
+        """
+        remove_stale_temp_files(self.TASKS_DIR)
+        recovered = 0
         for task in self.tasks:
-            if task.status == TaskStatus.PENDING:
+            if task.status != TaskStatus.RUNNING:
+                continue
+            if self._leases and not self._leases.acquire(task.id):
+                # Zadanie renderuje inna instancja korzystająca z folderu
+                continue
+
+            process = find_process(task.render_process)
+            if process is not None:
+                self._adopt_render_process(task, process)
+            else:
+                self._requeue_interrupted_task(task)
+            recovered += 1
+
+        if recovered:
+            self.logger.info(f"Odzyskano przerwanych zadań: {recovered}")
+        return recovered
+
+    def _requeue_interrupted_task(self, task: RenderTask):
+        """Przywraca przerwane zadanie do stanu PENDING"""
+        remaining = remaining_frame_set(task)
+        if remaining is not None:
+            task.frame_set, task.start_frame, task.end_frame = frame_set_fields(
+                remaining
+            )
+        task.status = TaskStatus.PENDING
+        task.started_at = None
+        task.render_process = {}
+        task.suspended = False
+        self.save_task(task)
+        self._release_task(task)
+        if remaining is not None:
+            self.logger.warning(
+                f"Przywrócono przerwane zadanie {task.name} - pozostałe klatki: "
+                f"{task.frame_set}"
+            )
+        else:
+            self.logger.warning(f"Przywrócono przerwane zadanie: {task.name}")
+
+    def _adopt_render_process(self, task: RenderTask, process):
+        """Nadzoruje proces C4D uruchomiony przed awarią aplikacji"""
+        self.logger.warning(
+            f"Proces C4D zadania {task.name} (PID {process.pid}) nadal działa - "
+            f"przejmuję nadzór"
+        )
+        if task.suspended:
+            # Wstrzymanie należało do poprzedniego uruchomienia aplikacji
+            resume_tree(task)
+            task.suspended = False
+
+        def watch():
+            try:
+                process.wait()
+            except Exception:
+                pass
+            # Kod wyjścia obcego procesu nie jest znany - decydują pliki klatek
+            rendered = find_rendered_frames(task)
+            if task_frames(task) is None:
+                finished = bool(rendered)
+            else:
+                finished = not missing_frames(task, rendered)
+            if finished:
+                task.render_process = {}
+                self.complete_task(task, True)
+                return
+            with self._lock:
+                self._requeue_interrupted_task(task)
                 self.task_queue.put(task)
-                pending_count += 1
-                self.logger.info(f"Dodano zadanie do kolejki: {task.name}")
 
-        self.logger.info(f"Dodano do kolejki {pending_count} zadań")
-        self.save_tasks()
+        threading.Thread(
+            target=watch, name=f"adopted-render-{process.pid}", daemon=True
+        ).start()
 
     def add_task(self, task: RenderTask):
         """Dodaje zadanie do kolejki"""
@@ -93,34 +384,189 @@ class QueueManager:
         self.logger.info(f"Folder wyjściowy: {task.output_folder}")
         self.logger.info(f"Wersja C4D: {task.cinema4d_version}")
 
-        self.tasks.append(task)
-        self.task_queue.put(task)
+        self._ensure_tasks_loaded()
+        with self._lock:
+            self.tasks.append(task)
+            self._reject_cycle(task, task_index(self.tasks))
+            self.task_queue.put(task)
+            get_tracer().instant("enqueue", track="queue", task_id=task.id)
+            # Zapisz tylko nowe zadanie - pozostałe pliki się nie zmieniły
+            self.save_task(task)
         self.logger.info(f"Dodano zadanie do kolejki: {task.name}")
         self.logger.info(f"Aktualna liczba zadań w kolejce: {self.task_queue.qsize()}")
-        self.save_tasks()
+
+    def add_tasks(self, tasks: List[RenderTask]):
+        """Dodaje wiele zadań naraz (import) w jednej operacji na kolejce"""
+        if not tasks:
+            return
+        self._ensure_tasks_loaded()
+        with self._lock:
+            self.tasks.extend(tasks)
+            by_id = task_index(self.tasks)
+            for task in tasks:
+                self._reject_cycle(task, by_id)
+            tracer = get_tracer()
+            for task in tasks:
+                self.task_queue.put(task)
+                tracer.instant("enqueue", track="queue", task_id=task.id)
+            # Zapisywane są tylko pliki nowych zadań
+            for task in tasks:
+                self.save_task(task)
+        self.logger.info(f"Dodano {len(tasks)} zadań do kolejki")
+        self.logger.info(f"Aktualna liczba zadań w kolejce: {self.task_queue.qsize()}")
+
+    def _reject_cycle(self, task: RenderTask, by_id: Dict[str, RenderTask]):
+        """Oznacza jako FAILED zadanie, którego zależności tworzą cykl"""
+        cycle = find_cycle(task, by_id) if task.depends_on else None
+        if cycle:
+            task.status = TaskStatus.FAILED
+            task.error_message = f"Cykliczna zależność: {' -> '.join(cycle)}"
+            task.completed_at = datetime.now()
+            self.logger.error(f"{task.error_message} ({task.name})")
+
+    def settle_dependents(self, extra: Iterable[RenderTask] = ()):
+        """Kończy zadania, których zależność zakończyła się błędem lub anulowaniem
+
+        Powtarzane do skutku - zadania zależne pośrednio kończą się w tym
+        samym przebiegu. extra to zakończone zadania spoza kolejki (np.
+        odrzucone przy walidacji w API).
+        """
+        settled = []
+        with self._lock:
+            by_id = task_index(list(extra) + self.tasks)
+            changed = True
+            while changed:
+                changed = False
+                for task in self.tasks:
+                    if task.status != TaskStatus.PENDING or not task.depends_on:
+                        continue
+                    dependency = blocking_dependency(task, by_id)
+                    if dependency is None:
+                        continue
+                    if self._leases and not self._claim_shared_task(task):
+                        continue
+                    task.status = (
+                        TaskStatus.FAILED
+                        if dependency.status == TaskStatus.FAILED
+                        else TaskStatus.CANCELLED
+                    )
+                    task.error_message = (
+                        f"Zależność {dependency.name} zakończona statusem "
+                        f"{dependency.status.value}"
+                    )
+                    task.completed_at = datetime.now()
+                    self.save_task(task)
+                    self._release_task(task)
+                    settled.append(task)
+                    changed = True
+
+        for task in settled:
+            self.logger.warning(f"Pominięto zadanie {task.name}: {task.error_message}")
+            if task.status == TaskStatus.FAILED:
+                get_render_stats().task_finished(task, False)
+                if self.on_task_failed:
+                    self.on_task_failed(task)
 
     def remove_task(self, task_id: str) -> bool:
         """Usuwa zadanie z kolejki"""
-        for task in self.tasks:
-            if task.id == task_id and task.status == TaskStatus.PENDING:
-                self.tasks.remove(task)
-                task.status = TaskStatus.CANCELLED
-                self.save_tasks()
-                return True
+        with self._lock:
+            for task in self.tasks:
+                if task.id == task_id and task.status == TaskStatus.PENDING:
+                    self.tasks.remove(task)
+                    task.status = TaskStatus.CANCELLED
+                    self.save_tasks()
+                    return True
         return False
 
+    def cancel_task(self, task_id: str) -> bool:
+        """Anuluje zadanie PENDING, zachowując je na liście i na dysku"""
+        with self._lock:
+            task = self.find_task(task_id)
+            if task is None or task.status != TaskStatus.PENDING:
+                return False
+            if self._leases and not self._claim_shared_task(task):
+                return False
+            task.status = TaskStatus.CANCELLED
+            task.completed_at = datetime.now()
+            self.save_task(task)
+            self._release_task(task)
+        self.logger.info(f"Anulowano zadanie: {task.name}")
+        return True
+
+    def reorder_tasks(self, task_ids: List[str]) -> List[str]:
+        """Przesuwa podane zadania PENDING na początek kolejki w podanej kolejności
+
+        Pozostałe zadania zachowują swoją względną kolejność. Zwraca listę
+        ID, które zostały faktycznie przesunięte.
+        """
+        with self._lock:
+            by_id = {task.id: task for task in self.tasks}
+            front = []
+            for task_id in task_ids:
+                task = by_id.get(task_id)
+                if task and task.status == TaskStatus.PENDING and task not in front:
+                    front.append(task)
+
+            # Kolejność w kolejce (Queue chroni swoją dekę własnym mutexem)
+            with self.task_queue.mutex:
+                rest = [task for task in self.task_queue.queue if task not in front]
+                self.task_queue.queue.clear()
+                self.task_queue.queue.extend(
+                    [task for task in front if task.status == TaskStatus.PENDING] + rest
+                )
+
+            # Kolejność na liście zadań (widok tabeli odpowiada kolejce)
+            others = [task for task in self.tasks if task not in front]
+            self.tasks[:] = front + others
+        return [task.id for task in front]
+
+    def pending_count(self) -> int:
+        """Zwraca liczbę zadań oczekujących na renderowanie"""
+        with self._lock:
+            return sum(1 for task in self.tasks if task.status == TaskStatus.PENDING)
+
+    def find_task(self, task_id: str) -> Optional[RenderTask]:
+        """Zwraca zadanie o podanym ID (lub unikalnym prefiksie ID)"""
+        self._ensure_tasks_loaded()
+        matches = [task for task in self.tasks if task.id.startswith(task_id)]
+        exact = [task for task in matches if task.id == task_id]
+        if exact:
+            return exact[0]
+        return matches[0] if len(matches) == 1 else None
+
     def edit_task(self, task_id: str, new_task: RenderTask) -> bool:
         """Edytuje istniejące zadanie (tylko PENDING)"""
-        for i, task in enumerate(self.tasks):
-            if task.id == task_id and task.status == TaskStatus.PENDING:
-                self.tasks[i] = new_task
-                self.save_tasks()
-                return True
+        with self._lock:
+            for i, task in enumerate(self.tasks):
+                if task.id == task_id and task.status == TaskStatus.PENDING:
+                    if self._leases and not self._claim_shared_task(task):
+                        return False
+                    self.tasks[i] = new_task
+                    # Podmień również obiekt oczekujący w kolejce
+                    with self.task_queue.mutex:
+                        queued = self.task_queue.queue
+                        for j, queued_task in enumerate(queued):
+                            if queued_task is task:
+                                queued[j] = new_task
+                    self.save_task(new_task)
+                    self._release_task(task)
+                    return True
         return False
 
+    def pause_queue(self):
+        """Wstrzymuje kolejkę - trwające rendery są zamrażane, nie przerywane"""
+        self.is_paused = True
+        self.logger.info("Wstrzymano kolejkę")
+
+    def resume_queue(self):
+        """Wznawia wstrzymaną kolejkę i zamrożone rendery"""
+        self.is_paused = False
+        self.logger.info("Wznowiono kolejkę")
+
     def start_processing(self):
         """Rozpoczyna przetwarzanie kolejki"""
         if not self.is_processing:
+            self._ensure_tasks_loaded()
             # Przed rozpoczęciem, upewnij się że wszystkie PENDING zadania są w kolejce
             for task in self.tasks:
                 if task.status == TaskStatus.PENDING and task not in list(
@@ -141,103 +587,318 @@ class QueueManager:
         self.is_processing = False
         if self.worker_thread:
             self.worker_thread.join()
+        # Rozpoczęte rendery kończą się normalnie - wstrzymane trzeba wznowić
+        self.is_paused = False
+        for task in self._running_list():
+            self.suspender.resume(task)
+        for thread in list(self._slot_threads.values()):
+            thread.join()
+        get_render_server_pool().shutdown()
         self.logger.info("Zatrzymano przetwarzanie kolejki")
 
+    def _take_next(
+        self, accept: Optional[Callable[[RenderTask], bool]]
+    ) -> Optional[RenderTask]:
+        """Wyjmuje z kolejki pierwsze zadanie, które można teraz uruchomić
+
+        Zadania spoza PENDING są wyjmowane zawsze - claim_next_task je pomija.
+        """
+        with self.task_queue.mutex:
+            for task in self.task_queue.queue:
+                if task.status != TaskStatus.PENDING or accept is None or accept(task):
+                    self.task_queue.queue.remove(task)
+                    return task
+        return None
+
+    def claim_next_task(
+        self, accept: Optional[Callable[[RenderTask], bool]] = None
+    ) -> Optional[RenderTask]:
+        """Pobiera z kolejki następne zadanie PENDING i oznacza je jako RUNNING
+
+        Przejęcie odbywa się pod blokadą - anulowanie z GUI/API nie może
+        nastąpić między sprawdzeniem statusu a startem renderingu. accept
+        pozwala pominąć zadania, dla których brak teraz wolnego slotu.
+        """
+        while True:
+            task = self._take_next(accept)
+            if task is None:
+                return None
+
+            self.logger.info(f"Pobrano zadanie z kolejki: {task.name}")
+            self.logger.info(f"Pozostało zadań w kolejce: {self.task_queue.qsize()}")
+            if self._mark_running(task):
+                return task
+
+    def _mark_running(self, task: RenderTask) -> bool:
+        """Oznacza pobrane z kolejki zadanie jako RUNNING (False - pominięte)"""
+        with self._lock:
+            if task.status != TaskStatus.PENDING:
+                self.logger.info(
+                    f"Pominięto zadanie o statusie {task.status.value}: {task.name}"
+                )
+                return False
+            if self._leases and not self._claim_shared_task(task):
+                return False
+            task.status = TaskStatus.RUNNING
+            task.started_at = datetime.now()
+            task.phase_timings = {}
+            get_render_stats().record_phase(
+                task,
+                "queue_wait",
+                (task.started_at - task.created_at).total_seconds(),
+            )
+            get_tracer().instant("dispatch", track="queue", task_id=task.id)
+            if self._leases:
+                # Inne węzły muszą od razu widzieć, że zadanie jest w toku
+                self.save_task(task)
+            return True
+
+    def _claim_batch(
+        self, lead: RenderTask, accept: Callable[[RenderTask], bool]
+    ) -> List[RenderTask]:
+        """Pobiera z kolejki zadania, które wyrenderują się razem z liderem"""
+        enabled, max_tasks = self.config.get_batch_settings()
+        key = batch_key(lead) if enabled else None
+        if key is None:
+            return []
+        with self.task_queue.mutex:
+            candidates = [
+                task
+                for task in self.task_queue.queue
+                if task.status == TaskStatus.PENDING
+                and batch_key(task) == key
+                and accept(task)
+            ]
+            members = select_batch(lead, candidates, max_tasks - 1)
+            for task in members:
+                self.task_queue.queue.remove(task)
+        return [task for task in members if self._mark_running(task)]
+
     def _process_queue(self):
         """Główna pętla przetwarzania kolejki"""
         self.logger.info("Uruchomiono wątek przetwarzania kolejki")
         self.logger.info(f"Liczba zadań w kolejce: {self.task_queue.qsize()}")
         self.logger.info(f"Liczba wszystkich zadań: {len(self.tasks)}")
 
+        last_evaluation = 0.0
         while self.is_processing:
             try:
-                if not self.task_queue.empty():
-                    task = self.task_queue.get(timeout=1)
-                    self.logger.info(f"Pobrano zadanie z kolejki: {task.name}")
-                    self.logger.info(f"Status zadania: {task.status}")
-                    self.logger.info(
-                        f"Pozostało zadań w kolejce: {self.task_queue.qsize()}"
+                now = time.monotonic()
+                if now - last_evaluation >= self.CONCURRENCY_INTERVAL:
+                    last_evaluation = now
+                    self.settle_dependents()
+                    self.suspender.update(self._running_list(), self.is_paused)
+                    self.volumes.update(self._running_list(with_batches=True))
+                    # Wstrzymane rendery nie zajmują slotu w pomiarze przepustowości
+                    self.concurrency.evaluate(
+                        self._running_by_version(active_only=True),
+                        self._pending_by_version(),
                     )
-
-                    if task.status == TaskStatus.CANCELLED:
-                        self.logger.info(f"Pominięto anulowane zadanie: {task.name}")
-                        continue
-
-                    self._process_task(task)
-                else:
+                if self.is_paused or self.suspender.has_suspended():
+                    # Nowy render odebrałby zasoby wstrzymanym
+                    time.sleep(0.1)
+                    continue
+                running = self._running_by_version()
+                with self._lock:
+                    by_id = task_index(self.tasks)
+                # Pierwsze gotowe zadanie w kolejności kolejki - niezależne
+                # gałęzie nie czekają za zadaniami oczekującymi na zależności
+                task = self.claim_next_task(
+                    lambda task: is_ready(task, by_id)
+                    and self.concurrency.can_start(task, running)
+                    and self.volumes.can_start(task)
+                )
+                if task is None:
                     time.sleep(0.1)
+                    continue
+                batch = self._claim_batch(
+                    task,
+                    lambda task: is_ready(task, by_id) and self.volumes.can_start(task),
+                )
+                self._start_slot(task, batch)
             except Exception as e:
                 self.logger.error(f"Błąd w pętli przetwarzania: {str(e)}")
                 time.sleep(1)  # Dodajemy opóźnienie przy błędzie
 
-    def _process_task(self, task: RenderTask):
-        """Przetwarza pojedyncze zadanie"""
-        try:
-            self.current_task = task
-            task.status = TaskStatus.RUNNING
-            task.started_at = datetime.now()
+    def _running_list(self, with_batches: bool = False) -> List[RenderTask]:
+        """Zwraca zadania slotów (z with_batches - także dołączone do nich)"""
+        with self._lock:
+            running = list(self.running_tasks.values())
+            if with_batches:
+                for batch in self._batches.values():
+                    running.extend(batch)
+            return running
+
+    def _running_by_version(self, active_only: bool = False) -> Dict[str, int]:
+        with self._lock:
+            running: Dict[str, int] = {}
+            for task in self.running_tasks.values():
+                if active_only and task.suspended:
+                    continue
+                version = task.cinema4d_version
+                running[version] = running.get(version, 0) + 1
+            return running
+
+    def _pending_by_version(self) -> Dict[str, int]:
+        pending: Dict[str, int] = {}
+        with self.task_queue.mutex:
+            for task in self.task_queue.queue:
+                if task.status == TaskStatus.PENDING:
+                    version = task.cinema4d_version
+                    pending[version] = pending.get(version, 0) + 1
+        return pending
+
+    def _start_slot(self, task: RenderTask, batch: Sequence[RenderTask] = ()):
+        """Uruchamia zadanie (i dołączone do niego) w pierwszym wolnym slocie"""
+        for item in (task, *batch):
+            self.volumes.start(item)
+        with self._lock:
+            slot = 1
+            while slot in self.running_tasks:
+                slot += 1
+            self.running_tasks[slot] = task
+            self._batches[slot] = list(batch)
+            thread = threading.Thread(
+                target=self._run_slot,
+                args=(task, slot, list(batch)),
+                name=f"render-slot-{slot}",
+                daemon=True,
+            )
+            self._slot_threads[slot] = thread
+        thread.start()
 
+    def _run_slot(self, task: RenderTask, slot: int, batch: List[RenderTask]):
+        tracer = get_tracer()
+        # Zadania dołączone do renderu lidera
+        extra = {"batch": [item.id for item in batch]} if batch else {}
+        try:
+            with tracer.on_track(f"worker-{slot}"), tracer.span(
+                TASK_SPAN, task_id=task.id, task=task.name, **extra
+            ) as span:
+                self._process_task(task, slot, batch)
+                span["status"] = task.status.value
+        except Exception as e:
+            self.logger.error(f"Błąd w slocie {slot}: {str(e)}")
+        finally:
+            self.concurrency.task_finished(task)
+            for item in (task, *batch):
+                self.volumes.task_finished(item)
+            with self._lock:
+                self.running_tasks.pop(slot, None)
+                self._batches.pop(slot, None)
+                self._slot_threads.pop(slot, None)
+
+    def _process_task(
+        self, task: RenderTask, slot: int = 1, batch: Sequence[RenderTask] = ()
+    ):
+        """Przetwarza zadanie (i zadania dołączone do jego renderu)"""
+        tasks = [task, *batch]
+        stats = get_render_stats()
+        stats.worker_started(slot)
+        try:
             if self.on_task_started:
-                self.on_task_started(task)
+                for item in tasks:
+                    self.on_task_started(item)
 
             self.logger.info(f"Rozpoczynam przetwarzanie zadania: {task.name}")
             self.logger.info(f"Plik C4D: {task.c4d_file_path}")
             self.logger.info(f"Folder wyjściowy: {task.output_folder}")
             self.logger.info(f"Wersja C4D: {task.cinema4d_version}")
+            if batch:
+                self.logger.info(
+                    f"Zadania dołączone do renderu: "
+                    f"{', '.join(item.name for item in batch)}"
+                )
 
-            # Walidacja projektu
+            # Walidacja projektu (wspólnego dla całej paczki)
             self.logger.info("Walidacja projektu...")
-            issues = self.c4d_controller.validate_project(task)
+            with stats.phase(task, "validation"):
+                issues = self.c4d_controller.validate_project(task)
             if issues:
                 self.logger.error(f"Błędy walidacji: {issues}")
-                task.status = TaskStatus.FAILED
-                task.error_message = "; ".join(issues)
-                task.completed_at = datetime.now()
-
-                if self.on_task_failed:
-                    self.on_task_failed(task)
+                for item in tasks:
+                    item.error_message = "; ".join(issues)
+                    self._finish_processed(item, False)
                 return
 
             # Renderowanie
             self.logger.info("Rozpoczynam renderowanie...")
-            success = self.c4d_controller.render_task(task)
-
-            task.completed_at = datetime.now()
-
-            if success:
-                self.logger.info(f"Zadanie zakończone sukcesem: {task.name}")
-                task.status = TaskStatus.COMPLETED
-                if self.on_task_completed:
-                    self.on_task_completed(task)
-            else:
-                self.logger.error(f"Zadanie zakończone błędem: {task.name}")
-                task.status = TaskStatus.FAILED
-                if self.on_task_failed:
-                    self.on_task_failed(task)
+            results = self.c4d_controller.render_batch(tasks)
+            for item, success in zip(tasks, results):
+                self._finish_processed(item, success)
 
         except Exception as e:
             self.logger.error(f"Błąd podczas przetwarzania zadania: {str(e)}")
+            for item in tasks:
+                if item.status == TaskStatus.RUNNING:
+                    item.error_message = str(e)
+                    self._finish_processed(item, False)
+        finally:
+            stats.worker_finished(slot)
+            for item in tasks:
+                item.suspended = False
+                if self._lease_was_lost(item):
+                    continue
+                stats.task_finished(item, item.status == TaskStatus.COMPLETED)
+                # Utrwal wynik zadania (status, czasy, zużycie zasobów)
+                self.save_task(item)
+                self._release_task(item)
+
+    def _finish_processed(self, task: RenderTask, success: bool):
+        """Ustawia wynik zadania wykonanego przez slot i wywołuje callback"""
+        task.completed_at = datetime.now()
+        if success:
+            self.logger.info(f"Zadanie zakończone sukcesem: {task.name}")
+            task.status = TaskStatus.COMPLETED
+            if self.on_task_completed:
+                self.on_task_completed(task)
+        else:
+            self.logger.error(f"Zadanie zakończone błędem: {task.name}")
             task.status = TaskStatus.FAILED
-            task.error_message = str(e)
-            task.completed_at = datetime.now()
             if self.on_task_failed:
                 self.on_task_failed(task)
-        finally:
-            self.current_task = None
+
+    def complete_task(
+        self, task: RenderTask, success: bool, error_message: Optional[str] = None
+    ):
+        """Kończy zadanie wykonane poza lokalnym workerem (np. na węźle farmy)"""
+        task.completed_at = datetime.now()
+        if success:
+            self.logger.info(f"Zadanie zakończone sukcesem: {task.name}")
+            task.status = TaskStatus.COMPLETED
+            callback = self.on_task_completed
+        else:
+            self.logger.error(f"Zadanie zakończone błędem: {task.name}")
+            task.status = TaskStatus.FAILED
+            task.error_message = error_message
+            callback = self.on_task_failed
+        if self._lease_was_lost(task):
+            return
+        get_render_stats().task_finished(task, success)
+        self.save_task(task)
+        self._release_task(task)
+        if callback:
+            callback(task)
 
     def get_tasks(self) -> List[RenderTask]:
-        """Zwraca listę wszystkich zadań"""
-        return self.tasks
+        """Zwraca kopię listy wszystkich zadań (pobraną pod blokadą kolejki)"""
+        self._ensure_tasks_loaded()
+        with self._lock:
+            return list(self.tasks)
 
     def get_worker_status(self) -> List[dict]:
-        """Zwraca status workerów"""
-        # Na razie zwracamy tylko jeden worker (główny wątek)
-        worker_status = {
-            "worker_id": 1,
-            "is_busy": self.current_task is not None,
-            "current_task": self.current_task,
-        }
-        return [worker_status]
+        """Zwraca status workerów (jeden na slot renderowania)"""
+        with self._lock:
+            running = dict(self.running_tasks)
+        slots = max(self.concurrency.slot_count(), max(running, default=0))
+        return [
+            {
+                "worker_id": slot,
+                "is_busy": slot in running,
+                "current_task": running.get(slot),
+            }
+            for slot in range(1, slots + 1)
+        ]
 
     def get_task_file_path(self, task: RenderTask) -> str:
         """Zwraca ścieżkę do pliku zadania"""
@@ -249,17 +910,23 @@ class QueueManager:
         try:
             # Zapisz każde zadanie do osobnego pliku
             for task in self.tasks:
-                task_file = self.get_task_file_path(task)
-                with open(task_file, "w", encoding="utf-8") as f:
-                    json.dump(
-                        self._task_to_dict(task),
-                        f,
-                        ensure_ascii=False,
-                        indent=2,
-                    )
+                self._write_task_file(task)
         except Exception as e:
             self.logger.error(f"Błąd zapisu zadań: {e}")
 
+    def save_task(self, task: RenderTask):
+        """Zapisuje pojedyncze zadanie do jego pliku JSON"""
+        try:
+            self._write_task_file(task)
+        except Exception as e:
+            self.logger.error(f"Błąd zapisu zadania {task.name}: {e}")
+
+    def _write_task_file(self, task: RenderTask):
+        task_file = self.get_task_file_path(task)
+        with self._lock:
+            # Słownik budowany przed zapisem - błąd nie zostawi pustego pliku
+            atomic_write_json(task_file, self._task_to_dict(task))
+
     def _task_to_dict(self, task: RenderTask) -> dict:
         """Konwertuje zadanie do słownika"""
         d = task.__dict__.copy()
@@ -271,74 +938,10 @@ class QueueManager:
         if task.completed_at:
             d["completed_at"] = task.completed_at.isoformat()
 
-        # Debugowanie - wyświetl ustawienia
-        print("Render settings w _task_to_dict:", task.render_settings)
-
-        # Odśwież ścieżki przed użyciem
-        self.c4d_paths = self._load_c4d_paths()
-
-        # Pobierz ścieżkę do Cinema 4D
-        c4d_path = self.c4d_paths.get(task.cinema4d_version)
-        if not c4d_path:
-            raise ValueError(
-                f"Nie znaleziono ścieżki do Cinema 4D {task.cinema4d_version}"
-            )
-
-        # Zamień Cinema 4D.exe na Commandline.exe
-        c4d_path = c4d_path.replace("Cinema 4D.exe", "Commandline.exe")
-
-        # Zamień ukośniki w prawo na ukośniki w lewo w ścieżce do pliku C4D
-        c4d_file_path = task.c4d_file_path.replace("/", "\\")
-
-        # Buduj komendę
-        cmd = [c4d_path, "-render", c4d_file_path, "-verbose", "-console"]
-
-        # Debugowanie - wyświetl początkową komendę
-        print("Początkowa komenda:", cmd)
-
-        # Dodaj parametry z render_settings TYLKO jeśli zostały wybrane w UI
-        if task.render_settings.get("threads") and task.render_settings["threads"] > 0:
-            cmd.extend(["-threads", str(task.render_settings["threads"])])
-        if task.render_settings.get("shutdown") and task.render_settings["shutdown"]:
-            cmd.append("-shutdown")
-        if task.render_settings.get("quit") and task.render_settings["quit"]:
-            cmd.append("-quit")
-        if task.render_settings.get("use_gpu") and task.render_settings["use_gpu"]:
-            cmd.append("-gpu")
-        if task.render_settings.get("no_gui") and task.render_settings["no_gui"]:
-            cmd.append("cmd-nogui")
-        if (
-            task.render_settings.get("batch_mode")
-            and task.render_settings["batch_mode"]
-        ):
-            cmd.append("-batch")
-        if (
-            task.render_settings.get("debug_mode")
-            and task.render_settings["debug_mode"]
-        ):
-            cmd.append("cmd-debug")
-        if (
-            task.render_settings.get("show_console")
-            and task.render_settings["show_console"]
-        ):
-            cmd.append("-console")
-        if task.render_settings.get("log_file") and task.render_settings["log_file"]:
-            cmd.append(f'-log "{task.render_settings["log_file"]}"')
-        if task.render_settings.get("verbose") and task.render_settings["verbose"]:
-            cmd.append("-verbose")
-        if (
-            task.render_settings.get("memory_limit")
-            and task.render_settings["memory_limit"] > 0
-        ):
-            cmd.append(f"cmd-memory {task.render_settings['memory_limit']}")
-        if task.render_settings.get("priority") and task.render_settings["priority"]:
-            cmd.append(f"-priority {task.render_settings['priority']}")
-
-        # Debugowanie - wyświetl końcową komendę
-        print("Końcowa komenda:", cmd)
-
-        # Zapisz komendę w formacie JSON
-        d["command"] = " ".join(cmd)
+        # Komenda zapisywana informacyjnie - bez wersji C4D na tym węźle jej brak
+        c4d_path = self._load_c4d_paths().get(task.cinema4d_version)
+        if c4d_path:
+            d["command"] = compile_task(task, c4d_path).display()
         return d
 
     def _dict_to_task(self, d: dict) -> RenderTask:
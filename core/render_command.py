@@ -0,0 +1,348 @@
+"""
+Kompilator komendy renderowania Cinema 4D Commandline.
+
+Jedno miejsce zamiany RenderTask na argv - używane przez kontroler
+(uruchomienie), QueueManager (pole "command" w pliku zadania) i TaskDialog
+(podgląd). Skompilowane komendy są buforowane według ustawień zadania.
+
+Commandline przyjmuje jeden zakres klatek na uruchomienie (-frame start end
+[krok]), dlatego zbiór klatek "1,5,10-20" kompilowany jest do kilku wywołań;
+pojedyncze klatki w równych odstępach ("1,51,101") łączą się w jedno z krokiem.
+
+Kolejność progresywna (render_settings "frame_order": "progressive") najpierw
+renderuje co preview_strides[0]-tą klatkę (np. co 50.), potem gęstsze
+przejścia (co 10.), a na końcu resztę - całą sekwencję można obejrzeć
+wcześnie. Każde przejście to kilka wywołań z krokiem (klasy reszt), bez
+powtarzania klatek: dla [50, 10] i ciągłego zakresu 1 + 4 + 9 wywołań.
+Wywołania są tanie tylko na serwerze renderowania - gdy zadanie nie może
+z niego korzystać (server_renders), renderuje się w zwykłej kolejności.
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+from core.config import get_config
+from core.render_server import server_supports
+from models.task import RenderTask
+
+FrameRanges = Tuple[Tuple[int, int], ...]
+# Wywołania Commandline: (pierwsza, ostatnia klatka, krok)
+FrameRuns = Tuple[Tuple[int, int, int], ...]
+FRAME_ORDERS = ("sequential", "progressive")
+
+# Parametry z render_settings: (klucz, flaga, czy flaga przyjmuje wartość)
+SETTING_FLAGS = (
+    ("threads", "-threads", True),
+    ("use_gpu", "-gpu", False),
+    ("no_gui", "cmd-nogui", False),
+    ("batch_mode", "-batch", False),
+    ("shutdown", "-shutdown", False),
+    ("quit", "-quit", False),
+    ("debug_mode", "cmd-debug", False),
+    ("log_file", "-log", True),
+    ("memory_limit", "cmd-memory", True),
+    ("priority", "-priority", True),
+)
+
+# Zawsze dodawane - wyjście C4D jest czytane na żywo przez kontroler
+# (obejmują też opcje "verbose" i "show_console" z dialogu)
+REQUIRED_FLAGS = ("-verbose", "-console")
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+    """Niezmienny, haszowalny opis komendy - klucz bufora kompilatora"""
+
+    c4d_exe: str
+    c4d_file_path: str
+    frame_ranges: Optional[FrameRanges] = None
+    # Odstępy przejść kolejności progresywnej (puste - kolejność rosnąca)
+    frame_strides: Tuple[int, ...] = ()
+    image_output: Optional[str] = None
+    multipass_output: Optional[str] = None
+    settings: Tuple[Tuple[str, object], ...] = ()
+
+
+@dataclass(frozen=True)
+class RenderCommand:
+    """Skompilowana komenda - jedno argv na każdy ciągły zakres klatek"""
+
+    invocations: Tuple[Tuple[str, ...], ...]
+
+    def display(self) -> str:
+        """Zwraca komendę w postaci do wyświetlenia lub zapisania w pliku"""
+        return "\n".join(subprocess.list2cmdline(argv) for argv in self.invocations)
+
+
+@lru_cache(maxsize=256)
+def parse_frame_set(text: str) -> FrameRanges:
+    """Parsuje zbiór klatek, np. "10", "1-100", "1,5,10" lub "1-10,20-30"
+
+    Zwraca posortowane, scalone zakresy (start, end). Rzuca ValueError
+    dla niepoprawnego zapisu.
+    """
+    frames = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, separator, end = part.partition("-")
+        if separator and not start:
+            # Ujemna klatka początkowa, np. "-5-10"
+            start, separator, end = part[1:].partition("-")
+            start = "-" + start
+        first = int(start)
+        last = int(end) if separator else first
+        if last < first:
+            raise ValueError(f"Niepoprawny zakres klatek: {part}")
+        frames.append((first, last))
+    if not frames:
+        raise ValueError(f"Pusty zakres klatek: {text!r}")
+
+    merged: List[List[int]] = []
+    for first, last in sorted(frames):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return tuple((first, last) for first, last in merged)
+
+
+def format_frame_set(ranges: FrameRanges) -> str:
+    """Zamienia zakresy klatek z powrotem na zapis "1-10,15" """
+    return ",".join(
+        str(first) if first == last else f"{first}-{last}" for first, last in ranges
+    )
+
+
+def frame_set_fields(text: Any) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """Zwraca (frame_set, start_frame, end_frame) dla zapisu klatek z UI/CLI/API"""
+    if text is None or not str(text).strip():
+        return None, None, None
+    ranges = parse_frame_set(str(text).strip())
+    return format_frame_set(ranges), ranges[0][0], ranges[-1][1]
+
+
+def task_frame_ranges(task: RenderTask) -> Optional[FrameRanges]:
+    """Zwraca zakresy klatek do wyrenderowania (None - zakres z pliku C4D)
+
+    Zbiór klatek zadania jest zawężany do start_frame/end_frame (fragment
+    na farmie).
+    """
+    if task.frame_set:
+        ranges = parse_frame_set(task.frame_set)
+    elif task.start_frame is not None:
+        end = task.end_frame if task.end_frame is not None else task.start_frame
+        ranges = ((task.start_frame, end),)
+    else:
+        return None
+
+    low = task.start_frame
+    high = task.end_frame
+    clipped = []
+    for first, last in ranges:
+        if low is not None:
+            first = max(first, low)
+        if high is not None:
+            last = min(last, high)
+        if first <= last:
+            clipped.append((first, last))
+    return tuple(clipped)
+
+
+def task_frames(task: RenderTask) -> Optional[List[int]]:
+    """Zwraca listę klatek zadania (None - zakres z pliku C4D)"""
+    ranges = task_frame_ranges(task)
+    if ranges is None:
+        return None
+    return [frame for first, last in ranges for frame in range(first, last + 1)]
+
+
+def preview_strides(values: Any) -> Tuple[int, ...]:
+    """Zwraca malejące odstępy przejść, z których każdy dzieli poprzedni"""
+    strides: List[int] = []
+    for value in values or ():
+        stride = int(value)
+        if stride > 1 and (
+            not strides or (stride < strides[-1] and strides[-1] % stride == 0)
+        ):
+            strides.append(stride)
+    return tuple(strides)
+
+
+def server_renders(task: RenderTask) -> bool:
+    """Sprawdza, czy wywołania zadania trafią do serwera renderowania"""
+    settings = task.render_settings
+    args = [flag for key, flag, _ in SETTING_FLAGS if settings.get(key)]
+    if task.output_folder:
+        args.append("-oimage")
+    if settings.get("multipass_output"):
+        args.append("-omultipass")
+    if task_frame_ranges(task) is not None:
+        args.append("-frame")
+    # Limit pamięci dotyczy jednego zadania, nie współdzielonego serwera
+    return (
+        get_config().get_render_server_settings()[0]
+        and server_supports(args)
+        and not settings.get("memory_limit")
+    )
+
+
+def task_frame_strides(task: RenderTask) -> Tuple[int, ...]:
+    """Zwraca odstępy przejść zadania (puste - renderowanie w kolejności)"""
+    if task.render_settings.get("frame_order") != "progressive":
+        return ()
+    if not server_renders(task):
+        # Każde wywołanie to osobny start C4D - przejścia kosztowałyby więcej
+        # niż wczesny podgląd
+        return ()
+    return preview_strides(get_config().get_preview_strides())
+
+
+def _split_runs(frames: List[int], step: int) -> List[Tuple[int, int, int]]:
+    """Dzieli rosnące klatki na ciągi o stałym kroku"""
+    runs: List[Tuple[int, int, int]] = []
+    for frame in frames:
+        if runs and frame - runs[-1][1] == step:
+            runs[-1] = (runs[-1][0], frame, step)
+        else:
+            runs.append((frame, frame, step))
+    return runs
+
+
+def frame_runs(ranges: FrameRanges, strides: Tuple[int, ...] = ()) -> FrameRuns:
+    """Zamienia zakresy klatek na wywołania (pierwsza, ostatnia, krok)"""
+    if not strides:
+        runs: List[Tuple[int, int, int]] = []
+        singles: List[int] = []
+        for first, last in ranges:
+            if first == last:
+                singles.append(first)
+            else:
+                runs.extend(_equal_gaps(singles))
+                singles = []
+                runs.append((first, last, 1))
+        runs.extend(_equal_gaps(singles))
+        return tuple(runs)
+
+    frames = [frame for first, last in ranges for frame in range(first, last + 1)]
+    if not frames:
+        return ()
+    present = set(frames)
+    base, end = frames[0], frames[-1]
+    runs = []
+    previous = None
+    for stride in strides + (1,):
+        # Pierwsze przejście: co stride-ta klatka; kolejne: klasy reszt
+        # z poprzednim odstępem jako krokiem - bez klatek wcześniejszych przejść
+        offsets = [0] if previous is None else range(stride, previous, stride)
+        step = stride if previous is None else previous
+        for offset in offsets:
+            selected = [
+                frame
+                for frame in range(base + offset, end + 1, step)
+                if frame in present
+            ]
+            runs.extend(_split_runs(selected, step))
+        previous = stride
+    return tuple(runs)
+
+
+def _equal_gaps(frames: List[int]) -> List[Tuple[int, int, int]]:
+    """Łączy pojedyncze klatki w równych odstępach w wywołania z krokiem"""
+    runs: List[Tuple[int, int, int]] = []
+    for frame in frames:
+        if runs and runs[-1][0] == runs[-1][1]:
+            runs[-1] = (runs[-1][0], frame, frame - runs[-1][0])
+        elif runs and frame - runs[-1][1] == runs[-1][2]:
+            runs[-1] = (runs[-1][0], frame, runs[-1][2])
+        else:
+            runs.append((frame, frame, 1))
+    return runs
+
+
+def task_frame_order(task: RenderTask) -> Optional[List[int]]:
+    """Zwraca klatki zadania w kolejności renderowania (None - zakres z pliku)"""
+    ranges = task_frame_ranges(task)
+    if ranges is None:
+        return None
+    return [
+        frame
+        for first, last, step in frame_runs(ranges, task_frame_strides(task))
+        for frame in range(first, last + 1, step)
+    ]
+
+
+def commandline_executable(c4d_exe: str) -> str:
+    """Zamienia ścieżkę do GUI Cinema 4D na Commandline"""
+    return c4d_exe.replace("Cinema 4D.exe", "Commandline.exe")
+
+
+def _output_base(folder: str, c4d_file_path: str) -> str:
+    """Ścieżka bazowa plików wyjściowych - C4D dopisuje do niej numer klatki"""
+    scene = os.path.splitext(os.path.basename(c4d_file_path))[0] or "render"
+    return os.path.normpath(os.path.join(folder, scene))
+
+
+def spec_for_task(task: RenderTask, c4d_exe: str) -> CommandSpec:
+    """Buduje klucz kompilacji na podstawie zadania"""
+    settings = tuple(
+        (key, task.render_settings[key])
+        for key, _, _ in SETTING_FLAGS
+        if task.render_settings.get(key)
+    )
+    multipass = task.render_settings.get("multipass_output")
+    return CommandSpec(
+        c4d_exe=commandline_executable(c4d_exe),
+        c4d_file_path=os.path.normpath(task.c4d_file_path),
+        frame_ranges=task_frame_ranges(task),
+        frame_strides=task_frame_strides(task),
+        image_output=(
+            _output_base(task.output_folder, task.c4d_file_path)
+            if task.output_folder
+            else None
+        ),
+        multipass_output=(
+            _output_base(multipass, task.c4d_file_path) if multipass else None
+        ),
+        settings=settings,
+    )
+
+
+@lru_cache(maxsize=1024)
+def compile_spec(spec: CommandSpec) -> RenderCommand:
+    """Kompiluje opis komendy do argv (wynik buforowany)"""
+    options: List[str] = []
+    if spec.image_output:
+        options.extend(["-oimage", spec.image_output])
+    if spec.multipass_output:
+        options.extend(["-omultipass", spec.multipass_output])
+
+    settings = dict(spec.settings)
+    for key, flag, takes_value in SETTING_FLAGS:
+        value = settings.get(key)
+        if not value or (isinstance(value, int) and value < 0):
+            continue
+        options.append(flag)
+        if takes_value:
+            options.append(str(value))
+    options.extend(REQUIRED_FLAGS)
+
+    base = (spec.c4d_exe, "-render", spec.c4d_file_path)
+    if spec.frame_ranges is None:
+        return RenderCommand(invocations=(base + tuple(options),))
+
+    invocations = []
+    for first, last, step in frame_runs(spec.frame_ranges, spec.frame_strides):
+        frame_args = ("-frame", str(first), str(last))
+        if step > 1 and last > first:
+            frame_args += (str(step),)
+        invocations.append(base + frame_args + tuple(options))
+    return RenderCommand(invocations=tuple(invocations))
+
+
+def compile_task(task: RenderTask, c4d_exe: str) -> RenderCommand:
+    """Zwraca skompilowaną komendę renderowania zadania"""
+    return compile_spec(spec_for_task(task, c4d_exe))
@@ -0,0 +1,148 @@
+"""
+Manifest wyników renderowania - renderowanie przyrostowe.
+
+Odcisk zadania obejmuje skrót projektu, skróty jego zależności, skompilowaną
+komendę (ustawienia, wersja C4D) i zbiór klatek. Po udanym renderze odcisk
+i lista plików wynikowych (rozmiar, mtime) trafiają do manifestu w folderze
+wyjściowym. Zadanie o tym samym odcisku, którego pliki są nadal na miejscu,
+kończy się od razu bez uruchamiania C4D.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from core.dependency_scanner import get_dependency_scanner
+from core.render_command import compile_task, task_frames
+from core.task_recovery import IMAGE_EXTENSIONS, output_frame_number
+from models.task import RenderTask
+from utils.atomic_file import atomic_write_json
+
+MANIFEST_FILE = ".render_manifest.json"
+# Manifest przechowuje odciski kilku zadań renderujących do tego samego folderu
+MAX_MANIFEST_ENTRIES = 100
+
+
+def task_fingerprint(task: RenderTask, c4d_exe: str) -> str:
+    """Zwraca odcisk wejść zadania (projekt, zależności, komenda, klatki)"""
+    scanner = get_dependency_scanner()
+    report = scanner.scan(task.c4d_file_path)
+    dependencies = {
+        reference: scanner.file_digest(path)
+        for reference, path in sorted(report.resolved.items())
+    }
+    dependencies.update({reference: None for reference in report.missing})
+    scanner.flush()
+
+    command = compile_task(task, c4d_exe)
+    payload = {
+        "project": report.digest,
+        "dependencies": dependencies,
+        "command": command.display(),
+        "version": task.cinema4d_version,
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _output_folders(task: RenderTask) -> List[str]:
+    folders = [task.output_folder]
+    multipass = task.render_settings.get("multipass_output")
+    if multipass:
+        folders.append(multipass)
+    return [folder for folder in folders if folder]
+
+
+def collect_outputs(task: RenderTask) -> Dict[str, List[int]]:
+    """Zwraca pliki wynikowe zadania: ścieżka -> [rozmiar, mtime_ns]"""
+    scene = os.path.splitext(os.path.basename(task.c4d_file_path))[0]
+    frames = task_frames(task)
+    wanted = set(frames) if frames is not None else None
+    outputs = {}
+    for folder in _output_folders(task):
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() not in IMAGE_EXTENSIONS or not entry.is_file():
+                continue
+            frame = output_frame_number(stem, scene)
+            if not stem.startswith(scene) or frame is None:
+                continue
+            if wanted is not None and frame not in wanted:
+                continue
+            stat = entry.stat()
+            outputs[entry.path] = [stat.st_size, stat.st_mtime_ns]
+    return outputs
+
+
+def _covers_frames(task: RenderTask, files: Dict[str, List[int]]) -> bool:
+    """Sprawdza, czy folder wyjściowy zawiera plik dla każdej klatki zadania"""
+    frames = task_frames(task)
+    if frames is None:
+        return bool(files)
+    scene = os.path.splitext(os.path.basename(task.c4d_file_path))[0]
+    image_folder = os.path.normpath(task.output_folder)
+    rendered = set()
+    for path in files:
+        if os.path.normpath(os.path.dirname(path)) == image_folder:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            rendered.add(output_frame_number(stem, scene))
+    return all(frame in rendered for frame in frames)
+
+
+def _manifest_path(task: RenderTask) -> str:
+    return os.path.join(task.output_folder, MANIFEST_FILE)
+
+
+def _load_manifest(task: RenderTask) -> Dict[str, Dict]:
+    try:
+        with open(_manifest_path(task), "r", encoding="utf-8") as f:
+            return json.load(f).get("entries", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def find_up_to_date(task: RenderTask, fingerprint: str) -> Optional[List[str]]:
+    """Zwraca pliki wynikowe, jeśli zadanie o tym odcisku jest już wyrenderowane
+
+    Pliki z manifestu muszą istnieć i mieć niezmieniony rozmiar oraz mtime.
+    """
+    if not task.output_folder:
+        return None
+    entry = _load_manifest(task).get(fingerprint)
+    if not entry or not entry.get("files"):
+        return None
+    for path, (size, mtime_ns) in entry["files"].items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return None
+    return sorted(entry["files"])
+
+
+def record_render(task: RenderTask, fingerprint: str) -> bool:
+    """Zapisuje odcisk i pliki udanego renderu w manifeście folderu wyjściowego"""
+    if not task.output_folder or not os.path.isdir(task.output_folder):
+        return False
+    files = collect_outputs(task)
+    if not _covers_frames(task, files):
+        return False
+    entries = _load_manifest(task)
+    entries[fingerprint] = {
+        "task_id": task.id,
+        "project": task.c4d_file_path,
+        "completed_at": time.time(),
+        "files": files,
+    }
+    if len(entries) > MAX_MANIFEST_ENTRIES:
+        newest = sorted(
+            entries.items(), key=lambda item: item[1].get("completed_at", 0)
+        )[-MAX_MANIFEST_ENTRIES:]
+        entries = dict(newest)
+    atomic_write_json(_manifest_path(task), {"entries": entries})
+    return True
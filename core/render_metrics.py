@@ -0,0 +1,327 @@
+"""
+Pomiary czasu faz renderowania i statystyki silnika.
+
+Fazy zadania (sekundy, zapisywane w task.phase_timings i w histogramie
+c4d_phase_seconds):
+    queue_wait   - od dodania zadania do pobrania z kolejki
+    validation   - walidacja projektu i jego zależności
+    staging      - lokalna kopia projektu
+    spawn        - uruchomienie procesu Commandline
+    scene_load   - od startu procesu do rozpoczęcia pierwszej klatki
+    render       - renderowanie klatek (czasy klatek w c4d_frame_seconds)
+    upload       - oczekiwanie na dostarczenie klatek po zakończeniu C4D
+    verification - odcisk wejść i zapis manifestu (renderowanie przyrostowe)
+
+first_frame (od pobrania zadania do ukończenia pierwszej klatki) nakłada się
+na pozostałe fazy i nie wchodzi do ich sumy.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.task import RenderTask
+from utils.metrics import get_metrics
+from utils.tracing import get_tracer
+
+PHASES = (
+    "queue_wait",
+    "validation",
+    "staging",
+    "spawn",
+    "scene_load",
+    "render",
+    "upload",
+    "verification",
+)
+FIRST_FRAME = "first_frame"
+# Okno statystyk bieżących (zadania/h, wykorzystanie workerów, linie logu/s)
+RATE_WINDOW = 3600.0
+LOG_RATE_WINDOW = 60.0
+
+FRAME_START = re.compile(r"Rendering frame (\d+)")
+
+
+def failure_class(task: RenderTask) -> str:
+    """Klasyfikuje przyczynę niepowodzenia zadania na podstawie komunikatu"""
+    message = (task.error_message or "").lower()
+    if "brakujący zas" in message or "brakujące zas" in message:
+        return "missing_asset"
+    if "timeout" in message:
+        return "timeout"
+    if "nie dostarczono" in message:
+        return "delivery"
+    if "błąd renderowania (kod" in message:
+        return "exit_code"
+    if message.startswith("zależność") or message.startswith("cykliczna zależność"):
+        return "dependency"
+    if "nie istnieje" in message or "nie znaleziono wersji" in message:
+        return "validation"
+    return "other"
+
+
+class RenderStats:
+    """Liczniki silnika i statystyki z przesuwnego okna czasu"""
+
+    def __init__(self):
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._finished = deque()  # czasy zakończenia zadań
+        self._log_buckets = deque()  # [sekunda, liczba linii logu]
+        # Przedziały pracy workerów (start, koniec) i trwające prace
+        self._busy = deque()
+        self._running: Dict[int, float] = {}
+        self._workers = set()
+        self._frame_listeners: List[Callable[[RenderTask, float], None]] = []
+        self._started = time.monotonic()
+
+        self.phase_seconds = self.metrics.histogram(
+            "c4d_phase_seconds", "Czas faz zadania renderowania"
+        )
+        self.frame_seconds = self.metrics.histogram(
+            "c4d_frame_seconds", "Czas renderowania pojedynczej klatki"
+        )
+        self.tasks_total = self.metrics.counter(
+            "c4d_tasks_total", "Zakończone zadania według statusu"
+        )
+        self.failures_total = self.metrics.counter(
+            "c4d_task_failures_total", "Nieudane zadania według przyczyny"
+        )
+        self.log_lines_total = self.metrics.counter(
+            "c4d_log_lines_total", "Linie wyjścia Commandline"
+        )
+        self.busy_seconds_total = self.metrics.counter(
+            "c4d_worker_busy_seconds_total", "Czas pracy workerów"
+        )
+        self.metrics.gauge(
+            "c4d_tasks_per_hour", "Zadania zakończone w ostatniej godzinie"
+        ).set_function(self.tasks_per_hour)
+        self.metrics.gauge(
+            "c4d_worker_utilization", "Wykorzystanie workerów w ostatniej godzinie"
+        ).set_function(self.worker_utilization)
+        self.metrics.gauge(
+            "c4d_log_lines_per_second", "Linie logu na sekundę (ostatnia minuta)"
+        ).set_function(self.log_lines_per_second)
+
+    def _trim(self, now: float):
+        """Usuwa wpisy spoza okien (także przy dopisywaniu - bez odczytów metryk)"""
+        while self._finished and now - self._finished[0] > RATE_WINDOW:
+            self._finished.popleft()
+        while self._log_buckets and now - self._log_buckets[0][0] > LOG_RATE_WINDOW:
+            self._log_buckets.popleft()
+        while self._busy and now - self._busy[0][1] > RATE_WINDOW:
+            self._busy.popleft()
+
+    def record_phase(
+        self,
+        task: RenderTask,
+        phase: str,
+        seconds: float,
+        start: Optional[float] = None,
+    ):
+        """Dodaje czas fazy do zadania i histogramu
+
+        start (czas epoki) podaje się, gdy faza nie kończy się w chwili wywołania.
+        """
+        seconds = max(0.0, seconds)
+        task.phase_timings[phase] = round(
+            task.phase_timings.get(phase, 0.0) + seconds, 3
+        )
+        self.phase_seconds.observe(seconds, phase=phase)
+        if phase != FIRST_FRAME:
+            # first_frame obejmuje inne fazy - na osi czasu byłby nieczytelny
+            get_tracer().complete(
+                phase,
+                time.time() - seconds if start is None else start,
+                seconds,
+                cat="phase",
+                track="queue" if phase == "queue_wait" else None,
+                task_id=task.id,
+            )
+
+    @contextmanager
+    def phase(self, task: RenderTask, phase: str):
+        """Mierzy czas bloku jako fazę zadania"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_phase(task, phase, time.monotonic() - started)
+
+    def add_frame_listener(self, callback: Callable[[RenderTask, float], None]):
+        """Rejestruje callback wywoływany po każdej wyrenderowanej klatce"""
+        self._frame_listeners.append(callback)
+
+    def record_frame(self, task: RenderTask, seconds: float):
+        self.frame_seconds.observe(max(0.0, seconds))
+        for callback in list(self._frame_listeners):
+            callback(task, seconds)
+
+    def log_line(self):
+        now = time.monotonic()
+        self.log_lines_total.inc()
+        second = int(now)
+        with self._lock:
+            if self._log_buckets and self._log_buckets[-1][0] == second:
+                self._log_buckets[-1][1] += 1
+            else:
+                self._log_buckets.append([second, 1])
+                self._trim(now)
+
+    def worker_started(self, worker_id: int):
+        with self._lock:
+            self._workers.add(worker_id)
+            self._running[worker_id] = time.monotonic()
+
+    def worker_finished(self, worker_id: int):
+        now = time.monotonic()
+        with self._lock:
+            started = self._running.pop(worker_id, None)
+            if started is None:
+                return
+            self._busy.append((started, now))
+            self._trim(now)
+        self.busy_seconds_total.inc(now - started)
+
+    def task_finished(self, task: RenderTask, success: bool):
+        """Zlicza zakończone zadanie (i przyczynę niepowodzenia)"""
+        self.tasks_total.inc(status="completed" if success else "failed")
+        if not success:
+            self.failures_total.inc(reason=failure_class(task))
+        now = time.monotonic()
+        with self._lock:
+            self._finished.append(now)
+            self._trim(now)
+
+    def tasks_per_hour(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            finished = len(self._finished)
+        elapsed = min(RATE_WINDOW, now - self._started)
+        # Na początku pracy ekstrapolacja z krótkiego okna zawyżałaby wynik
+        return finished * 3600.0 / max(elapsed, 60.0)
+
+    def log_lines_per_second(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            lines = sum(count for _, count in self._log_buckets)
+        return lines / max(1.0, min(LOG_RATE_WINDOW, now - self._started))
+
+    def worker_utilization(self) -> float:
+        """Udział czasu pracy workerów w oknie (0-1)"""
+        now = time.monotonic()
+        window_start = max(self._started, now - RATE_WINDOW)
+        with self._lock:
+            self._trim(now)
+            intervals = list(self._busy) + [(s, now) for s in self._running.values()]
+            workers = max(1, len(self._workers))
+        busy = sum(max(0.0, end - max(start, window_start)) for start, end in intervals)
+        elapsed = now - window_start
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, busy / (elapsed * workers))
+
+    def average_phases(self) -> Dict[str, float]:
+        """Zwraca średni czas każdej zmierzonej fazy"""
+        averages = {}
+        for phase in PHASES + (FIRST_FRAME,):
+            total, count = self.phase_seconds.stats(phase=phase)
+            if count:
+                averages[phase] = total / count
+        return averages
+
+    def summary(self) -> Dict[str, float]:
+        """Zwraca bieżące statystyki do wyświetlenia w GUI"""
+        total, count = self.frame_seconds.stats()
+        return {
+            "completed": self.tasks_total.value(status="completed"),
+            "failed": self.tasks_total.value(status="failed"),
+            "tasks_per_hour": self.tasks_per_hour(),
+            "utilization": self.worker_utilization(),
+            "log_lines_per_second": self.log_lines_per_second(),
+            "frames": count,
+            "avg_frame": total / count if count else 0.0,
+        }
+
+
+class FrameTimer:
+    """Wyznacza czas wczytywania sceny i klatek z wyjścia Commandline
+
+    Klatka trwa od jej komunikatu "Rendering frame N" do komunikatu kolejnej
+    klatki, a ostatnia - do zakończenia procesu. owner wskazuje zadanie, do
+    którego należy klatka (render wspólny kilku zadań); domyślnie task.
+    """
+
+    def __init__(
+        self,
+        stats: RenderStats,
+        task: RenderTask,
+        process_started: float,
+        owner: Optional[Callable[[int], RenderTask]] = None,
+    ):
+        self.stats = stats
+        self.task = task
+        self.process_started = process_started
+        self.owner = owner
+        self._frame_started: Optional[float] = None
+        self._frame: Optional[int] = None
+        self._render_started: Optional[float] = None
+        # ID zadania -> (zadanie, czas renderowania jego klatek)
+        self._render_seconds: Dict[str, Tuple[RenderTask, float]] = {}
+
+    def feed(self, line: str):
+        match = FRAME_START.search(line)
+        if not match:
+            return
+        now = time.monotonic()
+        if self._frame_started is None:
+            self._render_started = time.time()
+            self.stats.record_phase(self.task, "scene_load", now - self.process_started)
+        else:
+            self._close_frame(now)
+        self._frame_started = now
+        self._frame = int(match.group(1))
+
+    def _close_frame(self, now: float):
+        seconds = now - self._frame_started
+        task = self.owner(self._frame) if self.owner else self.task
+        self.stats.record_frame(task, seconds)
+        first = task.id not in self._render_seconds
+        rendered = self._render_seconds.get(task.id, (task, 0.0))[1]
+        self._render_seconds[task.id] = (task, rendered + seconds)
+        get_tracer().complete(
+            f"frame {self._frame}",
+            time.time() - (time.monotonic() - self._frame_started),
+            seconds,
+            cat="frame",
+            task_id=task.id,
+        )
+        if first and FIRST_FRAME not in task.phase_timings and task.started_at:
+            waited = time.time() - task.started_at.timestamp()
+            self.stats.record_phase(task, FIRST_FRAME, waited)
+
+    def finish(self):
+        """Zamyka ostatnią klatkę po zakończeniu procesu"""
+        if self._frame_started is not None:
+            self._close_frame(time.monotonic())
+            self._frame_started = None
+            for task, seconds in self._render_seconds.values():
+                self.stats.record_phase(task, "render", seconds, self._render_started)
+
+
+_render_stats: Optional[RenderStats] = None
+_render_stats_lock = threading.Lock()
+
+
+def get_render_stats() -> RenderStats:
+    """Zwraca wspólne statystyki renderowania"""
+    global _render_stats
+    with _render_stats_lock:
+        if _render_stats is None:
+            _render_stats = RenderStats()
+        return _render_stats
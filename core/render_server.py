@@ -0,0 +1,307 @@
+"""
+Tryb serwera renderowania - długo działający proces C4D na wersję.
+
+Zamiast osobnego uruchomienia Commandline na każde zadanie (start
+aplikacji, wtyczek i licencji trwa często dłużej niż krótki render), silnik
+uruchamia raz "Commandline -nogui -script c4d_scripts/render_server.py"
+i wysyła mu kolejne zlecenia przez lokalne gniazdo TCP (linie JSON, opis
+protokołu w skrypcie). Połączenie jest przyjmowane tylko z tokenem
+przekazanym procesowi w zmiennej środowiskowej.
+
+Serwer jest wymieniany na nowy po render_server_max_jobs zleceniach albo
+gdy pamięć jego drzewa procesów urośnie o render_server_max_growth_mb
+względem stanu po pierwszym zleceniu - wycieki wtyczek nie kumulują się
+bez końca. Każdy slot renderowania korzysta z własnego serwera; serwery są
+współdzielone tylko między kolejnymi zadaniami tej samej wersji C4D i o tym
+samym priorytecie procesu.
+
+Serwer renderuje jawny zakres klatek do folderu -oimage z ustawieniami
+renderowania dokumentu - zakres z pliku C4D, wyjście multipass, -threads
+i -gpu wymagają zwykłego procesu Commandline (server_supports).
+"""
+
+import contextlib
+import json
+import os
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+from core.config import get_config
+from core.process_launcher import get_process_launcher
+from utils.logger import setup_logger
+
+SERVER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "c4d_scripts",
+    "render_server.py",
+)
+# Czas na zakończenie serwera po poleceniu "quit", zanim zostanie zabity
+QUIT_TIMEOUT = 10.0
+# Po nieudanym starcie serwera zadania renderują się w osobnych procesach
+RETRY_AFTER = 300.0
+
+ServerKey = Tuple[str, str]  # (wersja C4D, priorytet procesu)
+
+# Argumenty Commandline, bez których (lub z którymi) serwer nie wyrenderuje
+# zadania tak jak osobny proces
+SERVER_REQUIRED_ARGS = ("-frame", "-oimage")
+SERVER_UNSUPPORTED_ARGS = ("-omultipass", "-threads", "-gpu")
+
+
+def server_supports(cmd: List[str]) -> bool:
+    """Sprawdza, czy wywołanie Commandline można wysłać do serwera"""
+    return all(arg in cmd for arg in SERVER_REQUIRED_ARGS) and not any(
+        arg in cmd for arg in SERVER_UNSUPPORTED_ARGS
+    )
+
+
+class RenderServerError(Exception):
+    """Serwer renderowania nie wystartował lub przerwał połączenie"""
+
+
+class RenderServer:
+    """Jeden proces C4D z uruchomionym skryptem serwera renderowania"""
+
+    def __init__(self, key: ServerKey, c4d_exe: str, script: str, timeout: float):
+        self.key = key
+        config = get_config()
+        log_to_file, log_file_path = config.get_logging_settings()
+        self.logger = setup_logger("render_server", log_to_file, log_file_path)
+        self.launcher = get_process_launcher()
+        self.jobs = 0
+        self.baseline_rss: Optional[int] = None
+
+        token = secrets.token_hex(16)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            env = dict(
+                os.environ,
+                C4D_RENDER_SERVER_PORT=str(listener.getsockname()[1]),
+                C4D_RENDER_SERVER_TOKEN=token,
+            )
+            cmd = [c4d_exe, "-nogui", "-script", script]
+            self.logger.info(f"Uruchamianie serwera renderowania: {cmd}")
+            self.process = self.launcher.launch(
+                cmd,
+                {"priority": key[1]},
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                env=env,
+            )
+            self.pid = self.process.pid
+            threading.Thread(
+                target=self._drain_output, name=f"render-server-{self.pid}", daemon=True
+            ).start()
+            self._connection = self._accept(listener, token, timeout)
+        except Exception:
+            if hasattr(self, "process"):
+                self._kill()
+            raise
+        finally:
+            listener.close()
+        self._reader = self._connection.makefile("r", encoding="utf-8")
+        self._writer = self._connection.makefile("w", encoding="utf-8")
+
+    def _accept(
+        self, listener: socket.socket, token: str, timeout: float
+    ) -> socket.socket:
+        """Czeka na połączenie skryptu i sprawdza jego token"""
+        deadline = time.monotonic() + timeout
+        listener.settimeout(1.0)
+        while True:
+            if self.process.poll() is not None:
+                raise RenderServerError(
+                    f"Serwer renderowania zakończył się przy starcie "
+                    f"(kod {self.process.returncode})"
+                )
+            if time.monotonic() > deadline:
+                raise RenderServerError(
+                    f"Serwer renderowania nie połączył się w {timeout:.0f} s"
+                )
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(max(1.0, deadline - time.monotonic()))
+            try:
+                with connection.makefile("r", encoding="utf-8") as reader:
+                    hello = json.loads(reader.readline() or "{}")
+            except (OSError, ValueError):
+                hello = {}
+            if hello.get("event") == "hello" and secrets.compare_digest(
+                str(hello.get("token", "")), token
+            ):
+                connection.settimeout(None)
+                return connection
+            self.logger.warning("Odrzucono połączenie bez poprawnego tokenu")
+            connection.close()
+
+    def _drain_output(self):
+        """Przepisuje wyjście procesu C4D (poza zleceniami) do logu"""
+        with contextlib.suppress(Exception):
+            for line in self.process.stdout:
+                line = line.strip()
+                if line:
+                    self.logger.info(f"[serwer {self.pid}] {line}")
+
+    def _send(self, message: dict):
+        self._writer.write(json.dumps(message) + "\n")
+        self._writer.flush()
+
+    def render(
+        self, job_id: str, argv: List[str], on_line: Callable[[str], None]
+    ) -> Tuple[bool, str]:
+        """Wykonuje jedno zlecenie; zwraca (sukces, komunikat błędu)"""
+        try:
+            self._send({"job": job_id, "argv": argv})
+            for line in self._reader:
+                message = json.loads(line)
+                event = message.get("event")
+                if event == "log":
+                    on_line(message.get("line", ""))
+                elif event == "done" and message.get("job") == job_id:
+                    self.jobs += 1
+                    return bool(message.get("ok")), message.get("message", "")
+        except (OSError, ValueError) as e:
+            raise RenderServerError(f"Błąd połączenia z serwerem renderowania: {e}")
+        raise RenderServerError(
+            f"Serwer renderowania zakończył pracę w trakcie zlecenia "
+            f"(kod {self.process.poll()})"
+        )
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def memory(self) -> int:
+        """Zwraca pamięć (RSS) procesu serwera i jego procesów potomnych"""
+        try:
+            proc = psutil.Process(self.pid)
+            procs = [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for proc in procs:
+            with contextlib.suppress(psutil.Error):
+                total += proc.memory_info().rss
+        return total
+
+    def stop(self):
+        """Kończy serwer poleceniem "quit", a gdy nie reaguje - zabija go"""
+        with contextlib.suppress(OSError, ValueError):
+            self._send({"command": "quit"})
+        for stream in (self._reader, self._writer, self._connection):
+            with contextlib.suppress(OSError):
+                stream.close()
+        try:
+            self.process.wait(timeout=QUIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.logger.warning(f"Serwer renderowania {self.pid} nie kończy się")
+            self._kill()
+            return
+        self.launcher.release(self.process)
+
+    def _kill(self):
+        with contextlib.suppress(Exception):
+            self.launcher.kill(self.process)
+            self.process.wait(timeout=QUIT_TIMEOUT)
+        self.launcher.release(self.process)
+
+
+class RenderServerPool:
+    """Przechowuje bezczynne serwery i wymienia zużyte"""
+
+    def __init__(self):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("render_server", log_to_file, log_file_path)
+        self._lock = threading.Lock()
+        self._idle: Dict[ServerKey, List[RenderServer]] = {}
+        self._failed: Dict[ServerKey, float] = {}  # klucz -> czas nieudanego startu
+
+    def acquire(self, version: str, c4d_exe: str, priority: str) -> RenderServer:
+        """Zwraca bezczynny serwer wersji albo uruchamia nowy"""
+        key = (version, priority or "normal")
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                server = idle.pop()
+                if server.alive():
+                    return server
+                self.logger.warning(f"Serwer renderowania {server.pid} nie działa")
+                server.stop()
+            failed = self._failed.get(key)
+        if failed is not None and time.monotonic() - failed < RETRY_AFTER:
+            raise RenderServerError("poprzedni start serwera się nie powiódł")
+        _, script, _, _, timeout = self.config.get_render_server_settings()
+        try:
+            server = RenderServer(key, c4d_exe, script or SERVER_SCRIPT, timeout)
+        except (OSError, RenderServerError) as e:
+            with self._lock:
+                self._failed[key] = time.monotonic()
+            if isinstance(e, OSError):
+                raise RenderServerError(f"Nie udało się uruchomić serwera: {e}")
+            raise
+        with self._lock:
+            self._failed.pop(key, None)
+        self.logger.info(f"Uruchomiono serwer renderowania C4D {version}: {server.pid}")
+        return server
+
+    def release(self, server: RenderServer):
+        """Oddaje serwer do ponownego użycia lub kończy go, jeśli jest zużyty"""
+        _, _, max_jobs, max_growth_mb, _ = self.config.get_render_server_settings()
+        reason = None
+        if not server.alive():
+            reason = "proces nie działa"
+        elif max_jobs and server.jobs >= max_jobs:
+            reason = f"{server.jobs} zleceń"
+        elif max_growth_mb:
+            rss = server.memory()
+            if server.baseline_rss is None:
+                server.baseline_rss = rss
+            elif rss - server.baseline_rss > max_growth_mb * 1024**2:
+                reason = (
+                    f"przyrost pamięci {(rss - server.baseline_rss) / 1024**2:.0f} MB"
+                )
+        if reason is None:
+            with self._lock:
+                self._idle.setdefault(server.key, []).append(server)
+            return
+        self.logger.info(f"Wymiana serwera renderowania {server.pid}: {reason}")
+        server.stop()
+
+    def discard(self, server: RenderServer):
+        """Kończy serwer, którego stan jest nieznany (np. po zerwaniu połączenia)"""
+        server.stop()
+
+    def shutdown(self):
+        """Kończy wszystkie bezczynne serwery"""
+        with self._lock:
+            servers = [server for idle in self._idle.values() for server in idle]
+            self._idle.clear()
+        for server in servers:
+            server.stop()
+        if servers:
+            self.logger.info(f"Zakończono serwery renderowania: {len(servers)}")
+
+
+_pool: Optional[RenderServerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_server_pool() -> RenderServerPool:
+    """Zwraca wspólną pulę serwerów renderowania"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderServerPool()
+        return _pool
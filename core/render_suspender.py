@@ -0,0 +1,222 @@
+"""
+Wstrzymywanie i wznawianie trwających renderów (psutil suspend/resume).
+
+Render jest wstrzymywany zamiast przerywany - po wznowieniu C4D kontynuuje
+bieżącą klatkę bez utraty postępu. Dwa powody wstrzymania:
+    - "pause"    - ręczne wstrzymanie kolejki (GUI, API),
+    - "pressure" - brak pamięci albo obciążenie CPU przez inne programy.
+Przy presji wstrzymywany jest jeden render na raz: najniższy priorytet,
+a przy równym - najpóźniej rozpoczęty. Kolejny render jest wstrzymywany
+tylko wtedy, gdy poprzednie wstrzymanie obniżyło presję - wstrzymany proces
+nie zwalnia pamięci, więc bez tego warunku presja zatrzymałaby wszystkie
+rendery poza jednym. Dopóki jakiś render jest wstrzymany, kolejka nie
+uruchamia nowych zadań.
+Wznawianie następuje dopiero poniżej niższych progów (histereza), w
+odwrotnej kolejności. Między kolejnymi zmianami z powodu presji mija
+SETTLE_SECONDS, aby pomiar zdążył odzwierciedlić poprzednią. Wstrzymany
+proces nie zwalnia pamięci, ale system może przenieść ją do pliku wymiany
+zamiast przerywać render z braku RAM.
+"""
+
+import contextlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from core.config import get_config
+from models.task import RenderTask
+from utils.logger import setup_logger
+from utils.process_accounting import find_process
+from utils.resource_monitor import ResourceMonitor
+from utils.tracing import get_tracer
+
+# Kolejność wstrzymywania przy presji - najpierw najmniej ważne
+PRIORITY_ORDER = {"low": 0, "normal": 1, "high": 2}
+# Okno uśredniania zasobów (s) - krótsze niż przy decyzjach o starcie
+PRESSURE_WINDOW = 5.0
+SETTLE_SECONDS = 30.0
+
+
+def _process_tree(task: RenderTask) -> List[psutil.Process]:
+    """Zwraca proces C4D zadania i jego procesy potomne"""
+    proc = find_process(task.render_process or {})
+    if proc is None:
+        return []
+    with contextlib.suppress(psutil.Error):
+        return [proc] + proc.children(recursive=True)
+    return [proc]
+
+
+def suspend_tree(task: RenderTask) -> bool:
+    """Wstrzymuje drzewo procesów C4D zadania"""
+    procs = _process_tree(task)
+    # Najpierw rodzic - nie uruchomi nowych procesów w trakcie wstrzymywania
+    for proc in procs:
+        with contextlib.suppress(psutil.Error):
+            proc.suspend()
+    return bool(procs)
+
+
+def resume_tree(task: RenderTask) -> bool:
+    """Wznawia drzewo procesów C4D zadania"""
+    procs = _process_tree(task)
+    for proc in reversed(procs):
+        with contextlib.suppress(psutil.Error):
+            proc.resume()
+    return bool(procs)
+
+
+def kill_tree(task: RenderTask) -> bool:
+    """Kończy drzewo procesów C4D zadania"""
+    procs = _process_tree(task)
+    for proc in procs:
+        with contextlib.suppress(psutil.Error):
+            proc.kill()
+    return bool(procs)
+
+
+class RenderSuspender:
+    """Decyduje, które trwające rendery wstrzymać, a które wznowić"""
+
+    def __init__(self):
+        self.config = get_config()
+        log_to_file, log_file_path = self.config.get_logging_settings()
+        self.logger = setup_logger("render_suspender", log_to_file, log_file_path)
+        self.resource_monitor = ResourceMonitor()
+        self._lock = threading.Lock()
+        # ID zadania -> powód wstrzymania; kolejność = kolejność wstrzymania
+        self._suspended: Dict[str, str] = {}
+        # Obiekty procesów między wywołaniami - cpu_percent mierzy od poprzedniego
+        self._cpu_procs: Dict[int, psutil.Process] = {}
+        self._last_change = 0.0
+        # Pamięć i CPU innych programów przy ostatnim wstrzymaniu z powodu presji
+        self._pressure_at_suspend: Optional[Tuple[float, float]] = None
+
+    def is_suspended(self, task: RenderTask) -> bool:
+        with self._lock:
+            return task.id in self._suspended
+
+    def has_suspended(self) -> bool:
+        with self._lock:
+            return bool(self._suspended)
+
+    def suspend(self, task: RenderTask, reason: str) -> bool:
+        with self._lock:
+            if task.id in self._suspended or not suspend_tree(task):
+                return False
+            self._suspended[task.id] = reason
+        task.suspended = True
+        get_tracer().instant("suspend", task_id=task.id, reason=reason)
+        self.logger.warning(f"Wstrzymano render {task.name} ({reason})")
+        return True
+
+    def resume(self, task: RenderTask) -> bool:
+        with self._lock:
+            if self._suspended.pop(task.id, None) is None:
+                return False
+            resume_tree(task)
+        task.suspended = False
+        get_tracer().instant("resume", task_id=task.id)
+        self.logger.info(f"Wznowiono render {task.name}")
+        return True
+
+    def update(self, running: List[RenderTask], paused: bool):
+        """Wstrzymuje lub wznawia rendery - wywoływane cyklicznie przez kolejkę"""
+        running_ids = {task.id for task in running}
+        with self._lock:
+            # Zadania zakończone (np. przerwane) w trakcie wstrzymania
+            for task_id in list(self._suspended):
+                if task_id not in running_ids:
+                    del self._suspended[task_id]
+            suspended = dict(self._suspended)
+
+        if paused:
+            for task in running:
+                self.suspend(task, "pause")
+            return
+        for task in running:
+            if suspended.get(task.id) == "pause":
+                self.resume(task)
+                suspended.pop(task.id)
+
+        enabled, memory_high, memory_low, cpu_high, cpu_low = (
+            self.config.get_suspend_settings()
+        )
+        if not enabled:
+            for task in running:
+                if task.id in suspended:
+                    self.resume(task)
+            return
+
+        memory, foreign_cpu = self._pressure(running)
+        active = [task for task in running if task.id not in suspended]
+        if suspended and not active:
+            # Pozostałe rendery się zakończyły - jeden musi pracować dalej
+            self._resume_last(running, suspended)
+            return
+        if time.monotonic() - self._last_change < SETTLE_SECONDS:
+            return
+        if memory > memory_high or (cpu_high and foreign_cpu > cpu_high):
+            previous = self._pressure_at_suspend
+            if previous is not None and not (
+                memory < previous[0] or (cpu_high and foreign_cpu < previous[1])
+            ):
+                # Poprzednie wstrzymanie nie pomogło - kolejne też nie pomoże
+                return
+            if len(active) > 1:
+                victim = min(active, key=self._suspend_order)
+                if self.suspend(victim, "pressure"):
+                    self._last_change = time.monotonic()
+                    self._pressure_at_suspend = (memory, foreign_cpu)
+                    self.logger.warning(
+                        f"Presja zasobów: pamięć {memory:.0f}%, "
+                        f"CPU innych programów {foreign_cpu:.0f}%"
+                    )
+        elif memory < memory_low and (not cpu_high or foreign_cpu < cpu_low):
+            if suspended:
+                self._resume_last(running, suspended)
+            self._pressure_at_suspend = None
+
+    def _resume_last(self, running: List[RenderTask], suspended: Dict[str, str]):
+        """Wznawia ostatnio wstrzymany render (wraca jako pierwszy)"""
+        task_id = list(suspended)[-1]
+        task = next(task for task in running if task.id == task_id)
+        if self.resume(task):
+            self._last_change = time.monotonic()
+
+    @staticmethod
+    def _suspend_order(task: RenderTask) -> Tuple[int, float]:
+        priority = PRIORITY_ORDER.get(task.render_settings.get("priority"), 1)
+        started = task.started_at.timestamp() if task.started_at else 0.0
+        return priority, -started
+
+    def _pressure(self, running: List[RenderTask]) -> Tuple[float, float]:
+        """Zwraca zajętość pamięci (%) i obciążenie CPU poza renderami (%)"""
+        resources = self.resource_monitor.get_average_resources(PRESSURE_WINDOW)
+        render_cpu = 0.0
+        seen: Dict[int, psutil.Process] = {}
+        for task in running:
+            for proc in _process_tree(task):
+                proc = self._cpu_procs.get(proc.pid, proc)
+                with contextlib.suppress(psutil.Error):
+                    render_cpu += proc.cpu_percent(None)
+                    seen[proc.pid] = proc
+        self._cpu_procs = seen
+        # cpu_percent procesu jest w procentach jednego rdzenia
+        render_share = render_cpu / (psutil.cpu_count() or 1)
+        return resources["memory"], max(0.0, resources["cpu"] - render_share)
+
+
+_suspender: Optional[RenderSuspender] = None
+_suspender_lock = threading.Lock()
+
+
+def get_render_suspender() -> RenderSuspender:
+    """Zwraca wspólny mechanizm wstrzymywania renderów"""
+    global _suspender
+    with _suspender_lock:
+        if _suspender is None:
+            _suspender = RenderSuspender()
+        return _suspender
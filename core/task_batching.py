@@ -0,0 +1,179 @@
+"""
+Łączenie zadań jednego projektu w jedno uruchomienie C4D.
+
+Zadania zgodne - ten sam plik .c4d, wersja C4D i ustawienia renderowania,
+jawny zbiór klatek, bez wyjścia multipass - mogą zostać wyrenderowane razem:
+komenda obejmuje sumę ich zbiorów klatek, więc scena wczytywana jest raz
+na wywołanie Commandline zamiast raz na zadanie. Zadanie dołącza do paczki
+tylko wtedy, gdy suma zakresów nie wymaga dodatkowego wywołania (nakłada
+się lub sąsiaduje z klatkami paczki) - inaczej wczytanie sceny i tak by się
+powtórzyło.
+
+Klatki renderowane są do folderu pierwszego zadania paczki (lidera), a po
+renderze przenoszone (lub kopiowane, gdy potrzebuje ich kilka zadań) do
+folderów pozostałych. Czasy klatek trafiają do zadań, do których klatki
+należą, a fazy wspólne (kopia projektu, start procesu, wczytanie sceny,
+dostarczenie) dzielone są po równo.
+"""
+
+import os
+import shutil
+from dataclasses import replace
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+from core.render_command import (
+    format_frame_set,
+    frame_runs,
+    parse_frame_set,
+    task_frame_ranges,
+    task_frame_strides,
+    task_frames,
+)
+from core.task_recovery import rendered_frame_files
+from models.task import RenderTask
+
+# Fazy mierzone raz dla całej paczki - dzielone między jej zadania
+SHARED_PHASES = ("staging", "spawn", "scene_load", "upload")
+
+
+def batch_key(task: RenderTask) -> Optional[Hashable]:
+    """Zwraca klucz zgodności zadania (None - zadania nie można łączyć)"""
+    if task_frame_ranges(task) is None:
+        # Zakres z pliku C4D - suma z innym zadaniem nie jest znana
+        return None
+    if task.render_settings.get("multipass_output"):
+        return None
+    settings = tuple(
+        sorted((key, repr(value)) for key, value in task.render_settings.items())
+    )
+    return (
+        os.path.normcase(os.path.abspath(task.c4d_file_path)),
+        task.cinema4d_version,
+        settings,
+    )
+
+
+def _union(tasks: Sequence[RenderTask]) -> str:
+    return format_frame_set(
+        parse_frame_set(
+            ",".join(format_frame_set(task_frame_ranges(task)) for task in tasks)
+        )
+    )
+
+
+def select_batch(
+    lead: RenderTask, candidates: Sequence[RenderTask], limit: int
+) -> List[RenderTask]:
+    """Wybiera zadania, które dołączą do paczki lidera (w kolejności kolejki)"""
+    key = batch_key(lead)
+    if key is None or limit <= 0:
+        return []
+    batch = [lead]
+    strides = task_frame_strides(lead)
+    invocations = len(frame_runs(task_frame_ranges(lead), strides))
+    remaining = [task for task in candidates if task is not lead]
+    added = True
+    # Kolejne przebiegi - zadanie może połączyć się z paczką przez inne
+    while added and len(batch) <= limit:
+        added = False
+        for task in list(remaining):
+            if len(batch) > limit:
+                break
+            if batch_key(task) != key or not task_frame_ranges(task):
+                continue
+            union = parse_frame_set(_union(batch + [task]))
+            if len(frame_runs(union, strides)) > invocations:
+                continue
+            batch.append(task)
+            remaining.remove(task)
+            added = True
+    return batch[1:]
+
+
+def merge_batch(tasks: Sequence[RenderTask]) -> RenderTask:
+    """Zwraca zadanie renderujące sumę klatek paczki do folderu lidera
+
+    Kopia współdzieli phase_timings z liderem - fazy trafiają do lidera.
+    """
+    lead = tasks[0]
+    return replace(
+        lead,
+        frame_set=_union(tasks),
+        start_frame=None,
+        end_frame=None,
+        phase_timings=lead.phase_timings,
+    )
+
+
+def frame_owner(tasks: Sequence[RenderTask]) -> Callable[[int], RenderTask]:
+    """Zwraca funkcję: numer klatki -> zadanie paczki, do którego należy"""
+    owners: Dict[int, RenderTask] = {}
+    for task in tasks:
+        for frame in task_frames(task) or []:
+            owners.setdefault(frame, task)
+    lead = tasks[0]
+    return lambda frame: owners.get(frame, lead)
+
+
+def split_shared_phases(tasks: Sequence[RenderTask], before: Dict[str, float]):
+    """Dzieli fazy wspólne zmierzone na liderze po równo między zadania paczki"""
+    lead = tasks[0]
+    for phase in SHARED_PHASES:
+        shared = lead.phase_timings.get(phase, 0.0) - before.get(phase, 0.0)
+        if shared <= 0:
+            continue
+        share = shared / len(tasks)
+        lead.phase_timings[phase] = round(before.get(phase, 0.0) + share, 3)
+        for task in tasks[1:]:
+            task.phase_timings[phase] = round(
+                task.phase_timings.get(phase, 0.0) + share, 3
+            )
+
+
+def _same_folder(a: str, b: str) -> bool:
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def distribute_outputs(tasks: Sequence[RenderTask]) -> Dict[str, str]:
+    """Przenosi klatki z folderu lidera do folderów pozostałych zadań
+
+    Zwraca błędy według ID zadania (pusty słownik - wszystko dostarczone).
+    """
+    lead = tasks[0]
+    files = rendered_frame_files(lead)
+    here = set()
+    targets: Dict[int, List[RenderTask]] = {}
+    for task in tasks:
+        for frame in task_frames(task) or []:
+            if _same_folder(task.output_folder, lead.output_folder):
+                here.add(frame)
+            else:
+                targets.setdefault(frame, []).append(task)
+
+    errors: Dict[str, str] = {}
+    for frame, frame_tasks in targets.items():
+        for path in files.get(frame, []):
+            for index, task in enumerate(frame_tasks):
+                destination = os.path.join(task.output_folder, os.path.basename(path))
+                try:
+                    os.makedirs(task.output_folder, exist_ok=True)
+                    if frame in here or index < len(frame_tasks) - 1:
+                        shutil.copy2(path, destination)
+                    else:
+                        # Ostatni odbiorca klatki, której lider nie potrzebuje
+                        shutil.move(path, destination)
+                except OSError as e:
+                    errors[task.id] = f"Nie przeniesiono klatki {frame}: {e}"
+
+    if not lead.output_files:
+        return errors
+    # Lista plików lidera (dostarczenie z folderu lokalnego) obejmowała całą paczkę
+    for task in tasks:
+        wanted = set(task_frames(task) or [])
+        task.output_files = sorted(
+            path
+            for frame, paths in rendered_frame_files(task).items()
+            if frame in wanted
+            for path in paths
+        )
+    return errors
@@ -0,0 +1,74 @@
+"""
+Zależności między zadaniami (depends_on) - graf skierowany bez cykli.
+
+Zadanie jest gotowe, gdy wszystkie jego zależności mają status COMPLETED.
+Kolejka pomija zadania niegotowe, więc niezależne gałęzie grafu zajmują
+wolne sloty zamiast czekać za zadaniami wcześniej w kolejce. Gdy zależność
+zakończy się błędem, zależne od niej zadania (także pośrednio) kończą się
+statusem FAILED, a gdy zostanie anulowana - CANCELLED.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from models.task import RenderTask, TaskStatus
+
+# Statusy zależności, po których zadanie zależne nie może się już wykonać
+BLOCKING_STATUSES = (TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+def task_index(tasks: Iterable[RenderTask]) -> Dict[str, RenderTask]:
+    return {task.id: task for task in tasks}
+
+
+def unmet_dependencies(task: RenderTask, by_id: Dict[str, RenderTask]) -> List[str]:
+    """Zwraca ID zależności, które nie zakończyły się jeszcze sukcesem
+
+    Nieznane ID też są niespełnione - zależność może zostać dodana później.
+    """
+    return [
+        task_id
+        for task_id in task.depends_on
+        if task_id not in by_id or by_id[task_id].status != TaskStatus.COMPLETED
+    ]
+
+
+def is_ready(task: RenderTask, by_id: Dict[str, RenderTask]) -> bool:
+    return not task.depends_on or not unmet_dependencies(task, by_id)
+
+
+def blocking_dependency(
+    task: RenderTask, by_id: Dict[str, RenderTask]
+) -> Optional[RenderTask]:
+    """Zwraca zależność, przez którą zadanie nie wykona się nigdy (lub None)"""
+    for task_id in task.depends_on:
+        dependency = by_id.get(task_id)
+        if dependency is not None and dependency.status in BLOCKING_STATUSES:
+            return dependency
+    return None
+
+
+def find_cycle(task: RenderTask, by_id: Dict[str, RenderTask]) -> Optional[List[str]]:
+    """Zwraca ścieżkę ID tworzącą cykl przez zadanie (lub None)"""
+    stack = [(task_id, [task.id, task_id]) for task_id in task.depends_on]
+    visited = set()
+    while stack:
+        task_id, path = stack.pop()
+        if task_id == task.id:
+            return path
+        if task_id in visited or task_id not in by_id:
+            continue
+        visited.add(task_id)
+        for dependency in by_id[task_id].depends_on:
+            stack.append((dependency, path + [dependency]))
+    return None
+
+
+def ready_tasks(tasks: Iterable[RenderTask]) -> List[RenderTask]:
+    """Zwraca zadania PENDING, których wszystkie zależności są spełnione"""
+    tasks = list(tasks)
+    by_id = task_index(tasks)
+    return [
+        task
+        for task in tasks
+        if task.status == TaskStatus.PENDING and is_ready(task, by_id)
+    ]
@@ -0,0 +1,225 @@
+"""
+Dzierżawy zadań we wspólnym (sieciowym) folderze tasks/.
+
+Każdy węzeł przed renderowaniem zadania tworzy plik tasks/leases/<id>.lease
+jako twarde dowiązanie (os.link) do zapisanego wcześniej pliku tymczasowego -
+utworzyć go może tylko jeden węzeł, a plik nigdy nie jest widoczny w połowie
+zapisu. Dzierżawa zawiera czas wygaśnięcia i jest odnawiana w tle; dzierżawę
+węzła, który przestał działać, inny węzeł przejmuje po jej wygaśnięciu.
+Nieczytelny plik dzierżawy wygasa po duration od ostatniej modyfikacji.
+Gdy odnowienie wykryje, że dzierżawę przejął inny węzeł, wywoływany jest
+on_lost - render tego zadania na bieżącym węźle trzeba przerwać. Zegary
+węzłów powinny być synchronizowane (NTP), bo czas wygaśnięcia porównywany
+jest z zegarem węzła czytającego.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from core.config import get_config
+from utils.logger import setup_logger
+
+
+class LeaseManager:
+    """Zarządza dzierżawami zadań bieżącego węzła"""
+
+    LEASES_DIR = "leases"
+
+    def __init__(
+        self,
+        tasks_dir: str,
+        node_id: str = "",
+        duration: float = 60.0,
+        on_lost: Optional[Callable[[str], None]] = None,
+    ):
+        self.leases_dir = os.path.join(tasks_dir, self.LEASES_DIR)
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.duration = duration
+        self.on_lost = on_lost
+        log_to_file, log_file_path = get_config().get_logging_settings()
+        self.logger = setup_logger("task_leases", log_to_file, log_file_path)
+
+        # task_id -> token dzierżawy trzymanej przez ten węzeł
+        self._held: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._renew_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        os.makedirs(self.leases_dir, exist_ok=True)
+
+    def _lease_path(self, task_id: str) -> str:
+        return os.path.join(self.leases_dir, f"{task_id}.lease")
+
+    def _lease_data(self, token: str) -> dict:
+        return {
+            "node_id": self.node_id,
+            "token": token,
+            "pid": os.getpid(),
+            "expires_at": time.time() + self.duration,
+        }
+
+    def _load_lease(self, path: str) -> dict:
+        """Wczytuje plik dzierżawy; nieczytelny wygasa po duration od modyfikacji"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            # Pusty lub ucięty plik (np. po awarii dysku w trakcie zapisu)
+            return {
+                "node_id": "?",
+                "expires_at": os.path.getmtime(path) + self.duration,
+            }
+
+    def read_lease(self, task_id: str) -> Optional[dict]:
+        """Zwraca zawartość dzierżawy zadania lub None, jeśli jej nie ma"""
+        try:
+            return self._load_lease(self._lease_path(task_id))
+        except FileNotFoundError:
+            return None
+        except OSError:
+            # Chwilowy błąd wspólnego folderu - traktuj dzierżawę jako ważną
+            return {"node_id": "?", "expires_at": time.time() + self.duration}
+
+    def is_expired(self, task_id: str) -> bool:
+        """Sprawdza, czy zadanie nie ma ważnej dzierżawy"""
+        lease = self.read_lease(task_id)
+        return lease is None or lease.get("expires_at", 0) < time.time()
+
+    def holds(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._held
+
+    def acquire(self, task_id: str) -> bool:
+        """Próbuje przejąć dzierżawę zadania; zwraca False, gdy ma ją inny węzeł"""
+        with self._lock:
+            if task_id in self._held:
+                return True
+
+        token = uuid.uuid4().hex
+        if not self._create_lease(task_id, token):
+            lease = self.read_lease(task_id)
+            if lease is None or lease.get("expires_at", 0) >= time.time():
+                return False
+            if not self._reclaim_expired(task_id):
+                return False
+            if not self._create_lease(task_id, token):
+                return False
+            self.logger.warning(
+                f"Przejęto wygasłą dzierżawę zadania {task_id} "
+                f"(węzeł {lease.get('node_id')})"
+            )
+
+        with self._lock:
+            self._held[task_id] = token
+        self._ensure_renewal()
+        return True
+
+    def release(self, task_id: str):
+        """Zwalnia dzierżawę zadania trzymaną przez ten węzeł"""
+        with self._lock:
+            token = self._held.pop(task_id, None)
+        if token is None:
+            return
+        lease = self.read_lease(task_id)
+        if lease and lease.get("token") == token:
+            try:
+                os.remove(self._lease_path(task_id))
+            except FileNotFoundError:
+                pass
+
+    def _create_lease(self, task_id: str, token: str) -> bool:
+        """Atomowo tworzy plik dzierżawy; False, jeśli już istnieje"""
+        lease_path = self._lease_path(task_id)
+        tmp_path = f"{lease_path}.{token}.new"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._lease_data(token), f)
+        try:
+            os.link(tmp_path, lease_path)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+    def _reclaim_expired(self, task_id: str) -> bool:
+        """Usuwa wygasłą dzierżawę tak, by zrobił to tylko jeden węzeł
+
+        Plik jest najpierw przenoszony pod unikalną nazwę (rename jest
+        atomowy), a dopiero potem sprawdzany. Jeśli w międzyczasie inny węzeł
+        założył nową dzierżawę, zostaje ona przywrócona.
+        """
+        lease_path = self._lease_path(task_id)
+        stale_path = f"{lease_path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+
+        try:
+            expired = self._load_lease(stale_path).get("expires_at", 0) < time.time()
+        except OSError:
+            expired = False
+
+        if not expired:
+            try:
+                os.link(stale_path, lease_path)
+            except OSError:
+                self.logger.error(f"Nie udało się przywrócić dzierżawy {task_id}")
+        os.remove(stale_path)
+        return expired
+
+    # --- Odnawianie ---
+
+    def _ensure_renewal(self):
+        if self._renew_thread and self._renew_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._renew_thread = threading.Thread(
+            target=self._renew_loop, name="lease-renewal", daemon=True
+        )
+        self._renew_thread.start()
+
+    def stop(self):
+        """Zatrzymuje odnawianie i zwalnia wszystkie dzierżawy"""
+        self._stop_event.set()
+        with self._lock:
+            task_ids = list(self._held)
+        for task_id in task_ids:
+            self.release(task_id)
+
+    def _renew_loop(self):
+        while not self._stop_event.wait(self.duration / 3):
+            self.renew_all()
+
+    def renew_all(self):
+        """Przedłuża wszystkie dzierżawy trzymane przez ten węzeł"""
+        with self._lock:
+            held = dict(self._held)
+        for task_id, token in held.items():
+            lease = self.read_lease(task_id)
+            if lease is None:
+                # Plik zniknął (np. chwilowo przeniesiony) - spróbuj go odtworzyć
+                if self._create_lease(task_id, token):
+                    continue
+                lease = self.read_lease(task_id)
+            if lease is None or lease.get("token") != token:
+                self.logger.error(
+                    f"Utracono dzierżawę zadania {task_id} na rzecz węzła "
+                    f"{lease.get('node_id') if lease else '?'}"
+                )
+                with self._lock:
+                    self._held.pop(task_id, None)
+                if self.on_lost:
+                    self.on_lost(task_id)
+                continue
+            tmp_path = f"{self._lease_path(task_id)}.{token}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._lease_data(token), f)
+            os.replace(tmp_path, self._lease_path(task_id))
@@ -0,0 +1,110 @@
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from core.render_command import task_frames
+from models.task import RenderTask
+
+IMAGE_EXTENSIONS = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".exr",
+    ".tif",
+    ".tiff",
+    ".tga",
+    ".bmp",
+    ".psd",
+    ".hdr",
+    ".dpx",
+}
+
+# Numer klatki na końcu nazwy pliku, np. "shot_0042.png"
+FRAME_NUMBER_PATTERN = re.compile(r"(\d+)$")
+
+
+def output_frame_number(stem: str, scene: str) -> Optional[int]:
+    """Zwraca numer klatki z nazwy pliku wynikowego (bez rozszerzenia)
+
+    C4D dopisuje numer do nazwy sceny, więc nazwa sceny jest pomijana -
+    inaczej "shot2" + "0001" dałoby klatkę 20001.
+    """
+    if scene and stem.startswith(scene):
+        stem = stem[len(scene) :]
+    match = FRAME_NUMBER_PATTERN.search(stem)
+    return int(match.group(1)) if match else None
+
+
+def _frame_entries(task: RenderTask) -> Iterator[Tuple[int, os.DirEntry]]:
+    """Zwraca (numer klatki, plik) dla plików klatek w folderze wyjściowym"""
+    if not task.output_folder or not os.path.isdir(task.output_folder):
+        return
+    scene = os.path.splitext(os.path.basename(task.c4d_file_path))[0]
+    for entry in os.scandir(task.output_folder):
+        stem, extension = os.path.splitext(entry.name)
+        if extension.lower() not in IMAGE_EXTENSIONS or not entry.is_file():
+            continue
+        frame = output_frame_number(stem, scene)
+        if frame is not None:
+            yield frame, entry
+
+
+def rendered_frame_sizes(task: RenderTask) -> Dict[int, int]:
+    """Zwraca rozmiar (bajty) plików klatek istniejących w folderze wyjściowym
+
+    Klatki zapisane w kilku plikach (np. przebiegi) sumują się.
+    """
+    sizes: Dict[int, int] = {}
+    for frame, entry in _frame_entries(task):
+        size = entry.stat().st_size
+        if size > 0:
+            sizes[frame] = sizes.get(frame, 0) + size
+    return sizes
+
+
+def rendered_frame_files(task: RenderTask) -> Dict[int, List[str]]:
+    """Zwraca ścieżki plików klatek istniejących w folderze wyjściowym"""
+    files: Dict[int, List[str]] = {}
+    for frame, entry in _frame_entries(task):
+        files.setdefault(frame, []).append(entry.path)
+    return files
+
+
+def find_rendered_frames(task: RenderTask) -> Set[int]:
+    """Zwraca numery klatek, których pliki istnieją w folderze wyjściowym"""
+    return set(rendered_frame_sizes(task))
+
+
+def missing_frames(task: RenderTask, rendered: Set[int]) -> List[int]:
+    """Zwraca klatki zadania, których brakuje w folderze wyjściowym"""
+    return [frame for frame in task_frames(task) or [] if frame not in rendered]
+
+
+def remaining_frame_set(task: RenderTask) -> Optional[str]:
+    """Zwraca zbiór klatek do wyrenderowania po przerwaniu (None - wszystkie)
+
+    Klatki nie muszą powstawać rosnąco (kolejność progressive), więc
+    wznowienie obejmuje dokładnie brakujące klatki. Plik zapisany najpóźniej
+    mógł zostać przerwany w trakcie zapisu, dlatego jego klatka jest
+    renderowana ponownie.
+    """
+    frames = task_frames(task)
+    if not frames:
+        return None
+    wanted = set(frames)
+    rendered: Set[int] = set()
+    newest: Optional[Tuple[int, int]] = None  # (mtime_ns, klatka)
+    for frame, entry in _frame_entries(task):
+        if frame not in wanted:
+            continue
+        stat = entry.stat()
+        if stat.st_size <= 0:
+            continue
+        rendered.add(frame)
+        if newest is None or stat.st_mtime_ns > newest[0]:
+            newest = (stat.st_mtime_ns, frame)
+    if newest is not None:
+        rendered.discard(newest[1])
+    if not rendered:
+        return None
+    return ",".join(str(frame) for frame in frames if frame not in rendered)
@@ -1,14 +1,17 @@
 import concurrent.futures
+import itertools
 import queue
 import threading
 from dataclasses import dataclass
 from typing import Callable, List, Optional
 
 from core.cinema4d_controller import Cinema4DController
-from core.config import Config
+from core.config import get_config
+from core.render_metrics import get_render_stats
 from models.task import RenderTask, TaskStatus
 from utils.logger import setup_logger
 from utils.resource_monitor import ResourceMonitor
+from utils.tracing import TASK_SPAN, get_tracer
 
 
 @dataclass
@@ -22,7 +25,7 @@ class RenderWorker:
 
 class ThreadManager:
     def __init__(self, max_workers: int = None):
-        self.config = Config()
+        self.config = get_config()
         log_to_file, log_file_path = self.config.get_logging_settings()
         self.logger = setup_logger("thread_manager", log_to_file, log_file_path)
         self.resource_monitor = ResourceMonitor()
@@ -35,6 +38,9 @@ class ThreadManager:
         self.max_workers = max_workers
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
         self.task_queue = queue.PriorityQueue()
+        # Kolejność dodania rozstrzyga remisy priorytetów - RenderTask nie jest
+        # porównywalny, więc sama para (priorytet, zadanie) rzucałaby TypeError
+        self._sequence = itertools.count()
         self.workers: List[RenderWorker] = [
             RenderWorker(worker_id=i) for i in range(max_workers)
         ]
@@ -69,7 +75,10 @@ class ThreadManager:
 
     def add_task(self, task: RenderTask, priority: int = 1):
         """Dodaje zadanie do kolejki z priorytetem (niższy = wyższy priorytet)"""
-        self.task_queue.put((priority, task))
+        self.task_queue.put((priority, next(self._sequence), task))
+        get_tracer().instant(
+            "enqueue", track="queue", task_id=task.id, priority=priority
+        )
         self.logger.info(
             f"Dodano zadanie do kolejki: {task.name} (priorytet: {priority})"
         )
@@ -83,7 +92,14 @@ class ThreadManager:
                 if available_worker and self.resource_monitor.should_start_render():
                     try:
                         # Pobierz zadanie z kolejki (timeout 1 sekunda)
-                        priority, task = self.task_queue.get(timeout=1.0)
+                        _, _, task = self.task_queue.get(timeout=1.0)
+
+                        get_tracer().instant(
+                            "dispatch",
+                            track="queue",
+                            task_id=task.id,
+                            worker=available_worker.worker_id,
+                        )
 
                         # Przypisz zadanie do workera
                         available_worker.is_busy = True
@@ -94,7 +110,7 @@ class ThreadManager:
 
                         # Uruchom zadanie w osobnym wątku
                         future = self.executor.submit(
-                            self._execute_task, task, available_worker.worker_id
+                            self._execute_traced, task, available_worker.worker_id
                         )
 
                         # Dodaj callback dla zakończenia zadania
@@ -120,12 +136,28 @@ class ThreadManager:
                 return worker
         return None
 
+    def _execute_traced(self, task: RenderTask, worker_id: int) -> bool:
+        """Wykonuje zadanie jako odcinek na osi czasu workera"""
+        tracer = get_tracer()
+        with tracer.on_track(f"worker-{worker_id}"), tracer.span(
+            TASK_SPAN, task_id=task.id, task=task.name
+        ) as span:
+            success = self._execute_task(task, worker_id)
+            span["status"] = task.status.value
+        return success
+
     def _execute_task(self, task: RenderTask, worker_id: int) -> bool:
         """Wykonuje zadanie renderingu"""
         from datetime import datetime
 
         task.status = TaskStatus.RUNNING
         task.started_at = datetime.now()
+        task.phase_timings = {}
+        stats = get_render_stats()
+        stats.record_phase(
+            task, "queue_wait", (task.started_at - task.created_at).total_seconds()
+        )
+        stats.worker_started(worker_id)
 
         if self.on_task_started:
             self.on_task_started(task, worker_id)
@@ -134,7 +166,8 @@ class ThreadManager:
 
         try:
             # Walidacja projektu
-            issues = self.c4d_controller.validate_project(task)
+            with stats.phase(task, "validation"):
+                issues = self.c4d_controller.validate_project(task)
             if issues:
                 task.status = TaskStatus.FAILED
                 task.error_message = "; ".join(issues)
@@ -157,6 +190,8 @@ class ThreadManager:
             return False
         finally:
             task.completed_at = datetime.now()
+            stats.worker_finished(worker_id)
+            stats.task_finished(task, task.status == TaskStatus.COMPLETED)
 
     def _task_completed(self, future: concurrent.futures.Future, worker: RenderWorker):
         """Callback wywoływany po zakończeniu zadania"""
@@ -1,13 +1,18 @@
 import logging
+import threading
 
-from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from PyQt6.QtCore import QObject, Qt, QTimer, pyqtSignal
 from PyQt6.QtWidgets import (
+    QApplication,
     QDialog,
+    QFileDialog,
     QGridLayout,
     QGroupBox,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
     QMainWindow,
+    QMenu,
     QMessageBox,
     QPushButton,
     QSplitter,
@@ -18,45 +23,92 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from core.cinema4d_controller import Cinema4DController
-from core.config import Config
+from core.bulk_import import (
+    build_tasks,
+    payloads_from_folder,
+    payloads_from_manifest,
+    validate_tasks,
+)
+from core.config import get_config
 from core.queue_manager import QueueManager
+from core.render_metrics import FIRST_FRAME, PHASES, get_render_stats
 from gui.button_styles import BUTTON_STYLES
 from gui.preferences_dialog import PreferencesDialog
+from gui.resource_chart_widget import SparklineWidget
 from gui.task_dialog import TaskDialog
 from gui.worker_status_widget import WorkerStatusWidget
 from models.task import RenderTask, TaskStatus
 from utils.logger import setup_logger
 from utils.resource_monitor import ResourceMonitor
+from utils.resource_sampler import get_resource_sampler
 
 
-class ResourceMonitorThread(QThread):
-    """Wątek do monitorowania zasobów systemowych"""
+class ResourceSamplerBridge(QObject):
+    """Przekazuje próbki ze wspólnego próbnika zasobów do wątku GUI"""
 
     resources_updated = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
-        self.resource_monitor = ResourceMonitor()
-        self.running = True
+        self.sampler = get_resource_sampler()
 
-    def run(self):
-        while self.running:
-            resources = self.resource_monitor.get_system_resources()
-            self.resources_updated.emit(resources)
-            self.msleep(2000)  # Sprawdź co 2 sekundy
+    def start(self):
+        self.sampler.subscribe(self._on_sample)
 
     def stop(self):
-        self.running = False
-        self.quit()
-        self.wait()
+        self.sampler.unsubscribe(self._on_sample)
+
+    def _on_sample(self, resources: dict):
+        # Wywoływane z wątku próbnika - sygnał trafia do kolejki zdarzeń GUI
+        self.resources_updated.emit(resources)
+
+
+class SharedQueueRefresher(QObject):
+    """Wczytuje w tle zmiany wspólnego folderu zadań i zgłasza je do wątku GUI"""
+
+    tasks_refreshed = pyqtSignal()
+
+    def __init__(self, queue_manager: QueueManager):
+        super().__init__()
+        self.queue_manager = queue_manager
+        self._thread = None
+
+    def refresh(self):
+        # Odczyt sieciowego folderu może trwać - pomiń, jeśli poprzedni trwa
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="shared-queue-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        self.queue_manager.refresh_from_files()
+        self.tasks_refreshed.emit()
 
 
 class MainWindow(QMainWindow):
+    # Liczba próbek pokazywanych na wykresach zasobów
+    CHART_POINTS = 120
+    # Nazwy faz w panelu statystyk
+    PHASE_LABELS = {
+        "queue_wait": "kolejka",
+        "validation": "walidacja",
+        "staging": "kopia lokalna",
+        "spawn": "start procesu",
+        "scene_load": "wczytanie sceny",
+        "render": "renderowanie",
+        "upload": "wysyłanie",
+        "verification": "weryfikacja",
+        FIRST_FRAME: "do 1. klatki",
+    }
+
     def __init__(self):
         super().__init__()
-        self.config = Config()
+        self.config = get_config()
         self.queue_manager = QueueManager()
+        self.queue_refresher = SharedQueueRefresher(self.queue_manager)
+        self.queue_refresher.tasks_refreshed.connect(self.update_tasks_table)
         self.resource_monitor = ResourceMonitor()
         self.init_ui()  # Najpierw inicjalizujemy UI
         self.setup_logging()  # Potem konfigurujemy logowanie
@@ -69,6 +121,22 @@ class MainWindow(QMainWindow):
         self.queue_manager.load_tasks()
         self.update_tasks_table()  # Aktualizuj widok po wczytaniu zadań
 
+        self.setup_api_server()
+
+    def setup_api_server(self):
+        """Uruchamia lokalne API HTTP, jeśli jest włączone w konfiguracji"""
+        self.api_server = None
+        if not self.config.get_api_settings()[0]:
+            return
+        from core.api_server import QueueApiServer
+
+        try:
+            self.api_server = QueueApiServer(self.queue_manager)
+            self.api_server.start()
+        except OSError as e:
+            self.logger.error(f"Nie udało się uruchomić API HTTP: {e}")
+            self.api_server = None
+
     def setup_logging(self):
         """Konfiguruje logowanie na podstawie ustawień"""
         log_to_file, log_file_path = self.config.get_logging_settings()
@@ -127,16 +195,24 @@ class MainWindow(QMainWindow):
         # Toolbar
         toolbar_layout = QHBoxLayout()
         self.add_task_btn = QPushButton("Dodaj zadanie")
+        self.import_tasks_btn = QPushButton("Importuj zadania")
+        import_menu = QMenu(self.import_tasks_btn)
+        self.import_folder_action = import_menu.addAction("Z folderu projektów...")
+        self.import_manifest_action = import_menu.addAction("Z pliku CSV/JSON...")
+        self.import_tasks_btn.setMenu(import_menu)
         self.remove_task_btn = QPushButton("Usuń zadanie")
         self.start_queue_btn = QPushButton("Start kolejki")
         self.stop_queue_btn = QPushButton("Stop kolejki")
+        self.pause_queue_btn = QPushButton("Wstrzymaj kolejkę")
         self.preferences_btn = QPushButton("Preferencje")
         self.edit_task_btn = QPushButton("Edytuj zadanie")
 
         toolbar_layout.addWidget(self.add_task_btn)
+        toolbar_layout.addWidget(self.import_tasks_btn)
         toolbar_layout.addWidget(self.remove_task_btn)
         toolbar_layout.addWidget(self.start_queue_btn)
         toolbar_layout.addWidget(self.stop_queue_btn)
+        toolbar_layout.addWidget(self.pause_queue_btn)
         toolbar_layout.addWidget(self.edit_task_btn)
         toolbar_layout.addWidget(self.preferences_btn)
 
@@ -148,9 +224,19 @@ class MainWindow(QMainWindow):
 
         # Tabela zadań
         self.tasks_table = QTableWidget()
-        self.tasks_table.setColumnCount(6)
+        self.tasks_table.setColumnCount(9)
         self.tasks_table.setHorizontalHeaderLabels(
-            ["Nazwa", "Status", "Plik C4D", "Folder wyjściowy", "Wersja C4D", "Czas"]
+            [
+                "Nazwa",
+                "Status",
+                "Plik C4D",
+                "Folder wyjściowy",
+                "Wersja C4D",
+                "Czas",
+                "Szczyt RAM",
+                "Śr. rdzenie",
+                "Dysk odczyt/zapis",
+            ]
         )
         self.tasks_table.setStyleSheet(
             """
@@ -209,12 +295,53 @@ class MainWindow(QMainWindow):
         self.memory_label = QLabel("RAM: 0%")
         self.disk_label = QLabel("Dysk: 0%")
 
+        # Wykresy historii zasobów
+        self.cpu_chart = SparklineWidget("#10B981")
+        self.memory_chart = SparklineWidget("#007ACC")
+        self.disk_chart = SparklineWidget("#F59E0B")
+
         resources_layout.addWidget(self.cpu_label, 0, 0)
-        resources_layout.addWidget(self.memory_label, 0, 1)
-        resources_layout.addWidget(self.disk_label, 1, 0)
+        resources_layout.addWidget(self.cpu_chart, 0, 1)
+        resources_layout.addWidget(self.memory_label, 1, 0)
+        resources_layout.addWidget(self.memory_chart, 1, 1)
+        resources_layout.addWidget(self.disk_label, 2, 0)
+        resources_layout.addWidget(self.disk_chart, 2, 1)
 
         info_layout.addWidget(resources_group)
 
+        # Statystyki renderowania (metryki silnika)
+        stats_group = QGroupBox("Statystyki")
+        stats_group.setStyleSheet(
+            """
+            QGroupBox {
+                background-color: #252526;
+                border: 1px solid #3F3F46;
+                border-radius: 4px;
+                margin-top: 8px;
+                padding-top: 16px;
+            }
+            QGroupBox::title {
+                color: #CCCCCC;
+                subcontrol-origin: margin;
+                left: 8px;
+                padding: 0 4px;
+            }
+        """
+        )
+        stats_layout = QGridLayout(stats_group)
+        self.throughput_label = QLabel("Zadania/h: 0.0")
+        self.finished_label = QLabel("Ukończone: 0, błędy: 0")
+        self.utilization_label = QLabel("Wykorzystanie: 0%")
+        self.log_rate_label = QLabel("Linie logu/s: 0.0")
+        self.phases_label = QLabel("Brak zmierzonych faz")
+        self.phases_label.setWordWrap(True)
+        stats_layout.addWidget(self.throughput_label, 0, 0)
+        stats_layout.addWidget(self.finished_label, 0, 1)
+        stats_layout.addWidget(self.utilization_label, 1, 0)
+        stats_layout.addWidget(self.log_rate_label, 1, 1)
+        stats_layout.addWidget(self.phases_label, 2, 0, 1, 2)
+        info_layout.addWidget(stats_group)
+
         # Logi
         logs_group = QGroupBox("Logi")
         logs_group.setStyleSheet(
@@ -270,18 +397,24 @@ class MainWindow(QMainWindow):
     def apply_styles(self):
         """Aplikuje style do przycisków"""
         self.add_task_btn.setStyleSheet(BUTTON_STYLES["primary"])
+        self.import_tasks_btn.setStyleSheet(BUTTON_STYLES["default"])
         self.remove_task_btn.setStyleSheet(BUTTON_STYLES["warning"])
         self.start_queue_btn.setStyleSheet(BUTTON_STYLES["success"])
         self.stop_queue_btn.setStyleSheet(BUTTON_STYLES["stop"])
+        self.pause_queue_btn.setStyleSheet(BUTTON_STYLES["default"])
         self.preferences_btn.setStyleSheet(BUTTON_STYLES["default"])
         self.stop_queue_btn.setEnabled(False)
+        self.pause_queue_btn.setEnabled(False)
 
     def setup_connections(self):
         """Konfiguruje połączenia sygnałów"""
         self.add_task_btn.clicked.connect(self.add_task)
+        self.import_folder_action.triggered.connect(self.import_tasks_from_folder)
+        self.import_manifest_action.triggered.connect(self.import_tasks_from_manifest)
         self.remove_task_btn.clicked.connect(self.remove_task)
         self.start_queue_btn.clicked.connect(self.start_queue)
         self.stop_queue_btn.clicked.connect(self.stop_queue)
+        self.pause_queue_btn.clicked.connect(self.toggle_queue_pause)
         self.preferences_btn.clicked.connect(self.show_preferences)
         self.edit_task_btn.clicked.connect(self.edit_task)
 
@@ -297,7 +430,7 @@ class MainWindow(QMainWindow):
         """Konfiguruje timery dla aktualizacji UI"""
         # Timer dla tabeli zadań (rzadziej)
         self.tasks_timer = QTimer()
-        self.tasks_timer.timeout.connect(self.update_tasks_table)
+        self.tasks_timer.timeout.connect(self.refresh_tasks)
         self.tasks_timer.start(5000)  # Co 5 sekund
 
         # Timer dla statusu workerów (częściej)
@@ -305,11 +438,16 @@ class MainWindow(QMainWindow):
         self.workers_timer.timeout.connect(self.update_worker_status)
         self.workers_timer.start(2000)  # Co 2 sekundy
 
+        # Timer dla statystyk renderowania
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(5000)  # Co 5 sekund
+
     def setup_resource_monitoring(self):
         """Konfiguruje asynchroniczny monitoring zasobów"""
-        self.resource_thread = ResourceMonitorThread()
-        self.resource_thread.resources_updated.connect(self.update_resources)
-        self.resource_thread.start()
+        self.resource_bridge = ResourceSamplerBridge()
+        self.resource_bridge.resources_updated.connect(self.update_resources)
+        self.resource_bridge.start()
 
     def add_task(self):
         """Otwiera dialog dodawania zadania"""
@@ -326,6 +464,71 @@ class MainWindow(QMainWindow):
             self.logger.error(f"Błąd podczas dodawania zadania: {str(e)}")
             QMessageBox.critical(self, "Błąd", f"Wystąpił błąd: {str(e)}")
 
+    def import_tasks_from_folder(self):
+        """Importuje wszystkie pliki .c4d z wybranego folderu"""
+        folder = QFileDialog.getExistingDirectory(self, "Folder z projektami C4D")
+        if not folder:
+            return
+        versions = list(get_config().get_c4d_versions())
+        if not versions:
+            QMessageBox.warning(
+                self, "Błąd", "Brak skonfigurowanych wersji Cinema 4D"
+            )
+            return
+        version, ok = QInputDialog.getItem(
+            self, "Import zadań", "Wersja Cinema 4D:", versions, 0, False
+        )
+        if ok:
+            self._import_payloads(payloads_from_folder(folder, version))
+
+    def import_tasks_from_manifest(self):
+        """Importuje zadania z manifestu CSV/JSON (także szablonu z 'sweep')"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Manifest zadań", "", "Manifest (*.csv *.json)"
+        )
+        if not path:
+            return
+        try:
+            payloads = payloads_from_manifest(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(
+                self, "Błąd", f"Nie udało się wczytać manifestu: {e}"
+            )
+            return
+        self._import_payloads(payloads)
+
+    def _import_payloads(self, payloads: list):
+        """Waliduje zgłoszenia równolegle i dodaje poprawne do kolejki"""
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            result = validate_tasks(
+                build_tasks(
+                    payloads,
+                    [task.id for task in self.queue_manager.get_tasks()],
+                ),
+                self.queue_manager.c4d_controller,
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if result.rejected:
+            details = "\n".join(
+                f"{name}: {'; '.join(issues)}"
+                for name, issues in list(result.rejected.items())[:20]
+            )
+            answer = QMessageBox.question(
+                self,
+                "Import zadań",
+                f"Odrzucono {len(result.rejected)} zadań:\n{details}\n\n"
+                f"Dodać pozostałe ({len(result.tasks)})?",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+
+        self.queue_manager.add_tasks(result.tasks)
+        self.update_tasks_table()
+        self.statusBar().showMessage(f"Zaimportowano zadań: {len(result.tasks)}")
+
     def remove_task(self):
         """Usuwa wybrane zadanie"""
         current_row = self.tasks_table.currentRow()
@@ -339,6 +542,7 @@ class MainWindow(QMainWindow):
         self.queue_manager.start_processing()
         self.start_queue_btn.setEnabled(False)
         self.stop_queue_btn.setEnabled(True)
+        self.pause_queue_btn.setEnabled(True)
         self.statusBar().showMessage("Przetwarzanie kolejki...")
 
     def stop_queue(self):
@@ -346,8 +550,29 @@ class MainWindow(QMainWindow):
         self.queue_manager.stop_processing()
         self.start_queue_btn.setEnabled(True)
         self.stop_queue_btn.setEnabled(False)
+        self.pause_queue_btn.setEnabled(False)
+        self.pause_queue_btn.setText("Wstrzymaj kolejkę")
         self.statusBar().showMessage("Kolejka zatrzymana")
 
+    def toggle_queue_pause(self):
+        """Wstrzymuje kolejkę (zamrażając trwające rendery) albo ją wznawia"""
+        if self.queue_manager.is_paused:
+            self.queue_manager.resume_queue()
+            self.pause_queue_btn.setText("Wstrzymaj kolejkę")
+            self.statusBar().showMessage("Przetwarzanie kolejki...")
+        else:
+            self.queue_manager.pause_queue()
+            self.pause_queue_btn.setText("Wznów kolejkę")
+            self.statusBar().showMessage("Kolejka wstrzymana - rendery zamrożone")
+
+    def refresh_tasks(self):
+        """Odświeża tabelę zadań (przy wspólnej kolejce - po odczycie folderu)"""
+        if self.queue_manager.is_shared_queue():
+            # Zadania dodane i wyrenderowane przez inne instancje
+            self.queue_refresher.refresh()
+        else:
+            self.update_tasks_table()
+
     def update_tasks_table(self):
         """Aktualizuje tabelę zadań (zoptymalizowane)"""
         tasks = self.queue_manager.get_tasks()
@@ -359,7 +584,8 @@ class MainWindow(QMainWindow):
         for row, task in enumerate(tasks):
             # Aktualizuj tylko zmienione komórki
             self._update_table_cell(row, 0, task.name)
-            self._update_table_cell(row, 1, task.status.value)
+            status = "suspended" if task.suspended else task.status.value
+            self._update_table_cell(row, 1, status)
             self._update_table_cell(row, 2, task.c4d_file_path)
             self._update_table_cell(row, 3, task.output_folder)
             self._update_table_cell(row, 4, task.cinema4d_version)
@@ -367,6 +593,21 @@ class MainWindow(QMainWindow):
             duration = f"{task.duration:.1f}s" if task.duration else ""
             self._update_table_cell(row, 5, duration)
 
+            # Zużycie zasobów przez drzewo procesów C4D
+            usage = task.resource_usage
+            if usage:
+                peak_ram = f"{usage['peak_rss_mb']:.0f} MB"
+                cores = f"{usage['avg_cores']:.1f}/{usage['cpu_count']}"
+                disk_io = (
+                    f"{usage['read_bytes'] / 1024**2:.0f}/"
+                    f"{usage['write_bytes'] / 1024**2:.0f} MB"
+                )
+            else:
+                peak_ram = cores = disk_io = ""
+            self._update_table_cell(row, 6, peak_ram)
+            self._update_table_cell(row, 7, cores)
+            self._update_table_cell(row, 8, disk_io)
+
     def _update_table_cell(self, row: int, col: int, text: str):
         """Aktualizuje komórkę tylko jeśli wartość się zmieniła"""
         item = self.tasks_table.item(row, col)
@@ -385,12 +626,45 @@ class MainWindow(QMainWindow):
         workers = self.queue_manager.get_worker_status()
         self.worker_status_widget.update_workers(workers)
 
+    def update_stats(self):
+        """Aktualizuje panel statystyk renderowania"""
+        stats = get_render_stats()
+        summary = stats.summary()
+        self.throughput_label.setText(f"Zadania/h: {summary['tasks_per_hour']:.1f}")
+        self.finished_label.setText(
+            f"Ukończone: {summary['completed']:.0f}, błędy: {summary['failed']:.0f}"
+        )
+        self.utilization_label.setText(
+            f"Wykorzystanie: {summary['utilization'] * 100:.0f}%"
+        )
+        self.log_rate_label.setText(
+            f"Linie logu/s: {summary['log_lines_per_second']:.1f}"
+        )
+
+        averages = stats.average_phases()
+        if not averages:
+            return
+        parts = [
+            f"{self.PHASE_LABELS[phase]}: {averages[phase]:.1f}s"
+            for phase in PHASES + (FIRST_FRAME,)
+            if phase in averages
+        ]
+        if summary["frames"]:
+            parts.append(f"klatka: {summary['avg_frame']:.1f}s")
+        self.phases_label.setText("Średnio - " + ", ".join(parts))
+
     def update_resources(self, resources: dict):
         """Aktualizuje wyświetlanie zasobów (wywoływane przez sygnał)"""
         self.cpu_label.setText(f"CPU: {resources['cpu']:.1f}%")
         self.memory_label.setText(f"RAM: {resources['memory']:.1f}%")
         self.disk_label.setText(f"Dysk: {resources['disk']:.1f}%")
 
+        # Historia z bufora próbnika
+        sampler = self.resource_bridge.sampler
+        self.cpu_chart.set_values(sampler.history("cpu", self.CHART_POINTS))
+        self.memory_chart.set_values(sampler.history("memory", self.CHART_POINTS))
+        self.disk_chart.set_values(sampler.history("disk", self.CHART_POINTS))
+
     def on_task_started(self, task: RenderTask):
         """Callback wywoływany przy rozpoczęciu zadania"""
         self.log_text.append(f"[{task.started_at}] Rozpoczęto: {task.name}")
@@ -422,8 +696,8 @@ class MainWindow(QMainWindow):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             # Przeładuj konfigurację logowania
             self.setup_logging()
-            # Przeładuj ustawienia w queue_manager
-            self.queue_manager.c4d_controller = Cinema4DController()
+            # Konfiguracja jest wspólna (get_config), więc kontroler C4D widzi
+            # nowe ścieżki bez ponownego tworzenia i zachowuje callback logów
             self.statusBar().showMessage("Ustawienia zostały zapisane")
 
     def edit_task(self):
@@ -444,13 +718,17 @@ class MainWindow(QMainWindow):
         dialog.c4d_file_edit.setText(task.c4d_file_path)
         dialog.c4d_version_combo.setCurrentText(task.cinema4d_version)
         dialog.image_output_edit.setText(task.output_folder)
-        if task.start_frame is not None and task.end_frame is not None:
+        if task.frame_set:
+            dialog.frames_edit.setText(task.frame_set)
+        elif task.start_frame is not None and task.end_frame is not None:
             if task.start_frame == task.end_frame:
                 dialog.frames_edit.setText(str(task.start_frame))
             else:
                 dialog.frames_edit.setText(f"{task.start_frame}-{task.end_frame}")
         # render_settings
         rs = task.render_settings
+        dialog.frame_order_combo.setCurrentText(rs.get("frame_order", ""))
+        dialog.multipass_output_edit.setText(rs.get("multipass_output", ""))
         dialog.threads_spin.setValue(rs.get("threads", 8))
         dialog.use_gpu.setChecked(rs.get("use_gpu", False))
         dialog.no_gui.setChecked(rs.get("no_gui", False))
@@ -468,6 +746,8 @@ class MainWindow(QMainWindow):
             try:
                 new_task = dialog.get_task()
                 new_task.id = task.id  # zachowaj ten sam ID
+                # Dialog nie edytuje zależności - zachowaj je z edytowanego zadania
+                new_task.depends_on = list(task.depends_on)
                 self.queue_manager.edit_task(task.id, new_task)
                 self.update_tasks_table()
                 self.statusBar().showMessage(f"Zmieniono zadanie: {new_task.name}")
@@ -478,6 +758,8 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """Obsługuje zamknięcie okna"""
-        if hasattr(self, "resource_thread"):
-            self.resource_thread.stop()
+        if hasattr(self, "resource_bridge"):
+            self.resource_bridge.stop()
+        if getattr(self, "api_server", None):
+            self.api_server.stop()
         super().closeEvent(event)
@@ -14,14 +14,14 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
 )
 
-from core.config import Config
+from core.config import get_config
 from gui.button_styles import BUTTON_STYLES
 
 
 class PreferencesDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.config = Config()
+        self.config = get_config()
         self.init_ui()
         self.apply_styles()
         self.load_versions()
@@ -0,0 +1,45 @@
+from PyQt6.QtCore import QPointF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import QSizePolicy, QWidget
+
+
+class SparklineWidget(QWidget):
+    """Mini wykres historii metryki w zakresie 0-100%"""
+
+    def __init__(self, color: str = "#007ACC", parent=None):
+        super().__init__(parent)
+        self.values: list[float] = []
+        self.color = QColor(color)
+        self.setFixedHeight(36)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+
+    def set_values(self, values: list[float]):
+        """Ustawia historię wartości i odświeża wykres"""
+        self.values = values
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#1E1E1E"))
+        painter.setPen(QPen(QColor("#3F3F46"), 1))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+        if len(self.values) < 2:
+            return
+
+        width = self.width() - 2
+        height = self.height() - 4
+        step = width / (len(self.values) - 1)
+        points = QPolygonF(
+            [
+                QPointF(
+                    1 + i * step,
+                    2 + height - (min(max(value, 0.0), 100.0) / 100.0) * height,
+                )
+                for i, value in enumerate(self.values)
+            ]
+        )
+
+        painter.setPen(QPen(self.color, 1.5, Qt.PenStyle.SolidLine))
+        painter.drawPolyline(points)
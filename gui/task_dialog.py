@@ -19,7 +19,8 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from core.cinema4d_controller import Cinema4DController
+from core.config import get_config
+from core.render_command import compile_task, frame_set_fields
 from gui.button_styles import BUTTON_STYLES
 from models.task import RenderTask
 
@@ -27,7 +28,8 @@ from models.task import RenderTask
 class TaskDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.c4d_controller = Cinema4DController()
+        # Do wypełnienia listy wersji wystarczy wspólna konfiguracja
+        self.c4d_versions = get_config().get_c4d_versions()
         self.init_ui()
         self.apply_styles()
         self.update_command_preview()
@@ -106,7 +108,7 @@ class TaskDialog(QDialog):
 
         # Wersja C4D
         self.c4d_version_combo = QComboBox()
-        self.c4d_version_combo.addItems(self.c4d_controller.c4d_installations.keys())
+        self.c4d_version_combo.addItems(self.c4d_versions.keys())
         form_layout.addRow("Wersja C4D:", self.c4d_version_combo)
 
         layout.addLayout(form_layout)
@@ -124,6 +126,14 @@ class TaskDialog(QDialog):
         self.frames_edit = QLineEdit()
         self.frames_edit.setPlaceholderText("np. 1, 1-100, 1,5,10")
         frames_layout.addRow("Zakres klatek:", self.frames_edit)
+        self.frame_order_combo = QComboBox()
+        self.frame_order_combo.addItems(["", "sequential", "progressive"])
+        self.frame_order_combo.setToolTip(
+            "progressive - najpierw co n-ta klatka (preview_strides), potem reszta\n"
+            "Tylko z serwerem renderowania (bez -threads, GPU, multipass i limitu\n"
+            "pamięci) - w innym razie klatki renderują się w kolejności"
+        )
+        frames_layout.addRow("Kolejność klatek:", self.frame_order_combo)
         frames_group.setLayout(frames_layout)
         render_layout.addWidget(frames_group)
 
@@ -261,6 +271,7 @@ class TaskDialog(QDialog):
         self.c4d_file_edit.textChanged.connect(self.update_command_preview)
         self.c4d_version_combo.currentTextChanged.connect(self.update_command_preview)
         self.frames_edit.textChanged.connect(self.update_command_preview)
+        self.frame_order_combo.currentTextChanged.connect(self.update_command_preview)
         self.image_output_edit.textChanged.connect(self.update_command_preview)
         self.multipass_output_edit.textChanged.connect(self.update_command_preview)
         self.threads_spin.valueChanged.connect(self.update_command_preview)
@@ -327,65 +338,74 @@ class TaskDialog(QDialog):
         self.update_command_preview()
 
     def update_command_preview(self):
-        """Aktualizuje podgląd polecenia na podstawie aktualnych ustawień"""
-        c4d_exe = self.c4d_controller.c4d_installations[
-            self.c4d_version_combo.currentText()
-        ]
-        command_parts = [f'"{c4d_exe}"']
-
-        # Parametry renderowania
-        if self.c4d_file_edit.text():
-            command_parts.append(f'-render "{self.c4d_file_edit.text()}"')
-            # Dodaj wymagane parametry
-            command_parts.append("-verbose")
-            command_parts.append("-console")
-
-        if not self.use_file_settings.isChecked():
-            if self.frames_edit.text():
-                command_parts.append(f"-frame {self.frames_edit.text()}")
-
-            if self.image_output_edit.text():
-                command_parts.append(f'-oimage "{self.image_output_edit.text()}"')
-
-            if self.multipass_output_edit.text():
-                command_parts.append(
-                    f'-omultipass "{self.multipass_output_edit.text()}"'
+        """Aktualizuje podgląd polecenia tym samym kompilatorem co renderowanie"""
+        c4d_exe = self.c4d_versions.get(self.c4d_version_combo.currentText(), "")
+        try:
+            task = self._build_task()
+        except ValueError:
+            self.command_preview.setText(
+                f"Niepoprawny zakres klatek: {self.frames_edit.text()}"
+            )
+            return
+        self.command_preview.setText(compile_task(task, c4d_exe).display())
+
+    def _build_task(self) -> RenderTask:
+        """Buduje zadanie z pól formularza (bez walidacji wymaganych pól)"""
+        use_file_settings = self.use_file_settings.isChecked()
+        render_settings = {}
+        frame_set = start_frame = end_frame = None
+
+        # Przy ustawieniach z pliku C4D zakładki z parametrami są wyłączone
+        if not use_file_settings:
+            frame_set, start_frame, end_frame = frame_set_fields(
+                self.frames_edit.text()
+            )
+
+            # Dodaj tylko te parametry, które zostały wybrane przez użytkownika
+            if self.frame_order_combo.currentText():
+                render_settings["frame_order"] = self.frame_order_combo.currentText()
+            if self.multipass_output_edit.text().strip():
+                render_settings["multipass_output"] = (
+                    self.multipass_output_edit.text().strip()
                 )
-
-            # Dodaj parametry tylko jeśli zostały wybrane
             if self.threads_spin.value() > 0:
-                command_parts.append(f"-threads {self.threads_spin.value()}")
-
+                render_settings["threads"] = self.threads_spin.value()
             if self.use_gpu.isChecked():
-                command_parts.append("-gpu")
-
-            # Parametry trybu wsadowego
+                render_settings["use_gpu"] = True
             if self.no_gui.isChecked():
-                command_parts.append("cmd-nogui")
+                render_settings["no_gui"] = True
             if self.batch_mode.isChecked():
-                command_parts.append("-batch")
+                render_settings["batch_mode"] = True
             if self.shutdown.isChecked():
-                command_parts.append("-shutdown")
+                render_settings["shutdown"] = True
             if self.quit.isChecked():
-                command_parts.append("-quit")
-
-            # Parametry debugowania
+                render_settings["quit"] = True
             if self.debug_mode.isChecked():
-                command_parts.append("cmd-debug")
+                render_settings["debug_mode"] = True
             if self.show_console.isChecked():
-                command_parts.append("-console")
-            if self.log_file_edit.text():
-                command_parts.append(f'-log "{self.log_file_edit.text()}"')
+                render_settings["show_console"] = True
+            if self.log_file_edit.text().strip():
+                render_settings["log_file"] = self.log_file_edit.text().strip()
             if self.verbose.isChecked():
-                command_parts.append("-verbose")
-
-            # Parametry pamięci
+                render_settings["verbose"] = True
             if self.memory_limit.value() > 0:
-                command_parts.append(f"cmd-memory {self.memory_limit.value()}")
+                render_settings["memory_limit"] = self.memory_limit.value()
             if self.priority_combo.currentText():
-                command_parts.append(f"-priority {self.priority_combo.currentText()}")
+                render_settings["priority"] = self.priority_combo.currentText()
 
-        self.command_preview.setText(" ".join(command_parts))
+        return RenderTask(
+            id=str(uuid.uuid4()),
+            name=self.name_edit.text().strip(),
+            c4d_file_path=self.c4d_file_edit.text().strip(),
+            output_folder=(
+                self.image_output_edit.text().strip() if not use_file_settings else ""
+            ),
+            cinema4d_version=self.c4d_version_combo.currentText(),
+            start_frame=start_frame,
+            end_frame=end_frame,
+            frame_set=frame_set,
+            render_settings=render_settings,
+        )
 
     def get_task(self) -> RenderTask:
         """Tworzy i zwraca nowe zadanie renderowania"""
@@ -399,67 +419,7 @@ class TaskDialog(QDialog):
             if not self.image_output_edit.text().strip():
                 raise ValueError("Ścieżka wyjściowa obrazów jest wymagana")
 
-        # Parsowanie zakresu klatek
-        frames = self.frames_edit.text().strip()
-        start_frame = None
-        end_frame = None
-        if frames:
-            if "-" in frames:
-                start_frame, end_frame = map(int, frames.split("-"))
-            else:
-                start_frame = end_frame = int(frames)
-
-        # Przygotowanie ustawień renderowania - dodaj tylko te, które zostały wybrane
-        render_settings = {}
-
-        # Debugowanie - wyświetl wartości przed dodaniem
-        print("Wartości przed dodaniem do render_settings:")
-        print("threads_spin.value():", self.threads_spin.value())
-        print("memory_limit.value():", self.memory_limit.value())
-
-        # Dodaj tylko te parametry, które zostały wybrane przez użytkownika
-        if self.threads_spin.value() > 0:
-            render_settings["threads"] = self.threads_spin.value()
-        if self.use_gpu.isChecked():
-            render_settings["use_gpu"] = True
-        if self.no_gui.isChecked():
-            render_settings["no_gui"] = True
-        if self.batch_mode.isChecked():
-            render_settings["batch_mode"] = True
-        if self.shutdown.isChecked():
-            render_settings["shutdown"] = True
-        if self.quit.isChecked():
-            render_settings["quit"] = True
-        if self.debug_mode.isChecked():
-            render_settings["debug_mode"] = True
-        if self.show_console.isChecked():
-            render_settings["show_console"] = True
-        if self.log_file_edit.text().strip():
-            render_settings["log_file"] = self.log_file_edit.text().strip()
-        if self.verbose.isChecked():
-            render_settings["verbose"] = True
-        if self.memory_limit.value() > 0:
-            render_settings["memory_limit"] = self.memory_limit.value()
-        if self.priority_combo.currentText():
-            render_settings["priority"] = self.priority_combo.currentText()
-
-        # Debugowanie - wyświetl ustawienia
-        print("Render settings:", render_settings)
-
-        # Tworzenie zadania
-        task = RenderTask(
-            id=str(uuid.uuid4()),
-            name=self.name_edit.text().strip(),
-            c4d_file_path=self.c4d_file_edit.text().strip(),
-            output_folder=(
-                self.image_output_edit.text().strip()
-                if not self.use_file_settings.isChecked()
-                else ""
-            ),
-            cinema4d_version=self.c4d_version_combo.currentText(),
-            start_frame=start_frame,
-            end_frame=end_frame,
-            render_settings=render_settings,
-        )
-
-        return task
+        try:
+            return self._build_task()
+        except ValueError:
+            raise ValueError(f"Niepoprawny zakres klatek: {self.frames_edit.text()}")
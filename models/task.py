@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 
 class TaskStatus(Enum):
@@ -22,12 +22,25 @@ class RenderTask:
     status: TaskStatus = TaskStatus.PENDING
     start_frame: Optional[int] = None
     end_frame: Optional[int] = None
+    # Zbiór klatek, np. "1-100" lub "1,5,10" (start/end_frame to jego min/max)
+    frame_set: Optional[str] = None
     render_settings: Dict[str, Any] = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
     output_files: list = field(default_factory=list)
+    # Zużycie zasobów przez drzewo procesów C4D (szczyt RSS, CPU, I/O)
+    resource_usage: Dict[str, Any] = field(default_factory=dict)
+    # Proces C4D w trakcie renderowania (pid, host, create_time) - do odzyskania
+    # zadania po awarii aplikacji
+    render_process: Dict[str, Any] = field(default_factory=dict)
+    # Czas faz ostatniego uruchomienia w sekundach (core.render_metrics.PHASES)
+    phase_timings: Dict[str, float] = field(default_factory=dict)
+    # Render wstrzymany (psutil suspend) - proces żyje, ale nie pracuje
+    suspended: bool = False
+    # ID zadań, które muszą zakończyć się sukcesem przed startem tego zadania
+    depends_on: List[str] = field(default_factory=list)
 
     @property
     def duration(self) -> Optional[float]:
@@ -0,0 +1,111 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any
+
+# Windows nie pozwala podmienić pliku otwartego właśnie przez inny proces
+REPLACE_RETRIES = 5
+REPLACE_RETRY_DELAY = 0.05
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class ChecksumMismatchError(OSError):
+    """Skrót kopii różni się od skrótu pliku źródłowego"""
+
+
+def _fsync_directory(directory: str):
+    """Utrwala wpis katalogu po os.replace (tylko POSIX)"""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace(source: str, target: str):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+
+def file_sha1(path: str) -> str:
+    """Zwraca skrót SHA-1 treści pliku"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_file_verified(source: str, target: str) -> str:
+    """Kopiuje plik przez plik .part i podmienia cel dopiero po weryfikacji
+
+    Skrót źródła liczony jest w trakcie kopiowania i porównywany ze skrótem
+    zapisanej kopii. Zwraca skrót SHA-1 pliku.
+    """
+    partial = target + ".part"
+    digest = hashlib.sha1()
+    try:
+        with open(source, "rb") as src, open(partial, "wb") as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if file_sha1(partial) != digest.hexdigest():
+            raise ChecksumMismatchError(f"Niezgodna suma kontrolna kopii: {source}")
+        _replace(partial, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(partial)
+        raise
+    return digest.hexdigest()
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2):
+    """Zapisuje JSON atomowo: plik tymczasowy + fsync + os.replace
+
+    Po awarii w trakcie zapisu na dysku zostaje poprzednia albo nowa,
+    kompletna wersja pliku - nigdy obcięta.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    content = json.dumps(data, ensure_ascii=False, indent=indent)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def remove_stale_temp_files(directory: str, max_age: float = 60.0) -> int:
+    """Usuwa pliki .tmp pozostawione przez przerwane zapisy"""
+    removed = 0
+    now = time.time()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".tmp"):
+            continue
+        path = os.path.join(directory, filename)
+        with contextlib.suppress(OSError):
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed += 1
+    return removed
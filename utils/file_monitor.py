@@ -6,7 +6,7 @@ from typing import List, Optional
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
-from core.config import Config
+from core.config import get_config
 from models.task import RenderTask
 from utils.logger import setup_logger
 
@@ -44,7 +44,7 @@ class RenderOutputHandler(FileSystemEventHandler):
 
 class FileMonitor:
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
         log_to_file, log_file_path = self.config.get_logging_settings()
         self.logger = setup_logger("file_monitor", log_to_file, log_file_path)
         self.observer = Observer()
@@ -0,0 +1,224 @@
+"""
+Rejestr metryk w formacie tekstowym Prometheus (liczniki, wskaźniki, histogramy).
+
+Metryki są bezpieczne wątkowo i mogą mieć etykiety, np.
+    get_metrics().counter("c4d_tasks_total", "Zakończone zadania").inc(status="ok")
+Wartość wskaźnika może być też obliczana przy odczycie (set_function).
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Domyślne przedziały histogramów w sekundach - od startu procesu do klatek
+# renderowanych godzinami
+DEFAULT_BUCKETS = (
+    0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600,
+)  # fmt: skip
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Metryka z wartościami dla kombinacji etykiet"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, LabelKey, float, Optional[Tuple]]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, key, value, extra in self.samples():
+            labels = _format_labels(key, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Licznik - wartość tylko rośnie"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def values(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [("", key, value, None) for key, value in sorted(self.values().items())]
+
+
+class Gauge(Metric):
+    """Wskaźnik - wartość bieżąca, ustawiana lub obliczana przy odczycie"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Wartość (bez etykiet) obliczana przy każdym odczycie"""
+        self._function = function
+
+    def value(self, **labels) -> float:
+        if self._function is not None and not labels:
+            return float(self._function())
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        if self._function is not None:
+            return [("", (), self.value(), None)]
+        with self._lock:
+            return [
+                ("", key, value, None) for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram(Metric):
+    """Histogram - liczba obserwacji w przedziałach, suma i liczba"""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # etykiety -> [liczniki przedziałów..., suma, liczba]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def stats(self, **labels) -> Tuple[float, int]:
+        """Zwraca (suma, liczba) obserwacji"""
+        with self._lock:
+            data = self._values.get(_label_key(labels))
+            return (data[-2], int(data[-1])) if data else (0.0, 0)
+
+    def keys(self) -> List[LabelKey]:
+        with self._lock:
+            return sorted(self._values)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(data) for key, data in self._values.items()}
+        samples = []
+        for key, data in sorted(values.items()):
+            for bound, count in zip(self.buckets, data):
+                samples.append(("_bucket", key, count, ("le", _format_value(bound))))
+            samples.append(("_bucket", key, data[-1], ("le", "+Inf")))
+            samples.append(("_sum", key, data[-2], None))
+            samples.append(("_count", key, data[-1], None))
+        return samples
+
+
+class MetricsRegistry:
+    """Zbiór metryk aplikacji - metryki tworzone przy pierwszym użyciu nazwy"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get(self, cls, name: str, help_text: str, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metryka {name} ma już typ {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(
+        self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Zwraca wszystkie metryki w formacie tekstowym Prometheus 0.0.4"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Zwraca wspólny rejestr metryk"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
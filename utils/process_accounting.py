@@ -0,0 +1,163 @@
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+
+class ProcessTreeSampler:
+    """Próbkuje proces Cinema 4D i jego procesy potomne przez cały czas zadania"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.logger = logging.getLogger(__name__)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_count = psutil.cpu_count(logical=True) or 1
+
+        # Ostatnie odczyty liczników per proces (pid, create_time) - procesy,
+        # które się zakończyły, zachowują swój ostatni znany wynik
+        self._cpu_seconds: Dict[Tuple[int, float], float] = {}
+        self._read_bytes: Dict[Tuple[int, float], int] = {}
+        self._write_bytes: Dict[Tuple[int, float], int] = {}
+        self._peak_rss = 0
+        self._peak_processes = 0
+        self._samples = 0
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._stopped_at: Optional[float] = None
+
+    def start(self):
+        """Rozpoczyna próbkowanie w osobnym wątku"""
+        self._started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name=f"process-accounting-{self.pid}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """Kończy próbkowanie i zwraca podsumowanie zużycia zasobów"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        self._sample()
+        self._stopped_at = time.time()
+        return self.summary()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._sample()
+            self._stop_event.wait(self.interval)
+
+    def _process_tree(self) -> list:
+        try:
+            root = psutil.Process(self.pid)
+            return [root] + root.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return []
+
+    def _sample(self):
+        """Pobiera jedną próbkę dla całego drzewa procesów"""
+        total_rss = 0
+        alive = 0
+        for proc in self._process_tree():
+            try:
+                with proc.oneshot():
+                    key = (proc.pid, proc.create_time())
+                    rss = proc.memory_info().rss
+                    cpu_times = proc.cpu_times()
+                    io = proc.io_counters() if hasattr(proc, "io_counters") else None
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+            total_rss += rss
+            alive += 1
+            with self._lock:
+                self._cpu_seconds[key] = cpu_times.user + cpu_times.system
+                if io is not None:
+                    self._read_bytes[key] = io.read_bytes
+                    self._write_bytes[key] = io.write_bytes
+
+        with self._lock:
+            self._samples += 1
+            self._peak_rss = max(self._peak_rss, total_rss)
+            self._peak_processes = max(self._peak_processes, alive)
+
+    def summary(self) -> Dict[str, Any]:
+        """Zwraca bieżące podsumowanie (szczyt RSS, czas CPU, śr. rdzenie, I/O)"""
+        end = self._stopped_at or time.time()
+        wall_seconds = max(0.0, end - (self._started_at or end))
+        with self._lock:
+            cpu_seconds = sum(self._cpu_seconds.values())
+            avg_cores = cpu_seconds / wall_seconds if wall_seconds > 0 else 0.0
+            return {
+                "peak_rss_mb": round(self._peak_rss / (1024**2), 1),
+                "cpu_seconds": round(cpu_seconds, 2),
+                "wall_seconds": round(wall_seconds, 2),
+                "avg_cores": round(avg_cores, 2),
+                "cpu_count": self.cpu_count,
+                "avg_core_utilization": round(avg_cores / self.cpu_count * 100, 1),
+                "read_bytes": sum(self._read_bytes.values()),
+                "write_bytes": sum(self._write_bytes.values()),
+                "peak_processes": self._peak_processes,
+                "samples": self._samples,
+            }
+
+
+def process_identity(pid: int) -> Dict[str, Any]:
+    """Zwraca dane pozwalające rozpoznać proces po restarcie aplikacji
+
+    Sam PID może zostać ponownie użyty przez system, dlatego zapisywany
+    jest razem z czasem utworzenia procesu i nazwą hosta.
+    """
+    identity: Dict[str, Any] = {"pid": pid, "host": socket.gethostname()}
+    try:
+        identity["create_time"] = psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return identity
+
+
+def find_process(identity: Dict[str, Any]) -> Optional[psutil.Process]:
+    """Zwraca działający proces opisany przez process_identity() lub None"""
+    if not identity.get("pid") or identity.get("host") != socket.gethostname():
+        return None
+    try:
+        proc = psutil.Process(identity["pid"])
+        create_time = identity.get("create_time")
+        if create_time is not None and abs(proc.create_time() - create_time) > 1:
+            return None
+        if not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE:
+            return None
+        return proc
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def merge_usage_summaries(usages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Łączy podsumowania kilku procesów (np. kolejnych zakresów klatek)"""
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return {}
+    if len(usages) == 1:
+        return dict(usages[0])
+    cpu_count = max(usage.get("cpu_count", 1) for usage in usages)
+    cpu_seconds = sum(usage.get("cpu_seconds", 0) for usage in usages)
+    wall_seconds = sum(usage.get("wall_seconds", 0) for usage in usages)
+    avg_cores = cpu_seconds / wall_seconds if wall_seconds > 0 else 0.0
+    return {
+        "peak_rss_mb": max(usage.get("peak_rss_mb", 0) for usage in usages),
+        "cpu_seconds": round(cpu_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "avg_cores": round(avg_cores, 2),
+        "cpu_count": cpu_count,
+        "avg_core_utilization": round(avg_cores / cpu_count * 100, 1),
+        "read_bytes": sum(usage.get("read_bytes", 0) for usage in usages),
+        "write_bytes": sum(usage.get("write_bytes", 0) for usage in usages),
+        "peak_processes": max(usage.get("peak_processes", 0) for usage in usages),
+        "samples": sum(usage.get("samples", 0) for usage in usages),
+    }
@@ -1,32 +1,37 @@
 import logging
-import os
 from typing import Dict
 
 import psutil
 
+from utils.resource_sampler import get_resource_sampler
+
 
 class ResourceMonitor:
+    # Okno (w sekundach) uśredniania zasobów przy decyzjach o starcie renderingu
+    DECISION_WINDOW = 10.0
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.sampler = get_resource_sampler()
 
     def get_system_resources(self) -> Dict[str, float]:
-        """Zwraca aktualny stan zasobów systemowych"""
-        try:
-            # Użyj głównego dysku systemowego
-            disk_path = os.path.abspath(os.sep)  # '/' na Linux, 'C:\' na Windows
-
-            return {
-                "cpu": psutil.cpu_percent(interval=0),
-                "memory": psutil.virtual_memory().percent,
-                "disk": psutil.disk_usage(disk_path).percent,
-            }
-        except Exception as e:
-            self.logger.error(f"Błąd odczytu zasobów systemowych: {str(e)}")
-            return {"cpu": 0, "memory": 0, "disk": 0}
+        """Zwraca aktualny stan zasobów systemowych (ostatnia próbka)"""
+        return self.sampler.latest()
+
+    def get_average_resources(
+        self, seconds: float = DECISION_WINDOW
+    ) -> Dict[str, float]:
+        """Zwraca średnie zasoby z ostatnich N sekund"""
+        latest = self.sampler.latest()
+        averages = {}
+        for metric in self.sampler.METRICS:
+            value = self.sampler.window_average(metric, seconds)
+            averages[metric] = latest[metric] if value is None else value
+        return averages
 
     def should_start_render(self) -> bool:
         """Określa czy system jest gotowy do rozpoczęcia renderingu"""
-        resources = self.get_system_resources()
+        resources = self.get_average_resources()
 
         # Proste heurystyki - można rozbudować
         if resources["cpu"] > 90:
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from core.config import get_config
+
+
+class RingBuffer:
+    """Bufor cykliczny o stałym rozmiarze oparty na tablicy array('d')"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._data = array("d", [0.0]) * self.capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float):
+        """Dodaje wartość, nadpisując najstarszą po zapełnieniu bufora"""
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def values(self, last_n: Optional[int] = None) -> List[float]:
+        """Zwraca wartości w kolejności chronologicznej (opcjonalnie ostatnie N)"""
+        count = self._count if last_n is None else max(0, min(last_n, self._count))
+        start = (self._next - count) % self.capacity
+        if start + count <= self.capacity:
+            return self._data[start : start + count].tolist()
+        return (
+            self._data[start:].tolist()
+            + self._data[: (start + count) % self.capacity].tolist()
+        )
+
+
+class ResourceSampler:
+    """Wspólny próbnik zasobów systemowych z historią i wieloma subskrybentami"""
+
+    METRICS = ("cpu", "memory", "disk")
+
+    def __init__(self, interval: float = 2.0, history_size: int = 900):
+        self.logger = logging.getLogger(__name__)
+        self.interval = max(0.1, float(interval))
+        self.history_size = max(2, int(history_size))
+        self._timestamps = RingBuffer(self.history_size)
+        self._buffers: Dict[str, RingBuffer] = {
+            metric: RingBuffer(self.history_size) for metric in self.METRICS
+        }
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Dict[str, float]], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Uruchamia wątek próbkujący (jeśli jeszcze nie działa)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="resource-sampler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Zatrzymuje wątek próbkujący"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, callback: Callable[[Dict[str, float]], None]):
+        """Rejestruje callback wywoływany po każdej próbce (z wątku próbnika)"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, float]], None]):
+        """Wyrejestrowuje callback"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _read_system_resources(self) -> Dict[str, float]:
+        """Odczytuje bieżące zasoby systemowe przez psutil"""
+        try:
+            # Użyj głównego dysku systemowego
+            disk_path = os.path.abspath(os.sep)  # '/' na Linux, 'C:\' na Windows
+
+            return {
+                "cpu": psutil.cpu_percent(interval=0),
+                "memory": psutil.virtual_memory().percent,
+                "disk": psutil.disk_usage(disk_path).percent,
+            }
+        except Exception as e:
+            self.logger.error(f"Błąd odczytu zasobów systemowych: {str(e)}")
+            return {"cpu": 0, "memory": 0, "disk": 0}
+
+    def sample_now(self) -> Dict[str, float]:
+        """Pobiera próbkę, zapisuje ją w historii i powiadamia subskrybentów"""
+        sample = self._read_system_resources()
+        with self._lock:
+            self._timestamps.append(time.time())
+            for metric in self.METRICS:
+                self._buffers[metric].append(float(sample.get(metric, 0.0)))
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(dict(sample))
+            except Exception as e:
+                self.logger.error(f"Błąd subskrybenta próbnika zasobów: {str(e)}")
+        return sample
+
+    def _run(self):
+        # Pierwsze wywołanie cpu_percent(interval=0) zawsze zwraca 0.0
+        psutil.cpu_percent(interval=0)
+        while not self._stop_event.wait(self.interval):
+            self.sample_now()
+
+    def latest(self) -> Dict[str, float]:
+        """Zwraca ostatnią próbkę (lub pobiera ją, jeśli historia jest pusta)"""
+        with self._lock:
+            if len(self._timestamps):
+                return {
+                    metric: self._buffers[metric].values(1)[0]
+                    for metric in self.METRICS
+                }
+        return self.sample_now()
+
+    def history(self, metric: str, count: Optional[int] = None) -> List[float]:
+        """Zwraca historię metryki w kolejności chronologicznej"""
+        with self._lock:
+            return self._buffers[metric].values(count)
+
+    def _window_values(self, metric: str, seconds: float) -> List[float]:
+        with self._lock:
+            timestamps = self._timestamps.values()
+            values = self._buffers[metric].values()
+        cutoff = time.time() - seconds
+        return [v for t, v in zip(timestamps, values) if t >= cutoff]
+
+    def window_average(self, metric: str, seconds: float) -> Optional[float]:
+        """Zwraca średnią metryki z ostatnich N sekund (None gdy brak próbek)"""
+        values = self._window_values(metric, seconds)
+        if not values:
+            return None
+        return sum(values) / len(values)
+
+    def percentile(
+        self, metric: str, percent: float, seconds: float
+    ) -> Optional[float]:
+        """Zwraca percentyl metryki z ostatnich N sekund (interpolacja liniowa)"""
+        values = sorted(self._window_values(metric, seconds))
+        if not values:
+            return None
+        rank = (len(values) - 1) * max(0.0, min(100.0, percent)) / 100.0
+        lower = int(rank)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+_sampler: Optional[ResourceSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_resource_sampler() -> ResourceSampler:
+    """Zwraca wspólną, uruchomioną instancję próbnika zasobów"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            interval, history_size = get_config().get_resource_sampling_settings()
+            _sampler = ResourceSampler(interval, history_size)
+        _sampler.start()
+        return _sampler
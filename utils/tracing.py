@@ -0,0 +1,252 @@
+"""
+Śledzenie przebiegu zadań - odcinki czasu (spans) zapisywane do pliku JSONL.
+
+Każda linia pliku to jedno zdarzenie:
+    {"type": "span", "name": "render", "cat": "phase", "track": "worker-1",
+     "start": 1700000000.123, "duration": 12.5, "pid": 1234, "host": "node1",
+     "args": {"task_id": "..."}}
+Zdarzenia chwilowe mają "type": "instant" i nie mają "duration".
+
+"track" to wiersz osi czasu - worker, kolejka albo wątek wysyłania. Plik
+jest tylko dopisywany, więc może go współdzielić kilka procesów.
+export_chrome_trace zamienia go na format Chrome trace-event (chrome://tracing,
+Perfetto) z dodatkowymi odcinkami bezczynności workerów między zadaniami.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from core.config import get_config
+
+# Odcinek najwyższego poziomu na osi workera - przerwy między nimi to bezczynność
+TASK_SPAN = "task"
+IDLE_SPAN = "idle"
+
+
+class Tracer:
+    """Zapis odcinków czasu do pliku JSONL (bez zapisu, gdy wyłączony)"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.enabled = bool(path)
+        self.host = socket.gethostname()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+
+    def _track(self, track: Optional[str]) -> str:
+        if track:
+            return track
+        return getattr(self._local, "track", None) or threading.current_thread().name
+
+    def _write(self, event: Dict):
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+            except OSError:
+                # Śledzenie nie może przerwać renderowania
+                self.enabled = False
+
+    @contextmanager
+    def on_track(self, track: str):
+        """Przypisuje odcinki zapisywane w tym wątku do podanego wiersza"""
+        previous = getattr(self._local, "track", None)
+        self._local.track = track
+        try:
+            yield
+        finally:
+            self._local.track = previous
+
+    def complete(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        cat: str = "task",
+        track: Optional[str] = None,
+        **args,
+    ):
+        """Zapisuje zakończony odcinek (start - czas epoki w sekundach)"""
+        if not self.enabled:
+            return
+        self._write(
+            {
+                "type": "span",
+                "name": name,
+                "cat": cat,
+                "track": self._track(track),
+                "start": round(start, 6),
+                "duration": round(max(0.0, duration), 6),
+                "pid": os.getpid(),
+                "host": self.host,
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, cat: str = "task", track: Optional[str] = None, **args):
+        """Mierzy blok kodu jako odcinek"""
+        start = time.time()
+        try:
+            yield args
+        finally:
+            self.complete(name, start, time.time() - start, cat, track, **args)
+
+    def instant(
+        self, name: str, cat: str = "task", track: Optional[str] = None, **args
+    ):
+        """Zapisuje zdarzenie chwilowe (np. dodanie zadania do kolejki)"""
+        if not self.enabled:
+            return
+        self._write(
+            {
+                "type": "instant",
+                "name": name,
+                "cat": cat,
+                "track": self._track(track),
+                "start": round(time.time(), 6),
+                "pid": os.getpid(),
+                "host": self.host,
+                "args": args,
+            }
+        )
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path: str, since: Optional[float] = None) -> List[Dict]:
+    """Wczytuje zdarzenia z pliku JSONL (pomija uszkodzone linie)"""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Ostatnia linia może być w trakcie zapisu
+                continue
+            if since is None or event.get("start", 0) >= since:
+                events.append(event)
+    return events
+
+
+def _idle_spans(events: Iterable[Dict]) -> List[Dict]:
+    """Zwraca odcinki bezczynności między kolejnymi zadaniami każdego workera"""
+    tasks: Dict[tuple, List[Dict]] = {}
+    for event in events:
+        if event.get("type") == "span" and event.get("name") == TASK_SPAN:
+            key = (event.get("host"), event.get("pid"), event.get("track"))
+            tasks.setdefault(key, []).append(event)
+
+    idle = []
+    for (host, pid, track), spans in tasks.items():
+        spans.sort(key=lambda span: span["start"])
+        end = spans[0]["start"] + spans[0]["duration"]
+        for span in spans[1:]:
+            gap = span["start"] - end
+            if gap > 0:
+                idle.append(
+                    {
+                        "type": "span",
+                        "name": IDLE_SPAN,
+                        "cat": "idle",
+                        "track": track,
+                        "start": end,
+                        "duration": gap,
+                        "pid": pid,
+                        "host": host,
+                        "args": {},
+                    }
+                )
+            end = max(end, span["start"] + span["duration"])
+    return idle
+
+
+def to_chrome_trace(events: List[Dict]) -> Dict:
+    """Zamienia zdarzenia na format Chrome trace-event (JSON Object Format)"""
+    events = events + _idle_spans(events)
+    origin = min((event["start"] for event in events), default=0.0)
+    processes: Dict[tuple, int] = {}
+    threads: Dict[tuple, int] = {}
+    trace_events = []
+
+    for event in sorted(events, key=lambda event: event["start"]):
+        process_key = (event.get("host"), event.get("pid"))
+        if process_key not in processes:
+            processes[process_key] = len(processes) + 1
+            trace_events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": processes[process_key],
+                    "args": {"name": f"{process_key[0]} (PID {process_key[1]})"},
+                }
+            )
+        pid = processes[process_key]
+        thread_key = process_key + (event.get("track"),)
+        if thread_key not in threads:
+            threads[thread_key] = len(threads) + 1
+            trace_events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": threads[thread_key],
+                    "args": {"name": event.get("track")},
+                }
+            )
+
+        chrome_event = {
+            "name": event["name"],
+            "cat": event.get("cat", ""),
+            "pid": pid,
+            "tid": threads[thread_key],
+            "ts": round((event["start"] - origin) * 1e6, 3),
+            "args": event.get("args", {}),
+        }
+        if event.get("type") == "span":
+            chrome_event["ph"] = "X"
+            chrome_event["dur"] = round(event["duration"] * 1e6, 3)
+        else:
+            chrome_event["ph"] = "i"
+            chrome_event["s"] = "t"
+        trace_events.append(chrome_event)
+
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(
+    path: str, output_path: str, since: Optional[float] = None
+) -> int:
+    """Zapisuje plik JSONL jako trace Chrome; zwraca liczbę zdarzeń"""
+    events = read_trace(path, since)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(events), f, ensure_ascii=False)
+    return len(events)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Zwraca wspólny tracer (nieaktywny, jeśli śledzenie jest wyłączone)"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            enabled, trace_file = get_config().get_trace_settings()
+            _tracer = Tracer(trace_file if enabled else None)
+        return _tracer